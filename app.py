@@ -1,13 +1,34 @@
 """
 Flask application entry point.
 """
-from flask import Flask, send_from_directory, jsonify, request
+from flask import Flask, Response, send_from_directory, jsonify, request, stream_with_context
 from flask_cors import CORS
-from backend.database import init_db, get_db
-from backend.services import convert_to_shopping_unit, estimate_size_qualifier, check_circular_reference, generate_shopping_list, organize_shopping_list_by_sections, format_shopping_list_text
+from backend.assets import render_service_worker
+from backend.batch import parse_batch_requests, run_batch
+from backend.bootstrap import load_bootstrap, parse_include
+from backend.bundle import BUNDLE_TABLES, build_bundle
+from backend.conversions import invalidate_conversion_graphs
+from backend.database import init_db, get_db, release_connections
+from backend.http_cache import cached_get, compress_response
+from backend.profiling import (PROFILING_ENABLED, enable_query_profiling, log_query_profile, profile_call,
+                               start_query_profile, stop_query_profile)
+from backend.incremental import update_shopping_list
+from backend.listing import (INGREDIENT_FIELDS, RECIPE_FIELDS, count_rows, decode_cursor, list_ingredients,
+                             list_recipes, paginate_rows, parse_fields, parse_limit)
+from backend.recipe_graph import remove_recipe_dependencies, update_recipe_dependencies, would_create_cycle
+from backend.recipe_index import MAX_SEARCH_RESULT_LIMIT, SEARCH_RESULT_LIMIT, get_recipe_index
+from backend.recipe_io import export_recipes, import_recipes, parse_recipe_lines
+from backend.search import parse_search_terms, search_recipes
+from backend.sms_queue import get_sms_job, get_sms_queue, resume_sms_jobs
+from backend.snapshots import (SNAPSHOT_PAGE_SIZE, get_snapshot, get_snapshot_selections, list_snapshots,
+                               prune_snapshots, save_snapshot)
+from backend.shopping_cache import DATA_TABLES, bump_data_version, get_shopping_list
+from backend.store_sections import STORE_SECTIONS, get_store_section_map, invalidate_store_sections
+from backend.units import get_unit_registry
+from backend.services import convert_to_shopping_unit, estimate_size_qualifier, organize_shopping_list_by_sections, format_shopping_list_text
 from backend.default_conversions import apply_default_conversions, get_available_default_ingredients
-import json
 from pathlib import Path
+from urllib.parse import urlencode
 
 app = Flask(__name__, static_folder='frontend', static_url_path='')
 CORS(app)
@@ -15,11 +36,82 @@ CORS(app)
 # Initialize database on startup
 init_db()
 
+# Deliver SMS jobs left queued by a previous run
+resume_sms_jobs()
+
+# Return pooled connections a request left open
+app.teardown_appcontext(release_connections)
+
+# Per-request SQL profiling, only registered when SHOPLIST_PROFILE is set
+if PROFILING_ENABLED:
+    enable_query_profiling()
+    
+    # Kept in the WSGI environ rather than g: requests run by /api/_debug/profile
+    # share the debug request's app context
+    @app.before_request
+    def start_request_profile():
+        request.environ['shoplist.query_profile'] = start_query_profile()
+    
+    @app.after_request
+    def report_request_profile(response):
+        profile = request.environ.get('shoplist.query_profile')
+        if profile is not None:
+            profile.finish()
+            response.headers['Server-Timing'] = profile.server_timing()
+            log_query_profile(profile, request.method, request.path, response.status_code)
+        return response
+    
+    @app.teardown_request
+    def stop_request_profile(exception=None):
+        profile = request.environ.pop('shoplist.query_profile', None)
+        if profile is not None:
+            stop_query_profile(profile)
+    
+    @app.route('/api/_debug/profile', methods=['POST'])
+    def debug_profile():
+        """
+        Run one API request under cProfile and return its profile.
+        
+        Body: {"method": "POST", "path": "/api/shopping-lists", "json": {...},
+               "sort": "cumulative", "limit": 30}
+        """
+        data = request.json or {}
+        path = data.get('path')
+        if not path or not path.startswith('/api/') or path.startswith('/api/_debug/'):
+            return jsonify({'error': 'path must be an /api/ route'}), 400
+        
+        client = app.test_client()
+        try:
+            response, report = profile_call(
+                lambda: client.open(path, method=data.get('method', 'GET').upper(), json=data.get('json')),
+                sort=data.get('sort', 'cumulative'),
+                limit=int(data.get('limit', 30))
+            )
+        except (KeyError, ValueError):
+            return jsonify({'error': 'sort must be a pstats sort key and limit an integer'}), 400
+        
+        return jsonify({
+            'status': response.status_code,
+            'server_timing': response.headers.get('Server-Timing'),
+            **report
+        })
+
 # Serve frontend files
 @app.route('/')
 def index():
     return send_from_directory('frontend', 'index.html')
 
+@app.route('/service-worker.js')
+def serve_service_worker():
+    """
+    Serve the service worker with its cache version (a hash of the other frontend files).
+    
+    Browsers must revalidate it so asset changes are picked up.
+    """
+    response = Response(render_service_worker(), mimetype='application/javascript')
+    response.cache_control.no_cache = True
+    return response
+
 @app.route('/<path:filename>')
 def serve_static(filename):
     """Serve static files from frontend directory."""
@@ -43,8 +135,22 @@ def serve_static(filename):
     # Serve other static files (CSS, JS, etc.)
     return send_from_directory('frontend', filename)
 
+def is_count_request():
+    """Check for the count query parameter of list endpoints."""
+    return request.args.get('count', '').lower() in ('1', 'true', 'yes')
+
+def paged_response(rows, next_cursor):
+    """JSON list response with a Link header to the next page, if there is one."""
+    response = jsonify(rows)
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
 # API Routes
 @app.route('/api/ingredient-types', methods=['GET'])
+@cached_get('ingredient_types')
 def get_ingredient_types():
     """Get all ingredient types."""
     db = get_db()
@@ -55,51 +161,33 @@ def get_ingredient_types():
     return jsonify(types)
 
 @app.route('/api/unit-types', methods=['GET'])
+@cached_get('unit_types')
 def get_unit_types():
-    """Get all unit types."""
+    """Get all unit types (served from the in-process unit registry)."""
     category = request.args.get('category')
-    db = get_db()
-    cursor = db.cursor()
-    
-    if category:
-        cursor.execute("SELECT id, name, category FROM unit_types WHERE category = ? ORDER BY name", (category,))
-    else:
-        cursor.execute("SELECT id, name, category FROM unit_types ORDER BY name")
-    
-    units = [dict(row) for row in cursor.fetchall()]
-    db.close()
-    return jsonify(units)
+    return jsonify(get_unit_registry().list_units(category))
 
 @app.route('/api/ingredients', methods=['GET'])
+@cached_get('ingredients', 'ingredient_types', 'unit_types')
 def get_ingredients():
-    """Get all ingredients, optionally filtered by type."""
-    type_id = request.args.get('type_id')
-    db = get_db()
-    cursor = db.cursor()
+    """
+    Get all ingredients ordered by name, optionally filtered by type.
     
-    if type_id:
-        cursor.execute("""
-            SELECT i.id, i.name, i.type_id, i.shopping_unit_id,
-                   it.name as type_name, ut.name as shopping_unit_name
-            FROM ingredients i
-            JOIN ingredient_types it ON i.type_id = it.id
-            JOIN unit_types ut ON i.shopping_unit_id = ut.id
-            WHERE i.type_id = ?
-            ORDER BY i.name
-        """, (type_id,))
-    else:
-        cursor.execute("""
-            SELECT i.id, i.name, i.type_id, i.shopping_unit_id,
-                   it.name as type_name, ut.name as shopping_unit_name
-            FROM ingredients i
-            JOIN ingredient_types it ON i.type_id = it.id
-            JOIN unit_types ut ON i.shopping_unit_id = ut.id
-            ORDER BY i.name
-        """)
-    
-    ingredients = [dict(row) for row in cursor.fetchall()]
-    db.close()
-    return jsonify(ingredients)
+    Query parameters (see get_recipes): type_id, fields, limit, after, count
+    """
+    type_id = request.args.get('type_id') or None
+    try:
+        fields = parse_fields(request.args.get('fields'), INGREDIENT_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if is_count_request():
+        return jsonify({'count': count_rows('ingredients', type_id)})
+    
+    ingredients, next_cursor = list_ingredients(type_id, fields, limit, after)
+    return paged_response(ingredients, next_cursor)
 
 @app.route('/api/ingredients', methods=['POST'])
 def create_ingredient():
@@ -152,6 +240,9 @@ def create_ingredient():
         
         db.commit()
         db.close()
+        invalidate_conversion_graphs([ingredient_id])
+        invalidate_store_sections()
+        bump_data_version('ingredients')
         return jsonify({'id': ingredient_id}), 201
     
     except Exception as e:
@@ -159,80 +250,161 @@ def create_ingredient():
         db.close()
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/store-sections', methods=['GET'])
+def get_store_sections():
+    """Get the store sections in display order and the section of every ingredient."""
+    sections = get_store_section_map()
+    return jsonify({
+        'sections': [{'key': key, 'label': label} for key, label in STORE_SECTIONS],
+        'ingredients': {str(ingredient_id): section for ingredient_id, section in sections.items()}
+    })
+
 @app.route('/api/default-ingredients', methods=['GET'])
 def get_default_ingredients():
     """Get list of ingredients with default conversion rules available."""
     return jsonify(get_available_default_ingredients())
 
 @app.route('/api/recipes', methods=['GET'])
+@cached_get('recipes', 'ingredients', 'unit_types')
 def get_recipes():
-    """Get all recipes, optionally filtered by ingredients."""
-    # Check for ingredient search parameter
-    ingredient_query = request.args.get('ingredients', '').strip()
+    """
+    Get all recipes ordered by name, optionally filtered by ingredients.
     
-    db = get_db()
-    cursor = db.cursor()
+    Query parameters:
+        ingredients: Ingredient or sub-recipe names, separated by commas or spaces
+        match: 'any' (default) to match recipes using any term, 'all' to require every term
+        sort: 'name' (default) or 'rank' to order matches by relevance
+        fields: Comma-separated fields to return (default all)
+        limit: Page size; a Link header points to the next page when there is one
+        after: Cursor of the next page (from the Link header; sort=name only)
+        count: If true, return {"count": n} instead of the recipes
+    """
+    ingredient_terms = parse_search_terms(request.args.get('ingredients', ''))
+    match = request.args.get('match', 'any')
+    sort = request.args.get('sort', 'name')
     
-    if ingredient_query:
-        # Search recipes by ingredient names
-        # Split by comma or space to allow multiple ingredients
-        ingredient_terms = [term.strip().lower() for term in ingredient_query.replace(',', ' ').split() if term.strip()]
+    try:
+        fields = parse_fields(request.args.get('fields'), RECIPE_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+        if after is not None and sort != 'name':
+            raise ValueError("after is only supported with sort=name")
         
         if not ingredient_terms:
-            # Empty search, return all recipes
-            cursor.execute("""
-                SELECT r.id, r.name, r.is_sub_recipe, r.yield_quantity, r.yield_unit_id, r.page_number,
-                       ut.name as yield_unit_name
-                FROM recipes r
-                JOIN unit_types ut ON r.yield_unit_id = ut.id
-                ORDER BY r.name
-            """)
-        else:
-            # Build query to find recipes containing any of the ingredient terms
-            # Use LIKE for partial matching (case-insensitive via LOWER)
-            # SQLite doesn't support LIKE ANY, so we use OR conditions
-            like_patterns = [f'%{term}%' for term in ingredient_terms]
-            
-            # Build WHERE clause with OR conditions for each term
-            ingredient_conditions = []
-            sub_recipe_conditions = []
-            all_params = []
-            
-            for pattern in like_patterns:
-                ingredient_conditions.append("(ri.item_type = 'ingredient' AND LOWER(i.name) LIKE ?)")
-                sub_recipe_conditions.append("(ri.item_type = 'sub_recipe' AND LOWER(sr.name) LIKE ?)")
-                all_params.extend([pattern, pattern])
-            
-            where_clause = "(" + " OR ".join(ingredient_conditions) + ") OR (" + " OR ".join(sub_recipe_conditions) + ")"
-            
-            query = f"""
-                SELECT DISTINCT r.id, r.name, r.is_sub_recipe, r.yield_quantity, r.yield_unit_id, r.page_number,
-                       ut.name as yield_unit_name
-                FROM recipes r
-                JOIN unit_types ut ON r.yield_unit_id = ut.id
-                JOIN recipe_items ri ON r.id = ri.recipe_id
-                LEFT JOIN ingredients i ON ri.ingredient_id = i.id
-                LEFT JOIN recipes sr ON ri.sub_recipe_id = sr.id
-                WHERE {where_clause}
-                ORDER BY r.name
-            """
-            
-            cursor.execute(query, all_params)
-    else:
-        # No ingredient filter, return all recipes
-        cursor.execute("""
-            SELECT r.id, r.name, r.is_sub_recipe, r.yield_quantity, r.yield_unit_id, r.page_number,
-                   ut.name as yield_unit_name
-            FROM recipes r
-            JOIN unit_types ut ON r.yield_unit_id = ut.id
-            ORDER BY r.name
-        """)
-    
-    recipes = [dict(row) for row in cursor.fetchall()]
-    db.close()
-    return jsonify(recipes)
+            if is_count_request():
+                return jsonify({'count': count_rows('recipes')})
+            recipes, next_cursor = list_recipes(fields, limit, after)
+            return paged_response(recipes, next_cursor)
+        
+        recipes = search_recipes(ingredient_terms, match=match, sort=sort)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if is_count_request():
+        return jsonify({'count': len(recipes)})
+    recipes, next_cursor = paginate_rows(recipes, fields, limit, after)
+    if sort != 'name':
+        # Cursors follow name order; a ranked search only returns its top matches
+        next_cursor = None
+    return paged_response(recipes, next_cursor)
+
+@app.route('/api/recipes/search', methods=['GET'])
+def search_recipes_as_you_type():
+    """
+    Find recipes by name or ingredient, ranked, from the in-memory recipe index.
+    
+    Query parameters:
+        q: Search string (empty lists recipes by name)
+        limit: Maximum number of results (default 20, at most 100)
+        exclude: Comma-separated IDs of recipes to leave out (e.g. already selected)
+        ids: Comma-separated recipe IDs to return instead of searching (e.g. to restore a selection)
+    """
+    try:
+        limit = int(request.args.get('limit', SEARCH_RESULT_LIMIT))
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        exclude = [int(value) for value in request.args.get('exclude', '').split(',') if value.strip()]
+        ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    index = get_recipe_index()
+    if 'ids' in request.args:
+        return jsonify(index.get(ids))
+    return jsonify(index.search(request.args.get('q', ''), min(limit, MAX_SEARCH_RESULT_LIMIT), exclude))
+
+@app.route('/api/bootstrap', methods=['GET'])
+@cached_get(*DATA_TABLES)
+def get_bootstrap():
+    """
+    Get the reference data a page starts with in one response (see backend/bootstrap.py).
+    
+    Query parameters:
+        include: Comma-separated sections (ingredient_types, unit_types, ingredients,
+            recipes); default all
+    """
+    try:
+        sections = parse_include(request.args.get('include'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(load_bootstrap(sections))
+
+@app.route('/api/bundle', methods=['GET'])
+@cached_get(*BUNDLE_TABLES)
+def get_bundle():
+    """
+    Export the data the shopping page needs to compute lists locally (see backend/bundle.py).
+    
+    Lists computed from the bundle are previews; POST /api/shopping-lists stays authoritative.
+    """
+    return jsonify(build_bundle())
+
+@app.route('/api/batch', methods=['POST'])
+def batch_get():
+    """
+    Run several GET requests for /api/ endpoints in one round trip (see backend/batch.py).
+    
+    Body: {"requests": [{"path": "/api/unit-types"}, {"path": "/api/recipes?fields=id,name"}]}
+    
+    Returns {"responses": [{"path", "status", "body", "headers"}, ...]} in request order;
+    each request succeeds or fails on its own.
+    """
+    try:
+        paths = parse_batch_requests(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return compress_response(jsonify({'responses': run_batch(paths)}))
+
+@app.route('/api/recipes/export', methods=['GET'])
+def export_recipes_endpoint():
+    """Stream all recipes as JSON Lines (see backend/recipe_io.py for the format)."""
+    return Response(
+        stream_with_context(export_recipes()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=recipes.jsonl'}
+    )
+
+@app.route('/api/recipes/bulk', methods=['POST'])
+def import_recipes_endpoint():
+    """Create recipes from a JSON Lines body in one transaction."""
+    try:
+        records = parse_recipe_lines(request.stream)
+        recipe_ids, sub_recipe_ids = import_recipes(records)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    
+    for recipe_id, sub_ids in sub_recipe_ids.items():
+        update_recipe_dependencies(recipe_id, sub_ids)
+    bump_data_version('recipes')
+    return jsonify({
+        'imported': len(recipe_ids),
+        'recipes': [{'id': recipe_id, 'name': name} for name, recipe_id in recipe_ids.items()]
+    }), 201
 
 @app.route('/api/recipes/<int:recipe_id>', methods=['GET'])
+@cached_get('recipes', 'ingredients', 'unit_types')
 def get_recipe(recipe_id):
     """Get a single recipe with its items."""
     db = get_db()
@@ -310,9 +482,7 @@ def create_recipe():
     try:
         # Validate sub-recipe yield unit (must be standard unit, not "servings")
         if data.get('is_sub_recipe'):
-            cursor.execute("SELECT category FROM unit_types WHERE id = ?", (data['yield_unit_id'],))
-            unit = cursor.fetchone()
-            if unit and unit['category'] == 'special':
+            if get_unit_registry(db).category_of(data['yield_unit_id']) == 'special':
                 return jsonify({'error': 'Sub-recipes cannot have "servings" as yield unit'}), 400
         
         cursor.execute("""
@@ -322,13 +492,13 @@ def create_recipe():
         
         recipe_id = cursor.lastrowid
         
+        # Check all sub-recipes for circular references at once
+        sub_recipe_ids = [item['sub_recipe_id'] for item in data.get('items', []) if item['item_type'] == 'sub_recipe']
+        if would_create_cycle(recipe_id, sub_recipe_ids, db):
+            raise ValueError("Cannot add sub-recipe: it would create a circular reference")
+        
         # Add recipe items
         for item in data.get('items', []):
-            # Check for circular reference if adding sub-recipe
-            if item['item_type'] == 'sub_recipe':
-                if check_circular_reference(recipe_id, item['sub_recipe_id'], db):
-                    raise ValueError("Cannot add sub-recipe: it would create a circular reference")
-            
             cursor.execute("""
                 INSERT INTO recipe_items (recipe_id, item_type, ingredient_id, sub_recipe_id,
                                          quantity, unit_id, size_qualifier, preparation_notes)
@@ -346,6 +516,8 @@ def create_recipe():
         
         db.commit()
         db.close()
+        update_recipe_dependencies(recipe_id, sub_recipe_ids)
+        bump_data_version('recipes')
         return jsonify({'id': recipe_id}), 201
     
     except Exception as e:
@@ -373,11 +545,14 @@ def update_recipe(recipe_id):
         
         # Validate yield unit if this is a sub-recipe
         if is_sub_recipe:
-            cursor.execute("SELECT category FROM unit_types WHERE id = ?", (data['yield_unit_id'],))
-            unit = cursor.fetchone()
-            if unit and unit['category'] == 'special':
+            if get_unit_registry(db).category_of(data['yield_unit_id']) == 'special':
                 return jsonify({'error': 'Sub-recipes cannot have "servings" as yield unit'}), 400
         
+        # Check all sub-recipes for circular references at once
+        sub_recipe_ids = [item['sub_recipe_id'] for item in data.get('items', []) if item['item_type'] == 'sub_recipe']
+        if would_create_cycle(recipe_id, sub_recipe_ids, db):
+            raise ValueError("Cannot add sub-recipe: it would create a circular reference")
+        
         # Update recipe
         cursor.execute("""
             UPDATE recipes 
@@ -390,11 +565,6 @@ def update_recipe(recipe_id):
         
         # Add new items
         for item in data.get('items', []):
-            # Check for circular reference if adding sub-recipe
-            if item['item_type'] == 'sub_recipe':
-                if check_circular_reference(recipe_id, item['sub_recipe_id'], db):
-                    raise ValueError("Cannot add sub-recipe: it would create a circular reference")
-            
             cursor.execute("""
                 INSERT INTO recipe_items (recipe_id, item_type, ingredient_id, sub_recipe_id,
                                          quantity, unit_id, size_qualifier, preparation_notes)
@@ -412,6 +582,8 @@ def update_recipe(recipe_id):
         
         db.commit()
         db.close()
+        update_recipe_dependencies(recipe_id, sub_recipe_ids)
+        bump_data_version('recipes')
         return jsonify({'id': recipe_id}), 200
     
     except Exception as e:
@@ -449,6 +621,8 @@ def delete_recipe(recipe_id):
         
         db.commit()
         db.close()
+        remove_recipe_dependencies(recipe_id)
+        bump_data_version('recipes')
         
         # Return info about what was deleted
         return jsonify({
@@ -470,62 +644,109 @@ def generate_shopping_list_endpoint():
     recipe_selections = data.get('recipe_selections', [])
     
     try:
-        # Generate shopping list
-        shopping_list = generate_shopping_list(recipe_selections)
+        # Generate shopping list (reused if these selections were just generated)
+        shopping_list = get_shopping_list(recipe_selections)
         
         # Store in history
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            INSERT INTO shopping_lists (recipe_selections, shopping_list_data)
-            VALUES (?, ?)
-        """, (json.dumps(recipe_selections), json.dumps(shopping_list)))
-        db.commit()
-        db.close()
+        snapshot_id = save_snapshot(recipe_selections, shopping_list)
         
         # Return id with shopping list for auditing references
         return jsonify({
-            'id': cursor.lastrowid,
+            'id': snapshot_id,
             'shopping_list': shopping_list
         }), 201
     
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/shopping-lists/update', methods=['POST'])
+def update_shopping_list_endpoint():
+    """
+    Apply selection changes to a previous shopping list without rebuilding it.
+    
+    Body: {"token": "..."} (from a previous update) or {"list_id": 12} (a saved
+    snapshot), plus "changes", e.g. [{"recipe_id": 17, "add_batches": 2},
+    {"recipe_id": 5, "remove": true}, {"recipe_id": 8, "batches": 3}]
+    """
+    data = request.json or {}
+    token = data.get('token')
+    list_id = data.get('list_id')
+    if not token and list_id is None:
+        return jsonify({'error': 'token or list_id is required'}), 400
+    
+    db = get_db()
+    try:
+        recipe_selections = None
+        if not token:
+            recipe_selections = get_snapshot_selections(list_id, db)
+            if recipe_selections is None:
+                return jsonify({'error': 'Snapshot not found'}), 404
+        
+        try:
+            result = update_shopping_list(data.get('changes', []), token, recipe_selections, db)
+        except KeyError:
+            return jsonify({'error': 'Unknown or expired token; update from list_id or generate the list again'}), 404
+        
+        # Store in history like a generated list
+        snapshot_id = save_snapshot(result['recipe_selections'], result['shopping_list'], db)
+        
+        return jsonify({'id': snapshot_id, **result}), 201
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
+
 @app.route('/api/shopping-lists', methods=['GET'])
 def list_shopping_list_snapshots():
-    """List saved shopping list snapshots (audit history)."""
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT id, created_at
-        FROM shopping_lists
-        ORDER BY id DESC
-    """)
-    rows = [dict(row) for row in cursor.fetchall()]
-    db.close()
-    return jsonify(rows)
+    """
+    List saved shopping list snapshots (audit history), newest first.
+    
+    Query: limit (page size, default 50) and before (the last ID of the
+    previous page). A Link header points to the next page when there is one.
+    """
+    try:
+        limit = int(request.args.get('limit', SNAPSHOT_PAGE_SIZE))
+        before = request.args.get('before')
+        before = int(before) if before is not None else None
+    except ValueError:
+        return jsonify({'error': 'limit and before must be integers'}), 400
+    
+    rows, next_cursor = list_snapshots(limit, before)
+    response = jsonify(rows)
+    if next_cursor is not None:
+        response.headers['Link'] = f'</api/shopping-lists?limit={limit}&before={next_cursor}>; rel="next"'
+    return response
 
 @app.route('/api/shopping-lists/<int:snapshot_id>', methods=['GET'])
 def get_shopping_list_snapshot(snapshot_id):
     """Get a specific shopping list snapshot with recipe selections and data."""
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT id, created_at, recipe_selections, shopping_list_data
-        FROM shopping_lists
-        WHERE id = ?
-    """, (snapshot_id,))
-    row = cursor.fetchone()
-    db.close()
-    if not row:
+    snapshot = get_snapshot(snapshot_id)
+    if not snapshot:
         return jsonify({'error': 'Snapshot not found'}), 404
-    return jsonify({
-        'id': row['id'],
-        'created_at': row['created_at'],
-        'recipe_selections': json.loads(row['recipe_selections']),
-        'shopping_list': json.loads(row['shopping_list_data'])
-    })
+    return jsonify(snapshot)
+
+@app.route('/api/shopping-lists/prune', methods=['POST'])
+def prune_shopping_list_snapshots():
+    """
+    Delete old snapshots.
+    
+    Body: {"keep_latest": 100} and/or {"older_than_days": 90}
+    """
+    data = request.json or {}
+    keep_latest = data.get('keep_latest')
+    older_than_days = data.get('older_than_days')
+    if keep_latest is None and older_than_days is None:
+        return jsonify({'error': 'keep_latest or older_than_days is required'}), 400
+    
+    try:
+        result = prune_snapshots(
+            int(keep_latest) if keep_latest is not None else None,
+            int(older_than_days) if older_than_days is not None else None
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
 
 @app.route('/api/shopping-list/formatted-text', methods=['POST'])
 def get_formatted_shopping_list_text():
@@ -541,10 +762,10 @@ def get_formatted_shopping_list_text():
     if not recipe_selections:
         return jsonify({'error': 'No recipe selections provided'}), 400
     
-    # Generate shopping list
+    # Reuse the list generated for these selections by POST /api/shopping-lists
     db = get_db()
     try:
-        shopping_list = generate_shopping_list(recipe_selections, db)
+        shopping_list = get_shopping_list(recipe_selections, db)
         
         # Organize by sections
         organized_list = organize_shopping_list_by_sections(shopping_list, db)
@@ -559,7 +780,7 @@ def get_formatted_shopping_list_text():
                 cursor.execute(f"SELECT id, name, page_number FROM recipes WHERE id IN ({placeholders})", ids)
                 for row in cursor.fetchall():
                     recipes_info.append({'id': row['id'], 'name': row['name'], 'page_number': row['page_number']})
-
+        
         # Format as text with checked items separated
         formatted_text = format_shopping_list_text(organized_list, recipes_info, checked_item_ids, shopping_list)
         
@@ -569,6 +790,34 @@ def get_formatted_shopping_list_text():
     finally:
         db.close()
 
+@app.route('/api/sms', methods=['POST'])
+def send_sms():
+    """
+    Queue a text message (e.g. a formatted shopping list) for delivery.
+    
+    Body: {"phone_number": "+15551234567", "text": "..."}
+    Returns 202 with the job ID right away; poll GET /api/sms/<job_id> for the outcome.
+    """
+    data = request.json or {}
+    phone_number = (data.get('phone_number') or '').strip()
+    text = data.get('text') or ''
+    if not phone_number or not text.strip():
+        return jsonify({'error': 'phone_number and text are required'}), 400
+    
+    try:
+        job_id = get_sms_queue().enqueue(phone_number, text)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+@app.route('/api/sms/<int:job_id>', methods=['GET'])
+def get_sms_status(job_id):
+    """Get an SMS job's status (queued, sending, sent or failed), attempts and last error."""
+    job = get_sms_job(job_id)
+    if not job:
+        return jsonify({'error': 'SMS job not found'}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     # Run on 0.0.0.0 to allow access from iPad on same network
     # Change to '127.0.0.1' if you only want local access
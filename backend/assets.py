@@ -0,0 +1,61 @@
+"""
+Content hash of the frontend files for service worker versioning.
+
+There is no build step, so instead of hashed file names the service worker
+script is served with ASSET_VERSION filled in from a hash of every file it
+can cache. Changing any frontend file changes the script, which makes
+browsers install the new worker; it precaches into a cache named after the
+new version and deletes the old one.
+"""
+import hashlib
+import threading
+from pathlib import Path
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / 'frontend'
+SERVICE_WORKER = 'service-worker.js'
+VERSION_PLACEHOLDER = '__ASSET_VERSION__'
+
+# Hex digits of the hash used as the version
+ASSET_VERSION_LENGTH = 12
+
+_cached = (None, None)
+_lock = threading.Lock()
+
+
+def _signature(paths):
+    return tuple((str(path), path.stat().st_mtime_ns, path.stat().st_size) for path in paths)
+
+
+def asset_version():
+    """
+    Get the hash of the frontend files (other than the service worker).
+    
+    Recomputed only when a file is added, removed or modified.
+    
+    Returns:
+        Hex string of ASSET_VERSION_LENGTH characters
+    """
+    global _cached
+    paths = sorted(
+        path for path in FRONTEND_DIR.rglob('*')
+        if path.is_file() and path.name != SERVICE_WORKER
+    )
+    signature = _signature(paths)
+    with _lock:
+        if _cached[0] == signature:
+            return _cached[1]
+        
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update(str(path.relative_to(FRONTEND_DIR)).encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(path.read_bytes())
+        version = digest.hexdigest()[:ASSET_VERSION_LENGTH]
+        _cached = (signature, version)
+        return version
+
+
+def render_service_worker():
+    """Get the service worker script with the current asset version filled in."""
+    script = (FRONTEND_DIR / SERVICE_WORKER).read_text(encoding='utf-8')
+    return script.replace(VERSION_PLACEHOLDER, asset_version(), 1)
@@ -0,0 +1,95 @@
+"""
+Several API reads in one request.
+
+POST /api/batch runs GET requests for other /api/ endpoints in-process and
+returns their responses together, so a page that needs several resources
+pays for one round trip. The requests run one after another on one pooled
+connection (see database.pinned_connection()) inside a single read
+transaction, so they all see the same snapshot of the database.
+
+Each response keeps its status, JSON body and validators, and goes through
+the same views, caches and error handling as a direct request.
+"""
+from flask import current_app
+
+from backend import database
+
+# Most requests accepted in one batch
+MAX_BATCH_REQUESTS = 20
+
+# Paths that cannot be batched
+EXCLUDED_PATH_PREFIXES = ('/api/batch', '/api/_debug/')
+
+# Headers of each response that are passed on
+RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Link')
+
+
+def parse_batch_requests(data):
+    """
+    Validate the body of a batch request.
+    
+    Args:
+        data: {"requests": [{"path": "/api/..."}, ...]}; plain path strings are accepted too
+    
+    Returns:
+        List of paths (with their query strings)
+    
+    Raises:
+        ValueError: If the body is malformed, too long or names a path that cannot be batched
+    """
+    requests = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(requests, list) or not requests:
+        raise ValueError("requests must be a non-empty list")
+    if len(requests) > MAX_BATCH_REQUESTS:
+        raise ValueError(f"At most {MAX_BATCH_REQUESTS} requests can be batched")
+    
+    paths = []
+    for entry in requests:
+        path = entry.get('path') if isinstance(entry, dict) else entry
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            raise ValueError(f"Invalid path: {path!r} (must be an /api/ path)")
+        if path.startswith(EXCLUDED_PATH_PREFIXES):
+            raise ValueError(f"{path} cannot be batched")
+        paths.append(path)
+    return paths
+
+
+def _dispatch(path):
+    """Run a GET request for path in-process and describe its response."""
+    with current_app.test_request_context(path, method='GET'):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception as e:
+            # Unhandled errors become 500s, as for a direct request
+            current_app.logger.exception("Batched request %s failed", path)
+            return {'path': path, 'status': 500, 'body': {'error': str(e)}}
+        
+        if response.is_streamed:
+            response.close()
+            return {'path': path, 'status': 400, 'body': {'error': "Streamed responses cannot be batched"}}
+        
+        result = {
+            'path': path,
+            'status': response.status_code,
+            'body': response.get_json(silent=True),
+        }
+        headers = {name: response.headers[name] for name in RESPONSE_HEADERS if name in response.headers}
+        if headers:
+            result['headers'] = headers
+        return result
+
+
+def run_batch(paths):
+    """
+    Run GET requests on one connection and one read transaction.
+    
+    Args:
+        paths: Paths from parse_batch_requests()
+    
+    Returns:
+        List of {"path", "status", "body"[, "headers"]} in request order
+    """
+    with database.pinned_connection() as db:
+        # Deferred: the snapshot is taken by the first read and kept until the block exits
+        db.execute("BEGIN")
+        return [_dispatch(path) for path in paths]
@@ -0,0 +1,96 @@
+"""
+Reference data a page needs to start, in one response.
+
+GET /api/bootstrap returns any of the ingredient types, unit types,
+ingredients and recipes (the same lists as their own endpoints return
+without parameters), read on one connection inside a single read
+transaction, so a page load costs one round trip and sees one consistent
+snapshot. Responses are cached per table versions by http_cache.cached_get().
+"""
+from backend import database
+from backend.listing import list_ingredients, list_recipes
+from backend.units import get_unit_registry
+
+# Sections, in the order they are read
+BOOTSTRAP_SECTIONS = ('ingredient_types', 'unit_types', 'ingredients', 'recipes')
+
+
+def parse_include(value):
+    """
+    Parse the include parameter.
+    
+    Args:
+        value: Comma-separated section names, or None/empty for every section
+    
+    Returns:
+        List of section names in BOOTSTRAP_SECTIONS order
+    
+    Raises:
+        ValueError: If a section is unknown
+    """
+    if not value:
+        return list(BOOTSTRAP_SECTIONS)
+    requested = {section.strip() for section in value.split(',') if section.strip()}
+    unknown = requested - set(BOOTSTRAP_SECTIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown sections: {', '.join(sorted(unknown))}. Available: {', '.join(BOOTSTRAP_SECTIONS)}"
+        )
+    return [section for section in BOOTSTRAP_SECTIONS if section in requested]
+
+
+def _ingredient_types(db):
+    cursor = db.cursor()
+    cursor.execute("SELECT id, name FROM ingredient_types ORDER BY name")
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def _unit_types(db):
+    return get_unit_registry(db).list_units()
+
+
+def _ingredients(db):
+    return list_ingredients(db=db)[0]
+
+
+def _recipes(db):
+    return list_recipes(db=db)[0]
+
+
+SECTION_LOADERS = {
+    'ingredient_types': _ingredient_types,
+    'unit_types': _unit_types,
+    'ingredients': _ingredients,
+    'recipes': _recipes,
+}
+
+
+def load_bootstrap(sections, db=None):
+    """
+    Load sections in one read transaction.
+    
+    Args:
+        sections: Names from parse_include()
+        db: Optional database connection (a transaction already open on it is used as is)
+    
+    Returns:
+        Dictionary mapping each section name to its list
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    own_transaction = not db.in_transaction
+    try:
+        if own_transaction:
+            # Deferred: the snapshot is taken by the first read and kept until the end
+            db.execute("BEGIN")
+        return {section: SECTION_LOADERS[section](db) for section in sections}
+    
+    finally:
+        if own_transaction and db.in_transaction:
+            db.rollback()
+        if close_after:
+            db.close()
@@ -0,0 +1,157 @@
+"""
+Precompiled data bundle for computing shopping lists in the browser.
+
+The shopping page recomputes its list on every batch change. Instead of a
+round trip per change, it downloads this bundle once and runs the same
+aggregation as services.build_shopping_list() locally (frontend/js/aggregate.js);
+lists are still generated by the server when they are saved.
+
+The bundle is a compact, positional form of everything the aggregation reads:
+
+- units: [id, name, category]
+- ingredients: [id, name, shopping_unit_id, factors, size_rules], where
+  factors are [from_unit_id, to_unit_id, factor] triples taken from the
+  ingredient's ConversionGraph, only for the units its recipe items use and
+  the units a list converts them to (shopping unit, size estimation
+  reference unit and, for container units, cup and gram), and size_rules
+  are [size_qualifier, reference_unit_id, reference_value] in rule order
+- recipes: [id, name, yield_quantity, yield_unit_id, items], where items are
+  ["i", ingredient_id, quantity, unit_id, size_qualifier] or
+  ["s", sub_recipe_id, quantity, unit_id] in item order
+
+Its version is the ETag of the tables it is built from, so a client can
+tell whether its copy is current.
+"""
+from backend import database
+from backend.conversions import get_conversion_graphs
+from backend.http_cache import make_etag
+from backend.services import CONTAINER_UNITS, get_reference_unit_id
+from backend.shopping_cache import get_table_versions
+from backend.units import get_unit_registry
+
+# Tables the bundle is built from
+BUNDLE_TABLES = ('unit_types', 'ingredients', 'recipes')
+
+
+def get_bundle_version():
+    """Get the version of the bundle for the current data."""
+    return make_etag(get_table_versions(BUNDLE_TABLES))
+
+
+def build_bundle(db=None):
+    """
+    Build the shopping list data bundle.
+    
+    Args:
+        db: Optional database connection
+    
+    Returns:
+        Dictionary with 'version', 'container_units', 'units', 'ingredients' and 'recipes'
+    """
+    # Read the version first: a write committed while building bumps it
+    version = get_bundle_version()
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        units = get_unit_registry(db)
+        cursor = db.cursor()
+        
+        cursor.execute("""
+            SELECT i.id, i.name, i.shopping_unit_id, ut.name AS shopping_unit_name
+            FROM ingredients i
+            JOIN unit_types ut ON i.shopping_unit_id = ut.id
+            ORDER BY i.id
+        """)
+        ingredient_rows = cursor.fetchall()
+        
+        size_rules = {}
+        cursor.execute("""
+            SELECT ingredient_id, size_qualifier, reference_unit_id, reference_value
+            FROM size_estimation_rules
+            ORDER BY id
+        """)
+        for row in cursor.fetchall():
+            size_rules.setdefault(row['ingredient_id'], []).append(row)
+        
+        item_units = {}
+        cursor.execute("""
+            SELECT DISTINCT ingredient_id, unit_id
+            FROM recipe_items
+            WHERE item_type != 'sub_recipe'
+        """)
+        for row in cursor.fetchall():
+            item_units.setdefault(row['ingredient_id'], []).append(row['unit_id'])
+        
+        cursor.execute("""
+            SELECT r.id, r.name, r.yield_quantity, r.yield_unit_id
+            FROM recipes r
+            JOIN unit_types ut ON r.yield_unit_id = ut.id
+            ORDER BY r.id
+        """)
+        recipe_rows = cursor.fetchall()
+        
+        recipe_items = {}
+        cursor.execute("""
+            SELECT recipe_id, item_type, ingredient_id, sub_recipe_id, quantity, unit_id, size_qualifier
+            FROM recipe_items
+            ORDER BY id
+        """)
+        for row in cursor.fetchall():
+            if row['item_type'] == 'sub_recipe':
+                item = ['s', row['sub_recipe_id'], row['quantity'], row['unit_id']]
+            else:
+                item = ['i', row['ingredient_id'], row['quantity'], row['unit_id'], row['size_qualifier']]
+            recipe_items.setdefault(row['recipe_id'], []).append(item)
+        
+        graphs = get_conversion_graphs([row['id'] for row in ingredient_rows if row['id'] in item_units], db)
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    volume_unit_id = units.id_for('cup')
+    weight_unit_id = units.id_for('gram')
+    
+    ingredients = []
+    for row in ingredient_rows:
+        ingredient_id = row['id']
+        rules = size_rules.get(ingredient_id, [])
+        
+        targets = [row['shopping_unit_id']]
+        reference_unit_id = get_reference_unit_id(rules, units)
+        if reference_unit_id:
+            targets.append(reference_unit_id)
+        if row['shopping_unit_name'] in CONTAINER_UNITS:
+            targets.extend(unit_id for unit_id in (volume_unit_id, weight_unit_id) if unit_id)
+        
+        factors = []
+        for from_unit_id in item_units.get(ingredient_id, []):
+            for to_unit_id in dict.fromkeys(targets):
+                # The same unit needs no factor
+                factor = None if from_unit_id == to_unit_id else graphs[ingredient_id].factor(from_unit_id, to_unit_id)
+                if factor is not None:
+                    factors.append([from_unit_id, to_unit_id, factor])
+        
+        ingredients.append([
+            ingredient_id,
+            row['name'],
+            row['shopping_unit_id'],
+            factors,
+            [[rule['size_qualifier'], rule['reference_unit_id'], rule['reference_value']] for rule in rules]
+        ])
+    
+    return {
+        'version': version,
+        'container_units': CONTAINER_UNITS,
+        'units': [[unit.id, unit.name, unit.category] for unit in sorted(units.by_id.values())],
+        'ingredients': ingredients,
+        'recipes': [
+            [row['id'], row['name'], row['yield_quantity'], row['yield_unit_id'], recipe_items.get(row['id'], [])]
+            for row in recipe_rows
+        ],
+    }
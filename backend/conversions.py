@@ -0,0 +1,205 @@
+"""
+Precompiled per-ingredient unit conversion graphs.
+
+Each ingredient's conversion_rules (and their reciprocals) are combined with
+the standard volume and weight equivalences into a graph whose nodes are
+unit IDs. All reachable unit pairs are resolved once when the graph is
+compiled, so any unit-to-unit conversion is a single dictionary lookup and
+conversions that need several hops (e.g. tablespoon → cup → package) work.
+
+A pair of units joined by a single rule, reciprocal or standard equivalence
+always converts with that edge, so adding multi-hop paths does not change
+any direct conversion. Pairs that need several hops go through the
+ingredient's own rules when they connect them (e.g. tablespoon → package →
+cup is not replaced by a path through a standard equivalence); standard
+equivalences only fill in the pairs the rules cannot reach.
+"""
+import threading
+from collections import deque
+
+from backend import database
+from backend.units import get_unit_registry
+
+
+class ConversionGraph:
+    """
+    All-pairs conversion factors for one ingredient.
+    
+    Attributes:
+        factors: Conversion factor by (from_unit_id, to_unit_id)
+    """
+    
+    __slots__ = ('factors',)
+    
+    def __init__(self, factors):
+        self.factors = factors
+    
+    def factor(self, from_unit_id, to_unit_id):
+        """Get the factor converting from_unit_id to to_unit_id, or None if there is no path."""
+        if from_unit_id == to_unit_id:
+            return 1.0
+        return self.factors.get((from_unit_id, to_unit_id))
+    
+    def convert(self, quantity, from_unit_id, to_unit_id):
+        """Convert a quantity, or return None if there is no conversion path."""
+        factor = self.factor(from_unit_id, to_unit_id)
+        if factor is None:
+            return None
+        return quantity * factor
+
+
+def compile_conversion_graph(rules, units):
+    """
+    Compile conversion rules into a ConversionGraph.
+    
+    Pairs are resolved in three passes, each only filling pairs the earlier
+    ones left open:
+    
+    1. Direct edges: a rule, else the reciprocal of a rule, else a standard
+       volume/weight equivalence.
+    2. The shortest path using only the rules and their reciprocals.
+    3. The shortest path also using standard equivalences.
+    
+    Args:
+        rules: Iterable of (from_unit_id, to_unit_id, conversion_factor)
+        units: UnitRegistry providing standard volume and weight factors
+    
+    Returns:
+        ConversionGraph
+    """
+    rules = list(rules)
+    rule_edges = {}
+    edges = {}
+    
+    def add_edge(graph, from_unit_id, to_unit_id, factor):
+        if from_unit_id != to_unit_id:
+            graph.setdefault(from_unit_id, []).append((to_unit_id, factor))
+    
+    for graph in (rule_edges, edges):
+        for from_unit_id, to_unit_id, factor in rules:
+            add_edge(graph, from_unit_id, to_unit_id, factor)
+        for from_unit_id, to_unit_id, factor in rules:
+            if factor:
+                add_edge(graph, to_unit_id, from_unit_id, 1.0 / factor)
+    for base_factors in (units.tsp_factors, units.gram_factors):
+        for from_unit_id, from_base in base_factors.items():
+            for to_unit_id, to_base in base_factors.items():
+                add_edge(edges, from_unit_id, to_unit_id, from_base / to_base)
+    
+    factors = {}
+    for from_unit_id, targets in edges.items():
+        for to_unit_id, factor in targets:
+            factors.setdefault((from_unit_id, to_unit_id), factor)
+    factors = _shortest_paths(rule_edges, factors)
+    factors = _shortest_paths(edges, factors)
+    
+    return ConversionGraph(factors)
+
+
+def _shortest_paths(edges, factors):
+    """
+    Add the factor of the shortest path between every pair of units not in factors yet.
+    
+    Breadth-first search from every unit; at equal length the edge listed
+    first wins. Returns a new dictionary.
+    """
+    factors = dict(factors)
+    for source in edges:
+        seen = {source}
+        queue = deque([(source, 1.0)])
+        while queue:
+            unit_id, factor = queue.popleft()
+            for next_unit_id, edge_factor in edges.get(unit_id, []):
+                if next_unit_id in seen:
+                    continue
+                seen.add(next_unit_id)
+                factors.setdefault((source, next_unit_id), factor * edge_factor)
+                queue.append((next_unit_id, factor * edge_factor))
+    return factors
+
+
+_graphs = {}
+_graphs_db_path = None
+_graphs_version = 0  # Bumped on invalidation so a concurrent compile is not installed stale
+_graphs_lock = threading.Lock()
+
+
+def get_conversion_graphs(ingredient_ids, db=None):
+    """
+    Get compiled conversion graphs for several ingredients.
+    
+    Graphs that are not cached yet are built from one set-based query.
+    
+    Args:
+        ingredient_ids: Iterable of ingredient IDs
+        db: Optional database connection
+    
+    Returns:
+        Dictionary mapping ingredient ID to ConversionGraph
+    """
+    global _graphs, _graphs_db_path
+    
+    ingredient_ids = list(dict.fromkeys(ingredient_ids))
+    with _graphs_lock:
+        if _graphs_db_path != str(database.DB_PATH):
+            _graphs = {}
+            _graphs_db_path = str(database.DB_PATH)
+        result = {i: _graphs[i] for i in ingredient_ids if i in _graphs}
+        version = _graphs_version
+    missing = [i for i in ingredient_ids if i not in result]
+    if not missing:
+        return result
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        units = get_unit_registry(db)
+        cursor = db.cursor()
+        rules = {i: [] for i in missing}
+        for row in database.fetch_in(cursor, """
+            SELECT ingredient_id, from_unit_id, to_unit_id, conversion_factor
+            FROM conversion_rules
+            WHERE ingredient_id IN ({placeholders})
+            ORDER BY id
+        """, missing):
+            rules[row['ingredient_id']].append(
+                (row['from_unit_id'], row['to_unit_id'], row['conversion_factor'])
+            )
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    compiled = {i: compile_conversion_graph(rules[i], units) for i in missing}
+    with _graphs_lock:
+        if _graphs_db_path == str(database.DB_PATH) and version == _graphs_version:
+            _graphs.update(compiled)
+    result.update(compiled)
+    return result
+
+
+def get_conversion_graph(ingredient_id, db=None):
+    """Get the compiled conversion graph for one ingredient."""
+    return get_conversion_graphs([ingredient_id], db)[ingredient_id]
+
+
+def invalidate_conversion_graphs(ingredient_ids=None):
+    """
+    Drop cached graphs after conversion_rules change.
+    
+    Args:
+        ingredient_ids: Ingredients whose rules changed, or None to drop all
+    """
+    global _graphs_version
+    
+    with _graphs_lock:
+        _graphs_version += 1
+        if ingredient_ids is None:
+            _graphs.clear()
+        else:
+            for ingredient_id in ingredient_ids:
+                _graphs.pop(ingredient_id, None)
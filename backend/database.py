@@ -1,16 +1,234 @@
 """
 Database initialization and connection management.
+
+Connections are pooled: get_db() hands out a long-lived connection and
+close() returns it to the pool instead of closing the file.
 """
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 DB_PATH = Path(__file__).parent.parent / "database.db"
 
+# Maximum number of IDs bound in a single IN (...) clause
+MAX_IN_PARAMETERS = 500
+
+# Maximum number of idle connections kept open by the pool
+POOL_MAX_IDLE = 8
+
+# Pragmas applied once to every new physical connection
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",      # 8 MB page cache
+    "PRAGMA mmap_size = 67108864",    # 64 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+]
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() returns it to the pool."""
+    
+    def close(self):
+        _pool.release(self)
+    
+    def close_physical(self):
+        """Really close the underlying database handle."""
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+    """
+    Pool of reusable SQLite connections.
+    
+    Idle connections are kept in a LIFO stack so a thread that releases and
+    re-acquires a connection usually gets the same (warm) one back.
+    Connections checked out by a thread are tracked so release_connections()
+    can return any that were not closed, e.g. at the end of a Flask request.
+    A thread can pin a connection so every acquire() returns it until unpin().
+    """
+    
+    def __init__(self, max_idle=POOL_MAX_IDLE):
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _checked_out(self):
+        if not hasattr(self._local, 'connections'):
+            self._local.connections = []
+        return self._local.connections
+    
+    def _connect(self, path):
+        conn = sqlite3.connect(path, factory=PooledConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.db_path = path
+        return conn
+    
+    def acquire(self):
+        """Get the thread's pinned connection, an idle connection for the current DB_PATH or a new one."""
+        pinned = getattr(self._local, 'pinned', None)
+        if pinned is not None:
+            return pinned
+        path = str(DB_PATH)
+        conn = None
+        stale = []
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.db_path == path:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close_physical()
+        if conn is None:
+            conn = self._connect(path)
+        conn.set_trace_callback(_trace_callback)
+        if _on_acquire is not None:
+            _on_acquire(conn)
+        self._checked_out().append(conn)
+        return conn
+    
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted changes."""
+        if conn is getattr(self._local, 'pinned', None):
+            # Stays checked out until unpin()
+            return
+        checked_out = self._checked_out()
+        if conn in checked_out:
+            checked_out.remove(conn)
+        if _on_release is not None:
+            _on_release(conn)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.ProgrammingError:
+            # Already physically closed
+            return
+        with self._lock:
+            if conn not in self._idle and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            if conn in self._idle:
+                return
+        conn.close_physical()
+    
+    def pin(self):
+        """Check out a connection that acquire() returns on this thread until unpin()."""
+        conn = self.acquire()
+        self._local.pinned = conn
+        return conn
+    
+    def unpin(self):
+        """Return the thread's pinned connection to the pool."""
+        conn = getattr(self._local, 'pinned', None)
+        self._local.pinned = None
+        if conn is not None:
+            self.release(conn)
+    
+    def release_thread_connections(self):
+        """Return every connection still checked out by the current thread."""
+        for conn in list(self._checked_out()):
+            self.release(conn)
+    
+    def close_all(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_physical()
+
+
+_pool = ConnectionPool()
+_trace_callback = None
+
+def set_trace_callback(callback):
+    """
+    Install a callback receiving the text of every SQL statement run on
+    connections handed out from now on (None to remove it).
+    
+    Used by benchmark.py to count queries.
+    """
+    global _trace_callback
+    _trace_callback = callback
+
+_on_acquire = None
+_on_release = None
+
+def set_connection_hooks(on_acquire=None, on_release=None):
+    """
+    Install functions called with each connection as get_db() hands it out
+    and as it is returned to the pool (None to remove them).
+    
+    Used by profiling.py to instrument connections during a request.
+    """
+    global _on_acquire, _on_release
+    _on_acquire = on_acquire
+    _on_release = on_release
+
 def get_db():
-    """Get database connection."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a pooled database connection. Call close() to return it to the pool."""
+    return _pool.acquire()
+
+@contextmanager
+def pinned_connection():
+    """
+    Serve every get_db() call of the current thread from one connection.
+    
+    Calling close() on it inside the block keeps it checked out, so code that
+    opens and closes its own connections (e.g. several API views run in one
+    request) shares one connection and can share one transaction. The
+    connection goes back to the pool when the block exits.
+    
+    Yields:
+        The pinned connection
+    """
+    conn = _pool.pin()
+    try:
+        yield conn
+    finally:
+        _pool.unpin()
+
+def release_connections(exception=None):
+    """
+    Return connections left open by the current thread to the pool.
+    
+    Registered as a Flask teardown hook so a request that returns early
+    without closing its connection does not leak it.
+    """
+    _pool.release_thread_connections()
+
+def close_all_connections():
+    """Close every idle pooled connection (e.g. before deleting the database file)."""
+    _pool.close_all()
+
+def fetch_in(cursor, query, ids):
+    """
+    Run a query with an ``IN ({placeholders})`` clause for a list of IDs.
+    
+    IDs are sent in chunks so large selections stay under SQLite's
+    host parameter limit.
+    
+    Args:
+        cursor: Database cursor
+        query: SQL containing a ``{placeholders}`` marker
+        ids: List of IDs to bind
+    
+    Returns:
+        List of rows from all chunks
+    """
+    rows = []
+    for start in range(0, len(ids), MAX_IN_PARAMETERS):
+        chunk = ids[start:start + MAX_IN_PARAMETERS]
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(query.format(placeholders=placeholders), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
 
 def init_db():
     """Initialize database schema."""
@@ -90,16 +308,6 @@ def init_db():
         )
     """)
     
-    # Add page_number column to recipes if missing
-    try:
-        cursor.execute("PRAGMA table_info(recipes)")
-        cols = [row[1] for row in cursor.fetchall()]
-        if 'page_number' not in cols:
-            cursor.execute("ALTER TABLE recipes ADD COLUMN page_number INTEGER")
-    except Exception:
-        # Safe to ignore; column may already exist or ALTER may fail on some SQLite versions
-        pass
-    
     # Create recipe items table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS recipe_items (
@@ -135,6 +343,10 @@ def init_db():
     
     conn.commit()
     
+    # Apply versioned schema changes (columns, indexes) on top of the base tables
+    from backend.migrations import run_migrations
+    run_migrations(conn)
+    
     # Insert default unit types
     default_units = [
         # Volume
@@ -164,6 +376,11 @@ def init_db():
     """, [(t,) for t in default_types])
     
     conn.commit()
+    
+    # Load unit types into the in-process registry
+    from backend.units import load_unit_registry
+    load_unit_registry(conn)
+    
     conn.close()
     
     print(f"Database initialized at {DB_PATH}")
@@ -3,6 +3,7 @@ Default conversion rules for common vegan ingredients.
 Provides pre-calculated conversion factors so users don't need to calculate them manually.
 """
 from typing import Dict, List, Optional
+from backend.units import get_unit_registry
 
 # Default conversions organized by ingredient
 # Format: {ingredient_name: {shopping_unit: str, conversions: List[Dict]}}
@@ -315,26 +316,22 @@ def apply_default_conversions(ingredient_name: str, shopping_unit_id: int, db) -
     if not defaults:
         return [], []
     
-    cursor = db.cursor()
+    units = get_unit_registry(db)
     
     # Get shopping unit name to verify it matches default
-    cursor.execute("SELECT name FROM unit_types WHERE id = ?", (shopping_unit_id,))
-    shopping_unit = cursor.fetchone()
-    if not shopping_unit:
+    shopping_unit_name = units.name_of(shopping_unit_id)
+    if not shopping_unit_name:
         return [], []
     
     # Check if user's shopping unit matches default shopping unit
     # If not, we'll still apply defaults but user might want to adjust
     default_shopping_unit = defaults['shopping_unit']
-    if shopping_unit['name'] != default_shopping_unit:
+    if shopping_unit_name != default_shopping_unit:
         # User chose different shopping unit, still apply defaults but they may need adjustment
         pass
     
     # Get unit IDs by name
-    unit_map = {}
-    cursor.execute("SELECT id, name, category FROM unit_types")
-    for unit in cursor.fetchall():
-        unit_map[unit['name']] = unit['id']
+    unit_map = units.ids_by_name
     
     # Build conversion rules - convert to user's selected shopping unit
     conversion_rules = []
@@ -348,7 +345,7 @@ def apply_default_conversions(ingredient_name: str, shopping_unit_id: int, db) -
             
             # If shopping unit doesn't match, we'd need to adjust factor
             # For now, if shopping units differ, skip or adjust
-            if shopping_unit['name'] == default_shopping_unit:
+            if shopping_unit_name == default_shopping_unit:
                 conversion_rules.append({
                     'from_unit_id': unit_map[from_unit_name],
                     'to_unit_id': shopping_unit_id,
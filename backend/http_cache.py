@@ -0,0 +1,206 @@
+"""
+Conditional GET and compression for the read-only API endpoints.
+
+Ingredient, unit and recipe data rarely changes, but the frontend fetches it
+on every page load. Views decorated with @cached_get(*tables) get:
+
+- weak ETag and Last-Modified validators derived from the versions of the
+  tables they read (shopping_cache.get_table_versions()), so a request
+  with a matching If-None-Match or If-Modified-Since gets a 304 without
+  touching the database (If-Modified-Since only where its one-second
+  precision cannot hide a later change);
+- Cache-Control: no-cache, so browsers keep the body but revalidate it on
+  every use;
+- a cache of serialized bodies per URL and version, so clients without a
+  copy are served without rebuilding the JSON; and
+- gzip compression, or brotli when the brotli package is installed, of
+  bodies of at least COMPRESS_MIN_SIZE bytes (cached with the body).
+
+Table versions restart at 0 and writes by other processes are only picked
+up after a restart, so ETags also include a token unique to this process
+and database.
+"""
+import gzip
+import os
+import zlib
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from backend import database
+from backend.lru_cache import LRUCache
+from backend.shopping_cache import get_table_versions
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HAS_BROTLI = brotli is not None
+
+# Smaller bodies are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Serialized responses kept (one per URL and table versions)
+RESPONSE_CACHE_SIZE = 64
+
+_process_token = os.urandom(4).hex()
+
+_responses = LRUCache(RESPONSE_CACHE_SIZE)
+
+
+def make_etag(versions):
+    """
+    Build the entity tag for table versions.
+    
+    Args:
+        versions: Triples from get_table_versions()
+    
+    Returns:
+        Unquoted entity tag
+    """
+    database_token = zlib.crc32(str(database.DB_PATH).encode('utf-8'))
+    return f"{_process_token}-{database_token:08x}-{'.'.join(str(version) for version, _, _ in versions)}"
+
+
+def last_modified_time(versions):
+    """Get the Unix time of the last change of the tables with versions from get_table_versions()."""
+    return max(changed_at for _, changed_at, _ in versions)
+
+
+def _changed_once_in_last_second(versions):
+    """Check that a single write changed the tables during the second of their last change."""
+    second = int(last_modified_time(versions))
+    writes = set()
+    for version, changed_at, first_version in versions:
+        if int(changed_at) == second:
+            if first_version != version:
+                return False
+            writes.add(version)
+    return len(writes) == 1
+
+
+def is_not_modified(etag, versions):
+    """
+    Check the request's validators against table versions.
+    
+    If-None-Match takes precedence. If-Modified-Since has one-second
+    precision, so a date in the second of the last change only matches if
+    no other write landed in that second: the client's copy could predate it.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None:
+        since = request.if_modified_since.timestamp()
+        last_modified = last_modified_time(versions)
+        if since >= last_modified:
+            return True
+        return since == int(last_modified) and _changed_once_in_last_second(versions)
+    return False
+
+
+def choose_encoding(size):
+    """Pick the response encoding for a body of size bytes from the request's Accept-Encoding."""
+    if size < COMPRESS_MIN_SIZE:
+        return 'identity'
+    if HAS_BROTLI and request.accept_encodings['br'] > 0:
+        return 'br'
+    if request.accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return 'identity'
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """
+    Compress a response body for the request's Accept-Encoding, e.g. for
+    responses to POST requests that cached_get() does not apply to.
+    
+    Returns:
+        The response
+    """
+    if response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    body = response.get_data()
+    encoding = choose_encoding(len(body))
+    if encoding != 'identity':
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = int(last_modified)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+
+
+def cached_get(*tables):
+    """
+    Decorate a GET view whose response depends only on its URL and the given tables.
+    
+    Only 200 responses are cached; other responses are passed through.
+    
+    Args:
+        tables: Names from shopping_cache.DATA_TABLES that the view reads
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read the versions before building: a write committed meanwhile bumps them,
+            # so a body built from partly old data is stored under a key never looked up again
+            versions = get_table_versions(tables)
+            etag = make_etag(versions)
+            last_modified = last_modified_time(versions)
+            
+            if is_not_modified(etag, versions):
+                response = Response(status=304)
+                _set_validators(response, etag, last_modified)
+                return response
+            
+            key = (request.full_path, etag)
+            entry = _responses.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = {
+                    'mimetype': response.mimetype,
+                    # Headers set by the view, e.g. a pagination Link
+                    'headers': [
+                        (name, value) for name, value in response.headers
+                        if name not in ('Content-Type', 'Content-Length')
+                    ],
+                    'identity': response.get_data()
+                }
+                _responses.put(key, entry)
+            
+            encoding = choose_encoding(len(entry['identity']))
+            body = entry.get(encoding)
+            if body is None:
+                body = entry[encoding] = compress(entry['identity'], encoding)
+            
+            response = Response(body, mimetype=entry['mimetype'], headers=entry['headers'])
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+            _set_validators(response, etag, last_modified)
+            return response
+        
+        return wrapper
+    
+    return decorator
+
+
+def clear_response_cache():
+    """Drop every cached response body."""
+    _responses.clear()
@@ -0,0 +1,344 @@
+"""
+Incremental shopping list updates.
+
+Editing a large plan usually changes one recipe at a time: a batch count,
+an added or a removed recipe. A ShoppingListState keeps, for every
+ingredient and sub-recipe on a list, the converted amounts each selected
+recipe contributes. A change replaces the contributions of the changed
+recipes only, then re-sums and re-optimizes (size qualifier selection) only
+the ingredients and sub-recipes those recipes use. Untouched items are
+reused as they are.
+
+Contributions are computed with services.ingredient_item_values() and
+re-summed in selection order, exactly as build_shopping_list() sums them,
+so an updated list is identical to one generated from the resulting
+selections.
+
+States live in memory under single-use tokens: applying changes consumes
+the token and returns a new one. A list can also be updated from a saved
+snapshot's selections, which rebuilds its state once.
+"""
+import secrets
+
+from backend import database
+from backend.lru_cache import LRUCache
+from backend.services import (ingredient_item_values, get_reference_unit_id, load_shopping_list_data,
+                              make_ingredient_item, make_sub_recipe_items, shopping_list_sort_key)
+from backend.shopping_cache import cache_shopping_list, get_data_version, normalize_selections
+from backend.units import get_unit_registry
+
+SHOPPING_LIST_STATE_CACHE_SIZE = 32
+
+
+class ShoppingListState:
+    """Per-recipe contributions and items of one shopping list."""
+    
+    def __init__(self, db_path, data_version, units):
+        self.db_path = db_path
+        self.data_version = data_version
+        self.selections = {}  # Recipe ID -> batches, in selection order
+        self.data = {
+            'units': units,
+            'recipe_items': {},
+            'ingredients': {},
+            'conversion_graphs': {},
+            'size_rules': {},
+            'sub_recipes': {},
+        }
+        self.loaded_recipe_ids = set()
+        self.reference_unit_ids = {}
+        self.whole_unit_id = units.id_for('whole')
+        self.volume_unit_id = units.id_for('cup')
+        self.weight_unit_id = units.id_for('gram')
+        
+        # Ingredient ID -> {recipe ID: [item values]}, recipes in selection order
+        self.ingredient_contributions = {}
+        # Sub-recipe ID -> {recipe ID: [(unit ID, quantity)]}, recipes in selection order
+        self.sub_recipe_contributions = {}
+        self.ingredient_items = {}  # Ingredient ID -> shopping list item
+        self.sub_recipe_items = {}  # Sub-recipe ID -> shopping list items (one per unit)
+    
+    def load(self, recipe_ids, db):
+        """Load recipe items, ingredients and rules for recipes not loaded yet."""
+        recipe_ids = [recipe_id for recipe_id in dict.fromkeys(recipe_ids) if recipe_id not in self.loaded_recipe_ids]
+        if not recipe_ids:
+            return
+        data = load_shopping_list_data([{'recipe_id': recipe_id} for recipe_id in recipe_ids], db)
+        
+        self.data['recipe_items'].update(data['recipe_items'])
+        self.data['sub_recipes'].update(data['sub_recipes'])
+        units = self.data['units']
+        for ingredient_id, ingredient in data['ingredients'].items():
+            if ingredient_id in self.data['ingredients']:
+                continue
+            self.data['ingredients'][ingredient_id] = ingredient
+            self.data['conversion_graphs'][ingredient_id] = data['conversion_graphs'][ingredient_id]
+            if ingredient_id in data['size_rules']:
+                self.data['size_rules'][ingredient_id] = data['size_rules'][ingredient_id]
+                self.reference_unit_ids[ingredient_id] = get_reference_unit_id(data['size_rules'][ingredient_id], units)
+        self.loaded_recipe_ids.update(recipe_ids)
+    
+    def _recipe_contributions(self, recipe_id, batches):
+        """
+        Convert a recipe's items at a batch count.
+        
+        Returns:
+            Tuple of ({ingredient ID: [item values]}, {sub-recipe ID: [(unit ID, quantity)]})
+        """
+        ingredient_values = {}
+        sub_recipe_quantities = {}
+        for item in self.data['recipe_items'].get(recipe_id, []):
+            quantity = item['quantity'] * batches
+            if item['item_type'] == 'sub_recipe':
+                sub_recipe_quantities.setdefault(item['sub_recipe_id'], []).append((item['unit_id'], quantity))
+                continue
+            
+            ingredient_id = item['ingredient_id']
+            ingredient = self.data['ingredients'].get(ingredient_id)
+            if not ingredient:
+                continue
+            values = ingredient_item_values(
+                item, quantity, ingredient,
+                self.data['conversion_graphs'][ingredient_id],
+                self.data['size_rules'].get(ingredient_id, []),
+                self.reference_unit_ids.get(ingredient_id),
+                self.volume_unit_id, self.weight_unit_id
+            )
+            values_list = ingredient_values.setdefault(ingredient_id, [])
+            if values is not None:
+                values_list.append(values)
+        return ingredient_values, sub_recipe_quantities
+    
+    def set_recipe(self, recipe_id, batches):
+        """
+        Set a recipe's batch count (None or <= 0 removes it); its data must be loaded.
+        
+        Returns:
+            Tuple of (touched ingredient IDs, touched sub-recipe IDs)
+        """
+        touched_ingredients = set()
+        touched_sub_recipes = set()
+        
+        if recipe_id in self.selections:
+            # Drop the old contributions; their positions are kept if the recipe stays
+            old_ingredients, old_sub_recipes = self._recipe_contributions(recipe_id, self.selections[recipe_id])
+            touched_ingredients.update(old_ingredients)
+            touched_sub_recipes.update(old_sub_recipes)
+        
+        if batches is None or batches <= 0:
+            self.selections.pop(recipe_id, None)
+            for ingredient_id in touched_ingredients:
+                self.ingredient_contributions[ingredient_id].pop(recipe_id, None)
+            for sub_recipe_id in touched_sub_recipes:
+                self.sub_recipe_contributions[sub_recipe_id].pop(recipe_id, None)
+            return touched_ingredients, touched_sub_recipes
+        
+        self.selections[recipe_id] = batches
+        ingredient_values, sub_recipe_quantities = self._recipe_contributions(recipe_id, batches)
+        for ingredient_id, values_list in ingredient_values.items():
+            self.ingredient_contributions.setdefault(ingredient_id, {})[recipe_id] = values_list
+        for sub_recipe_id, quantities in sub_recipe_quantities.items():
+            self.sub_recipe_contributions.setdefault(sub_recipe_id, {})[recipe_id] = quantities
+        touched_ingredients.update(ingredient_values)
+        touched_sub_recipes.update(sub_recipe_quantities)
+        return touched_ingredients, touched_sub_recipes
+    
+    def refresh(self, ingredient_ids, sub_recipe_ids):
+        """Re-sum and rebuild the items of touched ingredients and sub-recipes."""
+        for ingredient_id in ingredient_ids:
+            contributions = self.ingredient_contributions.get(ingredient_id)
+            if not contributions:
+                self.ingredient_contributions.pop(ingredient_id, None)
+                self.ingredient_items.pop(ingredient_id, None)
+                continue
+            
+            totals = [0, 0, 0, 0]
+            for values_list in contributions.values():
+                for values in values_list:
+                    totals[0] += values[0]
+                    totals[1] += values[1]
+                    totals[2] += values[2]
+                    totals[3] += values[3]
+            shopping_item = make_ingredient_item(
+                ingredient_id, totals, self.data, self.reference_unit_ids, self.whole_unit_id
+            )
+            if shopping_item is None:
+                self.ingredient_items.pop(ingredient_id, None)
+            else:
+                self.ingredient_items[ingredient_id] = shopping_item
+        
+        for sub_recipe_id in sub_recipe_ids:
+            contributions = self.sub_recipe_contributions.get(sub_recipe_id)
+            if not contributions:
+                self.sub_recipe_contributions.pop(sub_recipe_id, None)
+                self.sub_recipe_items.pop(sub_recipe_id, None)
+                continue
+            self.sub_recipe_items[sub_recipe_id] = make_sub_recipe_items(
+                sub_recipe_id, [pair for quantities in contributions.values() for pair in quantities], self.data
+            )
+    
+    def recipe_selections(self):
+        return [{'recipe_id': recipe_id, 'batches': batches} for recipe_id, batches in self.selections.items()]
+    
+    def shopping_list(self):
+        """Get the list in the same order as build_shopping_list()."""
+        shopping_list = list(self.ingredient_items.values())
+        for items in self.sub_recipe_items.values():
+            shopping_list.extend(items)
+        shopping_list.sort(key=shopping_list_sort_key)
+        return shopping_list
+
+
+def build_state(recipe_selections, db):
+    """
+    Build the state of a list from scratch.
+    
+    Selections of the same recipe are merged into one, in order of first use.
+    
+    Args:
+        recipe_selections: List of normalized selections (see shopping_cache.normalize_selections())
+        db: Database connection
+    
+    Returns:
+        ShoppingListState
+    """
+    state = ShoppingListState(str(database.DB_PATH), get_data_version(), get_unit_registry(db))
+    batches_by_recipe = {}
+    for selection in recipe_selections:
+        batches_by_recipe[selection['recipe_id']] = batches_by_recipe.get(selection['recipe_id'], 0) + selection['batches']
+    
+    state.load(batches_by_recipe, db)
+    touched_ingredients = set()
+    touched_sub_recipes = set()
+    for recipe_id, batches in batches_by_recipe.items():
+        ingredient_ids, sub_recipe_ids = state.set_recipe(recipe_id, batches)
+        touched_ingredients.update(ingredient_ids)
+        touched_sub_recipes.update(sub_recipe_ids)
+    state.refresh(touched_ingredients, touched_sub_recipes)
+    return state
+
+
+def normalize_changes(changes):
+    """
+    Validate selection changes.
+    
+    Each change names a recipe and one of:
+    - 'batches': set the batch count (added to the end of the list if new)
+    - 'add_batches': add (or with a negative value, subtract) batches
+    - 'remove': true to take the recipe off the list
+    A recipe whose batch count drops to zero or below is removed.
+    
+    Args:
+        changes: List of change dicts
+    
+    Returns:
+        List of (recipe ID, operation, value) tuples
+    
+    Raises:
+        ValueError: If a change is malformed
+    """
+    if not isinstance(changes, list):
+        raise ValueError("changes must be a list")
+    
+    normalized = []
+    for change in changes:
+        if not isinstance(change, dict) or 'recipe_id' not in change:
+            raise ValueError("Each change needs a recipe_id")
+        try:
+            recipe_id = int(change['recipe_id'])
+            if change.get('remove'):
+                normalized.append((recipe_id, 'remove', None))
+            elif 'batches' in change:
+                normalized.append((recipe_id, 'batches', float(change['batches'])))
+            elif 'add_batches' in change:
+                normalized.append((recipe_id, 'add_batches', float(change['add_batches'])))
+            else:
+                raise ValueError(f"Change for recipe {recipe_id} needs batches, add_batches or remove")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid change {change}: {e}")
+    return normalized
+
+
+_states = LRUCache(SHOPPING_LIST_STATE_CACHE_SIZE)
+
+
+def update_shopping_list(changes, token=None, recipe_selections=None, db=None):
+    """
+    Apply selection changes to a previously generated list.
+    
+    The base list is given either by the token returned from an earlier
+    update or by its recipe selections (e.g. from a saved snapshot). A
+    token is consumed; if recipe, ingredient or rule data changed since it
+    was issued, its state is rebuilt before the changes are applied.
+    
+    Args:
+        changes: List of change dicts (see normalize_changes())
+        token: Token of the base list
+        recipe_selections: Selections of the base list, used when no token is given
+        db: Optional database connection
+    
+    Returns:
+        Dictionary with the new 'token', 'recipe_selections', 'shopping_list'
+        and 'changed' ({'ingredient_ids': [...], 'sub_recipe_ids': [...]})
+    
+    Raises:
+        KeyError: If the token is unknown or expired
+        ValueError: If a change or the base selections are malformed
+    """
+    changes = normalize_changes(changes)
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        if token is not None:
+            state = _states.pop((str(database.DB_PATH), token))
+            if state is None:
+                raise KeyError(token)
+            if state.data_version != get_data_version():
+                state = build_state(normalize_selections(state.recipe_selections()), db)
+        else:
+            state = build_state(normalize_selections(recipe_selections or []), db)
+        
+        # Batch counts after all changes (None removes)
+        new_batches = {}
+        for recipe_id, operation, value in changes:
+            current = new_batches.get(recipe_id, state.selections.get(recipe_id))
+            if operation == 'remove':
+                new_batches[recipe_id] = None
+            elif operation == 'batches':
+                new_batches[recipe_id] = value
+            else:
+                new_batches[recipe_id] = (current or 0) + value
+        
+        state.load([recipe_id for recipe_id, batches in new_batches.items() if batches and batches > 0], db)
+        touched_ingredients = set()
+        touched_sub_recipes = set()
+        for recipe_id, batches in new_batches.items():
+            ingredient_ids, sub_recipe_ids = state.set_recipe(recipe_id, batches)
+            touched_ingredients.update(ingredient_ids)
+            touched_sub_recipes.update(sub_recipe_ids)
+        state.refresh(touched_ingredients, touched_sub_recipes)
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    new_token = secrets.token_hex(16)
+    _states.put((state.db_path, new_token), state)
+    
+    selections = state.recipe_selections()
+    shopping_list = state.shopping_list()
+    cache_shopping_list(selections, shopping_list, state.data_version)
+    return {
+        'token': new_token,
+        'recipe_selections': selections,
+        'shopping_list': shopping_list,
+        'changed': {
+            'ingredient_ids': sorted(touched_ingredients),
+            'sub_recipe_ids': sorted(touched_sub_recipes)
+        }
+    }
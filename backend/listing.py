@@ -0,0 +1,241 @@
+"""
+Paginated, projected listings of recipes and ingredients.
+
+Lists are ordered by (name, id) and paged with keyset cursors: a page
+starts after the (name, id) of the previous page's last row, which SQLite
+finds with a search of the name index, so every page costs the same however
+large the library is. Cursors are opaque URL-safe strings (see
+encode_cursor()).
+
+A fields projection selects only the requested columns and skips the joins
+the omitted columns would need.
+"""
+import base64
+import json
+
+from backend import database
+
+# Largest page a client can request
+MAX_PAGE_SIZE = 1000
+
+# field -> (SQL expression, join it needs or None)
+RECIPE_FIELDS = {
+    'id': ('r.id', None),
+    'name': ('r.name', None),
+    'is_sub_recipe': ('r.is_sub_recipe', None),
+    'yield_quantity': ('r.yield_quantity', None),
+    'yield_unit_id': ('r.yield_unit_id', None),
+    'page_number': ('r.page_number', None),
+    'yield_unit_name': ('ut.name', "JOIN unit_types ut ON r.yield_unit_id = ut.id"),
+}
+
+INGREDIENT_FIELDS = {
+    'id': ('i.id', None),
+    'name': ('i.name', None),
+    'type_id': ('i.type_id', None),
+    'shopping_unit_id': ('i.shopping_unit_id', None),
+    'type_name': ('it.name', "JOIN ingredient_types it ON i.type_id = it.id"),
+    'shopping_unit_name': ('ut.name', "JOIN unit_types ut ON i.shopping_unit_id = ut.id"),
+}
+
+
+def parse_fields(value, allowed):
+    """
+    Parse a comma-separated fields parameter.
+    
+    Args:
+        value: Parameter value, or None/empty for every field
+        allowed: Field map (RECIPE_FIELDS or INGREDIENT_FIELDS)
+    
+    Returns:
+        List of field names in allowed's order
+    
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if not value:
+        return list(allowed)
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(allowed)}")
+    return [field for field in allowed if field in requested]
+
+
+def parse_limit(value):
+    """
+    Parse a limit parameter.
+    
+    Returns:
+        Page size capped at MAX_PAGE_SIZE, or None for no limit
+    
+    Raises:
+        ValueError: If the value is not a positive integer
+    """
+    if value is None or value == '':
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(row):
+    """Build the cursor of the page after row (a dict with 'name' and 'id')."""
+    raw = json.dumps([row['name'], row['id']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor().
+    
+    Returns:
+        Tuple of (name, id)
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, row_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(name, str) or not isinstance(row_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return name, row_id
+
+
+def _project(rows, fields):
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def _list_rows(table, fields, field_map, filters, params, limit, after, db):
+    """
+    Select one page of a table ordered by (name, id).
+    
+    Returns:
+        Tuple of (list of row dicts with the requested fields, cursor for the next page or None)
+    """
+    # name and id are always selected for the cursor
+    selected = list(dict.fromkeys(['id', 'name', *fields]))
+    columns = ', '.join(f"{field_map[field][0]} AS {field}" for field in selected)
+    joins = ' '.join(dict.fromkeys(field_map[field][1] for field in selected if field_map[field][1]))
+    
+    alias = field_map['id'][0].split('.')[0]
+    conditions = list(filters)
+    params = list(params)
+    if after is not None:
+        conditions.append(f"({alias}.name, {alias}.id) > (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    limit_clause = ''
+    if limit is not None:
+        limit_clause = 'LIMIT ?'
+        params.append(limit + 1)
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute(f"""
+            SELECT {columns}
+            FROM {table} {alias} {joins}
+            {where}
+            ORDER BY {alias}.name, {alias}.id
+            {limit_clause}
+        """, params)
+        rows = cursor.fetchall()
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return _project(rows, fields), next_cursor
+
+
+def list_recipes(fields=None, limit=None, after=None, db=None):
+    """
+    List recipes ordered by name.
+    
+    Args:
+        fields: Names from RECIPE_FIELDS (default all)
+        limit: Page size, or None for every recipe
+        after: (name, id) from decode_cursor() to start after
+        db: Optional database connection
+    
+    Returns:
+        Tuple of (list of recipe dicts, cursor for the next page or None)
+    """
+    return _list_rows('recipes', fields or list(RECIPE_FIELDS), RECIPE_FIELDS, [], [], limit, after, db)
+
+
+def list_ingredients(type_id=None, fields=None, limit=None, after=None, db=None):
+    """
+    List ingredients ordered by name, optionally of one type.
+    
+    Args:
+        type_id: Only list ingredients of this type
+        fields: Names from INGREDIENT_FIELDS (default all)
+        limit: Page size, or None for every ingredient
+        after: (name, id) from decode_cursor() to start after
+        db: Optional database connection
+    
+    Returns:
+        Tuple of (list of ingredient dicts, cursor for the next page or None)
+    """
+    filters, params = ([], []) if type_id is None else (["i.type_id = ?"], [type_id])
+    return _list_rows(
+        'ingredients', fields or list(INGREDIENT_FIELDS), INGREDIENT_FIELDS, filters, params, limit, after, db
+    )
+
+
+def count_rows(table, type_id=None, db=None):
+    """
+    Count recipes or ingredients.
+    
+    Args:
+        table: 'recipes' or 'ingredients'
+        type_id: Only count ingredients of this type
+    
+    Returns:
+        Number of rows
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        if type_id is None:
+            return db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return db.execute(f"SELECT COUNT(*) FROM {table} WHERE type_id = ?", (type_id,)).fetchone()[0]
+    
+    finally:
+        if close_after:
+            db.close()
+
+
+def paginate_rows(rows, fields, limit=None, after=None):
+    """
+    Page and project rows already ordered by (name, id), e.g. search results.
+    
+    Returns:
+        Tuple of (list of row dicts with the requested fields, cursor for the next page or None)
+    """
+    if after is not None:
+        rows = [row for row in rows if (row['name'], row['id']) > after]
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return _project(rows, fields), next_cursor
@@ -0,0 +1,46 @@
+"""
+Thread-safe least recently used cache.
+
+Shared by the in-process caches (generated shopping lists, incremental
+shopping list states, HTTP response bodies). Values are stored as is, so
+callers must not modify what they get back.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts its least recently used entries over max_size."""
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Get a value and mark it most recently used, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries over max_size."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key):
+        """Remove and return an entry, or None."""
+        with self._lock:
+            return self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
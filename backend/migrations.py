@@ -0,0 +1,346 @@
+"""
+Versioned schema migrations.
+
+The schema version is stored in SQLite's PRAGMA user_version. Each migration
+runs once, in its own transaction, and bumps the version when it commits.
+Migrations must be idempotent so databases created before versioning (which
+may already have some of the changes) upgrade cleanly.
+
+To change the schema, append a new (version, description, steps) entry to
+MIGRATIONS; never edit one that has shipped.
+"""
+import hashlib
+import json
+import sqlite3
+import zlib
+
+
+def _add_recipe_page_number(cursor):
+    """Add the optional cookbook page number to recipes."""
+    cursor.execute("PRAGMA table_info(recipes)")
+    cols = [row[1] for row in cursor.fetchall()]
+    if 'page_number' not in cols:
+        cursor.execute("ALTER TABLE recipes ADD COLUMN page_number INTEGER")
+
+
+# Search documents (space-separated ingredient and sub-recipe names) of the recipes selected by
+# {recipe_filter}; also used by search.resume_search_indexing()
+INDEX_RECIPES_SQL = """
+    INSERT INTO recipe_search (rowid, names)
+    SELECT ri.recipe_id, group_concat(COALESCE(i.name, sr.name), ' ')
+    FROM recipe_items ri
+    LEFT JOIN ingredients i ON ri.item_type = 'ingredient' AND ri.ingredient_id = i.id
+    LEFT JOIN recipes sr ON ri.item_type = 'sub_recipe' AND ri.sub_recipe_id = sr.id
+    WHERE ri.recipe_id IN ({recipe_filter})
+    GROUP BY ri.recipe_id
+"""
+
+
+# Triggers keeping recipe_search current: name -> (event, query selecting the recipes to reindex)
+_RECIPE_SEARCH_TRIGGERS = {
+    'recipe_items_search_ai': ("AFTER INSERT ON recipe_items", "SELECT NEW.recipe_id"),
+    'recipe_items_search_ad': ("AFTER DELETE ON recipe_items", "SELECT OLD.recipe_id"),
+    'recipe_items_search_au': ("AFTER UPDATE ON recipe_items", "SELECT OLD.recipe_id UNION SELECT NEW.recipe_id"),
+    'recipes_search_au': (
+        "AFTER UPDATE OF name ON recipes",
+        "SELECT recipe_id FROM recipe_items WHERE item_type = 'sub_recipe' AND sub_recipe_id = NEW.id"
+    ),
+    'recipes_search_ad': (
+        "AFTER DELETE ON recipes",
+        "SELECT OLD.id UNION SELECT recipe_id FROM recipe_items WHERE item_type = 'sub_recipe' AND sub_recipe_id = OLD.id"
+    ),
+    'ingredients_search_au': (
+        "AFTER UPDATE OF name ON ingredients",
+        "SELECT recipe_id FROM recipe_items WHERE ingredient_id = NEW.id"
+    ),
+    'ingredients_search_ad': (
+        "AFTER DELETE ON ingredients",
+        "SELECT recipe_id FROM recipe_items WHERE ingredient_id = OLD.id"
+    ),
+}
+
+
+def _create_recipe_search_triggers(cursor, when=""):
+    for name, (event, recipe_filter) in _RECIPE_SEARCH_TRIGGERS.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event} {when}
+            BEGIN
+                DELETE FROM recipe_search WHERE rowid IN ({recipe_filter});
+                {INDEX_RECIPES_SQL.format(recipe_filter=recipe_filter)};
+            END
+        """)
+
+
+def _create_recipe_search_index(cursor):
+    """
+    Create the full-text index of ingredient and sub-recipe names per recipe.
+    
+    One row per recipe (rowid = recipe ID) holds the names of everything it
+    uses. The trigram tokenizer keeps the substring matching of the old LIKE
+    search. Triggers keep the index current on every write. Skipped if this
+    SQLite build has no FTS5; searches then fall back to LIKE queries.
+    """
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search
+            USING fts5(names, tokenize = 'trigram')
+        """)
+    except sqlite3.OperationalError:
+        return
+    
+    _create_recipe_search_triggers(cursor)
+    
+    # Index existing recipes
+    cursor.execute("DELETE FROM recipe_search")
+    cursor.execute(INDEX_RECIPES_SQL.format(recipe_filter="SELECT id FROM recipes"))
+
+
+def _add_recipe_search_pause(cursor):
+    """
+    Let bulk writers pause the recipe_search triggers.
+    
+    While recipe_search_paused has a row the triggers do nothing. Bulk
+    writers insert that row inside their transaction, reindex the recipes
+    they wrote in one statement and delete it again before committing
+    (see search.py), so other connections never see the triggers paused.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_search'")
+    if cursor.fetchone() is None:
+        return
+    
+    cursor.execute("CREATE TABLE IF NOT EXISTS recipe_search_paused (paused INTEGER)")
+    for name in _RECIPE_SEARCH_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    _create_recipe_search_triggers(cursor, when="WHEN NOT EXISTS (SELECT 1 FROM recipe_search_paused)")
+
+
+# Version 5 snapshot payload format, frozen here so later changes to snapshots.py
+# cannot change what this migration writes.
+_V5_INGREDIENT_ITEM_KEYS = {
+    'ingredient_id', 'ingredient_name', 'quantity', 'unit_id', 'unit_name', 'size_qualifier', 'preparation_notes'
+}
+_V5_SUB_RECIPE_ITEM_KEYS = {
+    'is_sub_recipe', 'sub_recipe_id', 'sub_recipe_name', 'quantity', 'unit_id', 'unit_name',
+    'yield_quantity', 'yield_unit_name', 'size_qualifier', 'preparation_notes'
+}
+_V5_CONTAINER_AMOUNTS = {
+    'recipe_volume': ('recipe_volume_unit', 'fl oz'), 'recipe_weight': ('recipe_weight_unit', 'gram')
+}
+_V5_DELTA_MAX_RATIO = 0.5
+
+
+def _v5_encode_item(item, names):
+    if item.get('preparation_notes') is not None:
+        return None
+    
+    if item.get('is_sub_recipe') is True:
+        if set(item) != _V5_SUB_RECIPE_ITEM_KEYS or item['size_qualifier'] is not None:
+            return None
+        recipe = [item['sub_recipe_name'], item['yield_quantity'], item['yield_unit_name']]
+        if names['recipes'].setdefault(item['sub_recipe_id'], recipe) != recipe:
+            return None
+        if names['units'].setdefault(item['unit_id'], item['unit_name']) != item['unit_name']:
+            return None
+        return ['s', item['sub_recipe_id'], item['quantity'], item['unit_id']]
+    
+    keys = set(item)
+    for amount_key, (unit_key, unit) in _V5_CONTAINER_AMOUNTS.items():
+        if amount_key in item or unit_key in item:
+            if item.get(amount_key) is None or item.get(unit_key) != unit:
+                return None
+            keys -= {amount_key, unit_key}
+    if keys != _V5_INGREDIENT_ITEM_KEYS:
+        return None
+    if names['ingredients'].setdefault(item['ingredient_id'], item['ingredient_name']) != item['ingredient_name']:
+        return None
+    if names['units'].setdefault(item['unit_id'], item['unit_name']) != item['unit_name']:
+        return None
+    return ['i', item['ingredient_id'], item['quantity'], item['unit_id'], item['size_qualifier'],
+            item.get('recipe_volume'), item.get('recipe_weight')]
+
+
+def _v5_encode_shopping_list(shopping_list):
+    """Encode a list in the version 5 compact form (canonical JSON bytes)."""
+    names = {'ingredients': {}, 'recipes': {}, 'units': {}}
+    rows = []
+    for item in shopping_list:
+        row = _v5_encode_item(item, names)
+        rows.append(row if row is not None else ['x', item])
+    
+    compact = {
+        'names': {table: [[key, value] for key, value in entries.items()] for table, entries in names.items()},
+        'items': rows
+    }
+    return json.dumps(compact, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _v5_compress(raw, zdict=None):
+    compressor = zlib.compressobj(level=9, zdict=zdict) if zdict else zlib.compressobj(level=9)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _v5_store_payload(cursor, raw):
+    """Store an encoded list (delta encoded against the latest keyframe) unless stored already; returns its ID."""
+    content_hash = hashlib.sha256(raw).hexdigest()
+    cursor.execute("SELECT id FROM shopping_list_payloads WHERE content_hash = ?", (content_hash,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    
+    data = _v5_compress(raw)
+    base_id = None
+    cursor.execute("SELECT id, data FROM shopping_list_payloads WHERE base_id IS NULL ORDER BY id DESC LIMIT 1")
+    keyframe = cursor.fetchone()
+    if keyframe:
+        delta = _v5_compress(raw, zdict=zlib.decompress(keyframe[1]))
+        if len(delta) <= len(data) * _V5_DELTA_MAX_RATIO:
+            data, base_id = delta, keyframe[0]
+    
+    cursor.execute("""
+        INSERT INTO shopping_list_payloads (content_hash, base_id, data)
+        VALUES (?, ?, ?)
+    """, (content_hash, base_id, data))
+    return cursor.lastrowid
+
+
+def _compact_shopping_list_history(cursor):
+    """
+    Move shopping list snapshots to compact, deduplicated payloads.
+    
+    shopping_lists is rebuilt without the shopping_list_data text column;
+    each existing list is encoded and stored in shopping_list_payloads
+    (see snapshots.py) and referenced by payload_id.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shopping_list_payloads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content_hash TEXT NOT NULL UNIQUE,
+            base_id INTEGER,
+            data BLOB NOT NULL,
+            FOREIGN KEY (base_id) REFERENCES shopping_list_payloads(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_shopping_list_payloads_base
+        ON shopping_list_payloads(base_id) WHERE base_id IS NOT NULL
+    """)
+    
+    cursor.execute("PRAGMA table_info(shopping_lists)")
+    cols = [row[1] for row in cursor.fetchall()]
+    if 'payload_id' not in cols:
+        cursor.execute("""
+            CREATE TABLE shopping_lists_compact (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                recipe_selections TEXT NOT NULL,
+                payload_id INTEGER NOT NULL,
+                FOREIGN KEY (payload_id) REFERENCES shopping_list_payloads(id)
+            )
+        """)
+        rows = cursor.execute("""
+            SELECT id, created_at, recipe_selections, shopping_list_data FROM shopping_lists ORDER BY id
+        """).fetchall()
+        for snapshot_id, created_at, recipe_selections, shopping_list_data in rows:
+            payload_id = _v5_store_payload(cursor, _v5_encode_shopping_list(json.loads(shopping_list_data)))
+            cursor.execute("""
+                INSERT INTO shopping_lists_compact (id, created_at, recipe_selections, payload_id)
+                VALUES (?, ?, ?, ?)
+            """, (snapshot_id, created_at, recipe_selections, payload_id))
+        cursor.execute("DROP TABLE shopping_lists")
+        cursor.execute("ALTER TABLE shopping_lists_compact RENAME TO shopping_lists")
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shopping_lists_payload ON shopping_lists(payload_id)")
+
+
+# Each migration is (version, description, steps); a step is a SQL string or a function taking a cursor
+MIGRATIONS = [
+    (1, "Add recipes.page_number", [
+        _add_recipe_page_number,
+    ]),
+    (2, "Add secondary indexes for recipe, ingredient and rule lookups", [
+        # Items of a recipe (recipe/shopping list loading, updates)
+        "CREATE INDEX IF NOT EXISTS idx_recipe_items_recipe ON recipe_items(recipe_id)",
+        # Reverse sub-recipe lookups (delete_recipe, dependency graph); covers recipe_id
+        """CREATE INDEX IF NOT EXISTS idx_recipe_items_sub_recipe
+           ON recipe_items(sub_recipe_id, recipe_id) WHERE item_type = 'sub_recipe'""",
+        # Recipes using an ingredient (ingredient search)
+        "CREATE INDEX IF NOT EXISTS idx_recipe_items_ingredient ON recipe_items(ingredient_id, recipe_id)",
+        # Size rules per ingredient and reference unit, ordered by reference value
+        """CREATE INDEX IF NOT EXISTS idx_size_rules_ingredient_unit
+           ON size_estimation_rules(ingredient_id, reference_unit_id, reference_value)""",
+        # Ingredients of a type ordered by name (GET /api/ingredients?type_id=)
+        "CREATE INDEX IF NOT EXISTS idx_ingredients_type ON ingredients(type_id, name)",
+    ]),
+    (3, "Add full-text recipe search index", [
+        _create_recipe_search_index,
+    ]),
+    (4, "Allow pausing recipe search triggers during bulk writes", [
+        _add_recipe_search_pause,
+    ]),
+    (5, "Store shopping list snapshots as compact deduplicated payloads", [
+        _compact_shopping_list_history,
+    ]),
+    (6, "Add the SMS delivery queue", [
+        # Jobs delivered by sms_queue.py; next_attempt_at is a Unix time (retry or lease expiry)
+        """CREATE TABLE IF NOT EXISTS sms_jobs (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               phone_number TEXT NOT NULL,
+               text TEXT NOT NULL,
+               status TEXT NOT NULL DEFAULT 'queued',
+               attempts INTEGER NOT NULL DEFAULT 0,
+               next_attempt_at REAL NOT NULL,
+               method TEXT,
+               message_sid TEXT,
+               last_error TEXT,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               CHECK(status IN ('queued', 'sending', 'sent', 'failed'))
+           )""",
+        # Due jobs, in order
+        """CREATE INDEX IF NOT EXISTS idx_sms_jobs_due
+           ON sms_jobs(next_attempt_at) WHERE status IN ('queued', 'sending')""",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Get the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """
+    Apply every migration newer than the database's schema version.
+    
+    Args:
+        conn: Database connection with no open transaction
+    
+    Returns:
+        List of (version, description) tuples that were applied
+    """
+    current = get_schema_version(conn)
+    applied = []
+    
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        applied.append((version, description))
+    
+    return applied
@@ -0,0 +1,263 @@
+"""
+Per-request SQL instrumentation and profiling.
+
+Off unless the SHOPLIST_PROFILE environment variable is set (e.g.
+SHOPLIST_PROFILE=1 python app.py). When enabled, app.py starts a query
+profile for every request; connections handed out by get_db() while a
+profile is active get instrumented cursor(), execute() and executemany()
+methods that record each statement's SQL, time (execute plus fetches) and
+row count. The profile is reported in a Server-Timing response header and
+a JSON log line on the "shoplist.profile" logger, and
+/api/_debug/profile runs a single request under cProfile.
+
+When disabled no request hooks are registered and connections keep the
+plain sqlite3 methods, so there is no per-statement cost.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sqlite3
+import threading
+import time
+
+from backend import database
+
+PROFILING_ENABLED = os.environ.get('SHOPLIST_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+# Number of slowest statements included in the log line
+SLOWEST_STATEMENTS = 5
+
+# SQL longer than this is truncated in reports
+MAX_SQL_LENGTH = 200
+
+logger = logging.getLogger('shoplist.profile')
+
+_local = threading.local()
+
+
+def _active_profiles():
+    if not hasattr(_local, 'profiles'):
+        _local.profiles = []
+    return _local.profiles
+
+
+class QueryProfile:
+    """SQL statements run while a profile is active."""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.statements = []
+    
+    def record(self, sql, seconds, rows):
+        """Add a statement and return its record (updated as rows are fetched)."""
+        statement = {'sql': sql, 'seconds': seconds, 'rows': rows}
+        self.statements.append(statement)
+        return statement
+    
+    def finish(self):
+        self.finished = time.perf_counter()
+    
+    @property
+    def total_ms(self):
+        return ((self.finished or time.perf_counter()) - self.started) * 1000
+    
+    @property
+    def sql_ms(self):
+        return sum(statement['seconds'] for statement in self.statements) * 1000
+    
+    @property
+    def rows(self):
+        return sum(statement['rows'] for statement in self.statements)
+    
+    def slowest(self, count=SLOWEST_STATEMENTS):
+        """Get the slowest statements as report dictionaries."""
+        statements = sorted(self.statements, key=lambda statement: statement['seconds'], reverse=True)
+        return [
+            {
+                'sql': ' '.join(statement['sql'].split())[:MAX_SQL_LENGTH],
+                'ms': round(statement['seconds'] * 1000, 3),
+                'rows': statement['rows']
+            }
+            for statement in statements[:count]
+        ]
+    
+    def summary(self):
+        """Get counts and timings as a dictionary."""
+        return {
+            'queries': len(self.statements),
+            'sql_ms': round(self.sql_ms, 3),
+            'rows': self.rows,
+            'total_ms': round(self.total_ms, 3),
+            'slowest': self.slowest()
+        }
+    
+    def server_timing(self):
+        """Format the profile as a Server-Timing header value."""
+        return (
+            f'sql;dur={self.sql_ms:.3f};desc="{len(self.statements)} queries, {self.rows} rows", '
+            f'total;dur={self.total_ms:.3f}'
+        )
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor recording its statements into the profiles active when its connection was handed out."""
+    
+    profiles = ()
+    _statements = ()
+    
+    def _record(self, sql, seconds):
+        rows = max(self.rowcount, 0)
+        self._statements = [profile.record(sql, seconds, rows) for profile in self.profiles]
+    
+    def _add_fetch(self, seconds, rows):
+        for statement in self._statements:
+            statement['seconds'] += seconds
+            statement['rows'] += rows
+    
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, time.perf_counter() - start)
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add_fetch(time.perf_counter() - start, row is not None)
+        return row
+    
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_fetch(time.perf_counter() - start, len(rows))
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add_fetch(time.perf_counter() - start, len(rows))
+        return rows
+    
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add_fetch(time.perf_counter() - start, 0)
+            raise
+        self._add_fetch(time.perf_counter() - start, 1)
+        return row
+
+
+INSTRUMENTED_METHODS = ('cursor', 'execute', 'executemany')
+
+
+def _instrument_connection(conn):
+    """Shadow a connection's statement methods while profiles are active."""
+    profiles = tuple(_active_profiles())
+    if not profiles:
+        return
+    
+    def cursor():
+        profiled = sqlite3.Connection.cursor(conn, ProfiledCursor)
+        profiled.profiles = profiles
+        return profiled
+    
+    def execute(sql, parameters=()):
+        return cursor().execute(sql, parameters)
+    
+    def executemany(sql, seq_of_parameters):
+        return cursor().executemany(sql, seq_of_parameters)
+    
+    conn.cursor = cursor
+    conn.execute = execute
+    conn.executemany = executemany
+
+
+def _uninstrument_connection(conn):
+    """Restore a connection's plain sqlite3 methods before it goes back to the pool."""
+    for name in INSTRUMENTED_METHODS:
+        conn.__dict__.pop(name, None)
+
+
+def enable_query_profiling():
+    """Instrument connections handed out by get_db() while a profile is active."""
+    database.set_connection_hooks(_instrument_connection, _uninstrument_connection)
+
+
+def start_query_profile():
+    """
+    Start recording statements run on this thread's new connections.
+    
+    Profiles nest: statements are recorded into every active profile.
+    
+    Returns:
+        The new QueryProfile; pass it to stop_query_profile() when done
+    """
+    profile = QueryProfile()
+    _active_profiles().append(profile)
+    return profile
+
+
+def stop_query_profile(profile):
+    """Stop recording into a profile (no-op if it is not active)."""
+    profile.finish()
+    profiles = _active_profiles()
+    if profile in profiles:
+        profiles.remove(profile)
+
+
+def log_query_profile(profile, method, path, status):
+    """Write a request's profile as one JSON line to the shoplist.profile logger."""
+    logger.info(json.dumps({
+        'method': method,
+        'path': path,
+        'status': status,
+        **profile.summary()
+    }))
+
+
+def profile_call(func, sort='cumulative', limit=30):
+    """
+    Run func under cProfile and a query profile.
+    
+    Args:
+        func: Callable taking no arguments
+        sort: pstats sort key for the function report
+        limit: Number of functions in the report
+    
+    Returns:
+        Tuple of (func's result, report dictionary with 'sql' summary and 'functions' text)
+    
+    Raises:
+        KeyError: If sort is not a pstats sort key
+    """
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        raise KeyError(sort)
+    
+    profiler = cProfile.Profile()
+    query_profile = start_query_profile()
+    try:
+        profiler.enable()
+        try:
+            result = func()
+        finally:
+            profiler.disable()
+    finally:
+        stop_query_profile(query_profile)
+    
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).strip_dirs().sort_stats(sort).print_stats(limit)
+    return result, {'sql': query_profile.summary(), 'functions': output.getvalue()}
@@ -0,0 +1,379 @@
+"""
+Cached sub-recipe structure.
+
+The dependency graph is an in-memory index of which recipes use which
+sub-recipes. It is loaded with one query and kept in sync by the recipe
+write endpoints, so cycle checks and ancestor/descendant lookups need no SQL.
+
+Every recipe is also flattened into a bill of materials: the base ingredient
+quantities needed per unit of its yield, with nested sub-recipes already
+expanded. Bills are computed bottom-up (children before parents) the first
+time they are needed and reused until the recipe or one of its sub-recipes
+changes, so expanding a deep sub-recipe tree is a single scale of a cached
+vector instead of a recursive walk with one query per level.
+"""
+import threading
+from typing import NamedTuple, Optional
+
+from backend import database
+
+
+class BomLine(NamedTuple):
+    ingredient_id: int
+    unit_id: int
+    size_qualifier: Optional[str]
+    preparation_notes: Optional[str]
+    quantity_per_yield: float
+
+
+class BillOfMaterials(NamedTuple):
+    recipe_id: int
+    yield_quantity: float
+    yield_unit_id: int
+    lines: tuple
+
+
+class RecipeDependencyGraph:
+    """
+    Adjacency index of sub-recipe references.
+    
+    Attributes:
+        children: Recipe ID -> IDs of the sub-recipes it uses
+        parents: Recipe ID -> IDs of the recipes that use it as a sub-recipe
+    """
+    
+    def __init__(self, edges=()):
+        self.children = {}
+        self.parents = {}
+        for recipe_id, sub_recipe_id in edges:
+            self.children.setdefault(recipe_id, set()).add(sub_recipe_id)
+            self.parents.setdefault(sub_recipe_id, set()).add(recipe_id)
+    
+    def set_children(self, recipe_id, sub_recipe_ids):
+        """Replace the sub-recipes used by recipe_id."""
+        for sub_recipe_id in self.children.pop(recipe_id, ()):
+            self.parents[sub_recipe_id].discard(recipe_id)
+        sub_recipe_ids = set(sub_recipe_ids)
+        if sub_recipe_ids:
+            self.children[recipe_id] = sub_recipe_ids
+        for sub_recipe_id in sub_recipe_ids:
+            self.parents.setdefault(sub_recipe_id, set()).add(recipe_id)
+    
+    def remove(self, recipe_id):
+        """Remove a recipe and every reference to or from it."""
+        self.set_children(recipe_id, ())
+        for parent_id in self.parents.pop(recipe_id, ()):
+            self.children[parent_id].discard(recipe_id)
+    
+    def _reachable(self, start_ids, adjacency):
+        reached = set()
+        stack = list(start_ids)
+        while stack:
+            for next_id in adjacency.get(stack.pop(), ()):
+                if next_id not in reached:
+                    reached.add(next_id)
+                    stack.append(next_id)
+        return reached
+    
+    def descendants(self, recipe_ids):
+        """IDs of every sub-recipe used directly or indirectly by recipe_ids."""
+        return self._reachable(recipe_ids, self.children)
+    
+    def ancestors(self, recipe_ids):
+        """IDs of every recipe that uses recipe_ids directly or indirectly."""
+        return self._reachable(recipe_ids, self.parents)
+
+
+_dependency_graph = None
+_dependency_graph_version = 0  # Bumped on every write so a concurrent load is not installed stale
+_boms = {}
+_boms_version = 0  # Bumped on every invalidation so a concurrent computation is not installed stale
+_state_db_path = None
+_lock = threading.RLock()
+
+
+def _check_db_path():
+    """Reset all cached state if DB_PATH changed. Caller holds _lock."""
+    global _dependency_graph, _boms, _state_db_path
+    if _state_db_path != str(database.DB_PATH):
+        _dependency_graph = None
+        _boms = {}
+        _state_db_path = str(database.DB_PATH)
+
+
+def _get_dependency_graph(db=None):
+    """
+    Get the dependency graph, loading it if needed. Caller must not hold _lock.
+    
+    The graph is loaded from committed data only: a connection with an open
+    transaction is not used, so uncommitted edits never leak into the index.
+    """
+    global _dependency_graph
+    
+    with _lock:
+        _check_db_path()
+        if _dependency_graph is not None:
+            return _dependency_graph
+        version = _dependency_graph_version
+    
+    if db is None or db.in_transaction:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT DISTINCT recipe_id, sub_recipe_id
+            FROM recipe_items
+            WHERE item_type = 'sub_recipe' AND sub_recipe_id IS NOT NULL
+        """)
+        graph = RecipeDependencyGraph((row['recipe_id'], row['sub_recipe_id']) for row in cursor.fetchall())
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    with _lock:
+        _check_db_path()
+        if _dependency_graph is None and version == _dependency_graph_version:
+            _dependency_graph = graph
+        return _dependency_graph or graph
+
+
+def get_recipe_descendants(recipe_id, db=None):
+    """
+    Get every sub-recipe used directly or indirectly by a recipe.
+    
+    Args:
+        recipe_id: ID of the recipe
+        db: Optional database connection
+        
+    Returns:
+        Set of recipe IDs
+    """
+    graph = _get_dependency_graph(db)
+    with _lock:
+        return graph.descendants([recipe_id])
+
+
+def get_recipe_ancestors(recipe_id, db=None):
+    """
+    Get every recipe that uses a recipe directly or indirectly.
+    
+    Args:
+        recipe_id: ID of the recipe
+        db: Optional database connection
+        
+    Returns:
+        Set of recipe IDs
+    """
+    graph = _get_dependency_graph(db)
+    with _lock:
+        return graph.ancestors([recipe_id])
+
+
+def would_create_cycle(recipe_id, sub_recipe_ids, db=None):
+    """
+    Check whether using sub_recipe_ids inside recipe_id would create a cycle.
+    
+    One reachability search covers all sub-recipes of a save.
+    
+    Args:
+        recipe_id: ID of the recipe being saved
+        sub_recipe_ids: IDs of the sub-recipes it will use
+        db: Optional database connection
+        
+    Returns:
+        True if a circular reference would be created, False otherwise
+    """
+    sub_recipe_ids = set(sub_recipe_ids)
+    if not sub_recipe_ids:
+        return False
+    if recipe_id in sub_recipe_ids:
+        return True
+    graph = _get_dependency_graph(db)
+    with _lock:
+        return recipe_id in graph.descendants(sub_recipe_ids)
+
+
+def update_recipe_dependencies(recipe_id, sub_recipe_ids):
+    """
+    Record the sub-recipes of a saved recipe. Call after the save is committed.
+    
+    Cached bills of materials of the recipe and its ancestors are invalidated.
+    """
+    global _dependency_graph_version
+    with _lock:
+        invalidate_recipes([recipe_id])
+        _dependency_graph_version += 1
+        if _dependency_graph is not None:
+            _dependency_graph.set_children(recipe_id, sub_recipe_ids)
+
+
+def remove_recipe_dependencies(recipe_id):
+    """
+    Forget a deleted recipe. Call after the delete is committed.
+    
+    Cached bills of materials of the recipe and its ancestors are invalidated.
+    """
+    global _dependency_graph_version
+    with _lock:
+        invalidate_recipes([recipe_id])
+        _dependency_graph_version += 1
+        if _dependency_graph is not None:
+            _dependency_graph.remove(recipe_id)
+
+
+def _load_recipe_trees(cursor, recipe_ids, cached):
+    """
+    Load the recipes and items under recipe_ids, one level per query pair.
+    
+    Recipes already in ``cached`` are not reloaded and their subtrees are
+    not descended into.
+    
+    Returns:
+        Tuple of (recipes by ID, recipe_items rows by recipe ID)
+    """
+    recipes = {}
+    items = {}
+    frontier = [recipe_id for recipe_id in dict.fromkeys(recipe_ids) if recipe_id not in cached]
+    while frontier:
+        for row in database.fetch_in(cursor, """
+            SELECT id, yield_quantity, yield_unit_id
+            FROM recipes
+            WHERE id IN ({placeholders})
+        """, frontier):
+            recipes[row['id']] = row
+            items[row['id']] = []
+        for row in database.fetch_in(cursor, """
+            SELECT recipe_id, item_type, ingredient_id, sub_recipe_id, quantity, unit_id,
+                   size_qualifier, preparation_notes
+            FROM recipe_items
+            WHERE recipe_id IN ({placeholders})
+            ORDER BY id
+        """, frontier):
+            if row['recipe_id'] in items:
+                items[row['recipe_id']].append(row)
+        next_frontier = []
+        for recipe_id in frontier:
+            for item in items.get(recipe_id, []):
+                sub_recipe_id = item['sub_recipe_id']
+                if (item['item_type'] == 'sub_recipe' and sub_recipe_id not in recipes
+                        and sub_recipe_id not in cached and sub_recipe_id not in next_frontier):
+                    next_frontier.append(sub_recipe_id)
+        frontier = next_frontier
+    return recipes, items
+
+
+def _flatten(recipe_id, recipes, items, computed, in_progress):
+    """Compute the bill of materials for recipe_id after those of its sub-recipes."""
+    if recipe_id in computed:
+        return computed[recipe_id]
+    if recipe_id in in_progress:
+        raise ValueError(f"Circular reference detected with recipe {recipe_id}")
+    recipe = recipes.get(recipe_id)
+    if recipe is None:
+        return None
+    
+    in_progress.add(recipe_id)
+    totals = {}
+    for item in items[recipe_id]:
+        per_yield = item['quantity'] / recipe['yield_quantity']
+        if item['item_type'] == 'sub_recipe':
+            sub_bom = _flatten(item['sub_recipe_id'], recipes, items, computed, in_progress)
+            if sub_bom is None:
+                continue
+            for line in sub_bom.lines:
+                key = line[:4]
+                totals[key] = totals.get(key, 0) + per_yield * line.quantity_per_yield
+        else:
+            key = (item['ingredient_id'], item['unit_id'], item['size_qualifier'], item['preparation_notes'])
+            totals[key] = totals.get(key, 0) + per_yield
+    in_progress.discard(recipe_id)
+    
+    bom = BillOfMaterials(
+        recipe_id,
+        recipe['yield_quantity'],
+        recipe['yield_unit_id'],
+        tuple(BomLine(*key, quantity) for key, quantity in totals.items())
+    )
+    computed[recipe_id] = bom
+    return bom
+
+
+def get_bills_of_materials(recipe_ids, db=None):
+    """
+    Get flattened bills of materials for several recipes.
+    
+    Args:
+        recipe_ids: Iterable of recipe IDs
+        db: Optional database connection
+    
+    Returns:
+        Dictionary mapping recipe ID to BillOfMaterials (missing recipes are omitted)
+    
+    Raises:
+        ValueError: If a circular sub-recipe reference is found
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    with _lock:
+        _check_db_path()
+        cached = dict(_boms)
+        db_path = _state_db_path
+        version = _boms_version
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in cached]
+    if not missing:
+        return {recipe_id: cached[recipe_id] for recipe_id in recipe_ids}
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        recipes, items = _load_recipe_trees(db.cursor(), missing, cached)
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    computed = dict(cached)
+    for recipe_id in missing:
+        _flatten(recipe_id, recipes, items, computed, set())
+    
+    with _lock:
+        if _state_db_path == db_path and version == _boms_version:
+            for recipe_id in recipes:
+                if recipe_id in computed:
+                    _boms[recipe_id] = computed[recipe_id]
+    
+    return {recipe_id: computed[recipe_id] for recipe_id in recipe_ids if recipe_id in computed}
+
+
+def get_bill_of_materials(recipe_id, db=None):
+    """Get the flattened bill of materials for one recipe, or None if it does not exist."""
+    return get_bills_of_materials([recipe_id], db).get(recipe_id)
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Drop cached bills of materials after recipes change.
+    
+    The recipes themselves and every recipe that uses them, directly or
+    through other sub-recipes, are invalidated. If the dependency graph is
+    not loaded the whole cache is dropped.
+    
+    Args:
+        recipe_ids: IDs of recipes that were updated or deleted
+    """
+    global _boms_version
+    with _lock:
+        _boms_version += 1
+        if _dependency_graph is None:
+            _boms.clear()
+            return
+        for recipe_id in set(recipe_ids) | _dependency_graph.ancestors(recipe_ids):
+            _boms.pop(recipe_id, None)
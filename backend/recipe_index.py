@@ -0,0 +1,215 @@
+"""
+In-memory index for search-as-you-type over recipe and ingredient names.
+
+The shopping page looks recipes up on every keystroke, by recipe name and by
+the names of the ingredients and sub-recipes they use. Matching substrings
+with SQL (or shipping the catalog to the client) costs a scan per
+keystroke, so this module keeps a trigram index of every recipe name and
+item name: a term's candidates are the intersection of its trigrams'
+postings, checked with a substring test. Terms shorter than a trigram scan
+the names directly.
+
+The index is built on first use and rebuilt when the data version changes
+(see shopping_cache.bump_data_version()).
+"""
+import threading
+from collections import defaultdict
+
+from backend import database
+from backend.search import RECIPE_COLUMNS, TRIGRAM_LENGTH, parse_search_terms
+from backend.shopping_cache import get_data_version
+
+# Results returned when the client does not give a limit, and the most it can ask for
+SEARCH_RESULT_LIMIT = 20
+MAX_SEARCH_RESULT_LIMIT = 100
+
+# Ranks of a recipe's best match (lower is better)
+RANK_EXACT_NAME = 0
+RANK_NAME_PREFIX = 1
+RANK_NAME_WORD_PREFIX = 2
+RANK_NAME_SUBSTRING = 3
+RANK_NAME_ALL_TERMS = 4
+RANK_ITEM = 5
+
+
+def trigrams(text):
+    """Get the set of trigrams of a lowercase string."""
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+class NgramIndex:
+    """Substring lookup over a fixed list of lowercase strings."""
+    
+    def __init__(self, strings):
+        self.strings = strings
+        self.postings = defaultdict(set)
+        for position, text in enumerate(strings):
+            for gram in trigrams(text):
+                self.postings[gram].add(position)
+    
+    def find(self, term):
+        """Get the positions of the strings containing term."""
+        if len(term) < TRIGRAM_LENGTH:
+            return [position for position, text in enumerate(self.strings) if term in text]
+        
+        postings = sorted((self.postings.get(gram, set()) for gram in trigrams(term)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return [position for position in candidates if term in self.strings[position]]
+
+
+class RecipeIndex:
+    """Recipes with trigram indexes over their names and their items' names."""
+    
+    def __init__(self, recipes, item_names):
+        """
+        Args:
+            recipes: List of recipe dicts (RECIPE_COLUMNS)
+            item_names: Dictionary mapping recipe ID to the names of the ingredients and sub-recipes it uses
+        """
+        self.recipes = {recipe['id']: recipe for recipe in recipes}
+        self.recipe_ids = [recipe['id'] for recipe in recipes]
+        self.names = NgramIndex([recipe['name'].lower() for recipe in recipes])
+        
+        # Distinct item names, each with the recipes using it
+        users = defaultdict(set)
+        for recipe_id, names in item_names.items():
+            for name in names:
+                users[name.lower()].add(recipe_id)
+        self.item_names = NgramIndex(list(users))
+        self.item_users = [users[name] for name in self.item_names.strings]
+    
+    def get(self, recipe_ids):
+        """Get recipes by ID, in the order given, skipping unknown IDs."""
+        return [self.recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in self.recipes]
+    
+    def _name_rank(self, name, query):
+        if name == query:
+            return RANK_EXACT_NAME
+        if name.startswith(query):
+            return RANK_NAME_PREFIX
+        if any(word.startswith(query) for word in name.split()):
+            return RANK_NAME_WORD_PREFIX
+        return RANK_NAME_SUBSTRING
+    
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, exclude=()):
+        """
+        Find recipes by name or by the names of what they use.
+        
+        Recipes whose name contains the whole query rank first (exact, then
+        prefix, then word prefix, then anywhere), then recipes whose name
+        contains every term, then recipes using items that match any term
+        (most terms matched first). Ties are ordered by name.
+        
+        Args:
+            query: Search string; empty lists recipes by name
+            limit: Maximum number of results
+            exclude: IDs of recipes to leave out (e.g. already selected)
+        
+        Returns:
+            List of recipe dicts, each with a 'match' key: 'name' or 'ingredient'
+        """
+        exclude = set(exclude)
+        query = ' '.join(parse_search_terms(query))
+        
+        if not query:
+            names = sorted(
+                (self.recipes[recipe_id]['name'].lower(), recipe_id)
+                for recipe_id in self.recipe_ids if recipe_id not in exclude
+            )
+            return [{**self.recipes[recipe_id], 'match': 'name'} for _, recipe_id in names[:limit]]
+        
+        # recipe ID -> (rank, -terms matched)
+        ranks = {}
+        for position in self.names.find(query):
+            ranks[self.recipe_ids[position]] = (self._name_rank(self.names.strings[position], query), 0)
+        
+        terms = list(dict.fromkeys(query.split()))
+        if len(terms) > 1:
+            matching = None
+            for term in terms:
+                found = set(self.names.find(term))
+                matching = found if matching is None else matching & found
+            for position in matching:
+                ranks.setdefault(self.recipe_ids[position], (RANK_NAME_ALL_TERMS, 0))
+        
+        term_counts = defaultdict(int)
+        for term in terms:
+            using = set()
+            for position in self.item_names.find(term):
+                using |= self.item_users[position]
+            for recipe_id in using:
+                term_counts[recipe_id] += 1
+        for recipe_id, count in term_counts.items():
+            ranks.setdefault(recipe_id, (RANK_ITEM, -count))
+        
+        ordered = sorted(
+            (rank, self.recipes[recipe_id]['name'].lower(), recipe_id)
+            for recipe_id, rank in ranks.items() if recipe_id not in exclude
+        )
+        return [
+            {**self.recipes[recipe_id], 'match': 'ingredient' if rank[0] == RANK_ITEM else 'name'}
+            for rank, _, recipe_id in ordered[:limit]
+        ]
+
+
+def load_recipe_index(db=None):
+    """
+    Build the index from the database.
+    
+    Returns:
+        RecipeIndex
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute(f"""
+            SELECT {RECIPE_COLUMNS}
+            FROM recipes r
+            JOIN unit_types ut ON r.yield_unit_id = ut.id
+        """)
+        recipes = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.execute("""
+            SELECT ri.recipe_id, COALESCE(i.name, sr.name) AS name
+            FROM recipe_items ri
+            LEFT JOIN ingredients i ON ri.item_type = 'ingredient' AND ri.ingredient_id = i.id
+            LEFT JOIN recipes sr ON ri.item_type = 'sub_recipe' AND ri.sub_recipe_id = sr.id
+        """)
+        item_names = defaultdict(set)
+        for row in cursor.fetchall():
+            if row['name'] is not None:
+                item_names[row['recipe_id']].add(row['name'])
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    return RecipeIndex(recipes, item_names)
+
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+
+
+def get_recipe_index(db=None):
+    """Get the index for the current data, rebuilding it after writes."""
+    global _index, _index_key
+    # Read the version before loading: a write committed meanwhile bumps it and forces another rebuild
+    key = (str(database.DB_PATH), get_data_version())
+    if _index_key == key:
+        return _index
+    with _index_lock:
+        if _index_key != key:
+            _index = load_recipe_index(db)
+            _index_key = key
+        return _index
@@ -0,0 +1,303 @@
+"""
+Bulk recipe import and export as JSON Lines (one recipe per line).
+
+Recipes refer to units, ingredients and sub-recipes by name, so an export
+from one database can be imported into another:
+
+    {"name": "Pesto Pasta", "is_sub_recipe": false, "yield_quantity": 4,
+     "yield_unit": "serving", "page_number": 12,
+     "items": [{"item_type": "ingredient", "ingredient": "Basil",
+                "quantity": 2, "unit": "cup", "size_qualifier": null,
+                "preparation_notes": "packed"},
+               {"item_type": "sub_recipe", "sub_recipe": "Pesto",
+                "quantity": 0.5, "unit": "cup"}]}
+
+On import, IDs (yield_unit_id, ingredient_id, sub_recipe_id, unit_id) may
+be given instead of names. A sub-recipe name may refer to another recipe in
+the same import or to an existing recipe.
+"""
+import json
+from collections import Counter, deque
+
+from backend import database
+from backend.search import pause_search_indexing, resume_search_indexing
+from backend.units import get_unit_registry
+
+
+def export_recipes(db=None):
+    """
+    Stream every recipe as JSON Lines.
+    
+    Recipes and their items are read with two cursors walked side by side
+    (both ordered by recipe ID), so only one recipe is in memory at a time.
+    
+    Args:
+        db: Optional database connection (closed when the generator finishes if not given)
+    
+    Yields:
+        One JSON-encoded recipe per line, newline-terminated
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        recipes = db.execute("""
+            SELECT r.id, r.name, r.is_sub_recipe, r.yield_quantity, r.page_number,
+                   ut.name as yield_unit
+            FROM recipes r
+            JOIN unit_types ut ON r.yield_unit_id = ut.id
+            ORDER BY r.id
+        """)
+        items = db.execute("""
+            SELECT ri.recipe_id, ri.item_type, ri.quantity, ri.size_qualifier, ri.preparation_notes,
+                   i.name as ingredient, sr.name as sub_recipe, ut.name as unit
+            FROM recipe_items ri
+            LEFT JOIN ingredients i ON ri.item_type = 'ingredient' AND ri.ingredient_id = i.id
+            LEFT JOIN recipes sr ON ri.item_type = 'sub_recipe' AND ri.sub_recipe_id = sr.id
+            LEFT JOIN unit_types ut ON ri.unit_id = ut.id
+            ORDER BY ri.recipe_id, ri.id
+        """)
+        
+        item = items.fetchone()
+        for recipe in recipes:
+            # Skip items of recipes that no longer exist
+            while item is not None and item['recipe_id'] < recipe['id']:
+                item = items.fetchone()
+            
+            recipe_items = []
+            while item is not None and item['recipe_id'] == recipe['id']:
+                recipe_item = {
+                    'item_type': item['item_type'],
+                    'quantity': item['quantity'],
+                    'unit': item['unit'],
+                    'size_qualifier': item['size_qualifier'],
+                    'preparation_notes': item['preparation_notes']
+                }
+                if item['item_type'] == 'sub_recipe':
+                    recipe_item['sub_recipe'] = item['sub_recipe']
+                else:
+                    recipe_item['ingredient'] = item['ingredient']
+                recipe_items.append(recipe_item)
+                item = items.fetchone()
+            
+            yield json.dumps({
+                'name': recipe['name'],
+                'is_sub_recipe': bool(recipe['is_sub_recipe']),
+                'yield_quantity': recipe['yield_quantity'],
+                'yield_unit': recipe['yield_unit'],
+                'page_number': recipe['page_number'],
+                'items': recipe_items
+            }) + '\n'
+    
+    finally:
+        if close_after:
+            db.close()
+
+
+def parse_recipe_lines(lines):
+    """
+    Parse JSON Lines into recipe dictionaries, skipping blank lines.
+    
+    Args:
+        lines: Iterable of str or bytes lines
+    
+    Returns:
+        List of recipe dictionaries
+    
+    Raises:
+        ValueError: If a line is not a JSON object
+    """
+    records = []
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg})")
+        if not isinstance(record, dict) or not record.get('name'):
+            raise ValueError(f"Line {line_number}: expected a recipe object with a name")
+        records.append(record)
+    return records
+
+
+def _order_by_dependencies(records):
+    """
+    Order imported recipes so sub-recipes come before the recipes using them.
+    
+    Only references between recipes of the same import are considered; the
+    import cannot create cycles through existing recipes, since those never
+    refer to new ones.
+    
+    Raises:
+        ValueError: If the imported recipes refer to each other in a cycle
+    """
+    by_name = {record['name']: record for record in records}
+    children = {
+        record['name']: {
+            item['sub_recipe'] for item in record.get('items', [])
+            if item.get('item_type') == 'sub_recipe' and item.get('sub_recipe') in by_name
+        }
+        for record in records
+    }
+    
+    # Kahn's algorithm: repeatedly take recipes whose sub-recipes are all placed
+    pending = {name: len(sub_names) for name, sub_names in children.items()}
+    parents = {}
+    for name, sub_names in children.items():
+        for sub_name in sub_names:
+            parents.setdefault(sub_name, []).append(name)
+    ready = deque(record['name'] for record in records if pending[record['name']] == 0)
+    ordered = []
+    while ready:
+        name = ready.popleft()
+        ordered.append(by_name[name])
+        for parent_name in parents.get(name, []):
+            pending[parent_name] -= 1
+            if pending[parent_name] == 0:
+                ready.append(parent_name)
+    
+    if len(ordered) < len(records):
+        cyclic = sorted(name for name, count in pending.items() if count > 0)
+        raise ValueError(f"Circular sub-recipe reference between imported recipes: {', '.join(cyclic)}")
+    return ordered
+
+
+def _lookup_ids(cursor, table, names):
+    """Map names to IDs for rows of table (recipes or ingredients)."""
+    rows = database.fetch_in(cursor, f"SELECT id, name FROM {table} WHERE name IN ({{placeholders}})", list(names))
+    return {row['name']: row['id'] for row in rows}
+
+
+def import_recipes(records, db=None):
+    """
+    Create recipes in one transaction.
+    
+    Names are resolved with set-based lookups, recipes are inserted in
+    dependency order and all items are inserted with one executemany().
+    Nothing is written if any recipe is invalid.
+    
+    Args:
+        records: List of recipe dictionaries (see module docstring)
+        db: Optional database connection
+    
+    Returns:
+        Tuple of (new recipe ID by name, sub-recipe IDs used by each new recipe ID)
+    
+    Raises:
+        ValueError: If a recipe is invalid or already exists, refers to
+            something unknown, or the recipes refer to each other in a cycle
+    """
+    names = [record['name'] for record in records]
+    duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Duplicate recipe names in import: {', '.join(duplicates)}")
+    records = _order_by_dependencies(records)
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        units = get_unit_registry(db)
+        cursor = db.cursor()
+        
+        existing_names = sorted(_lookup_ids(cursor, 'recipes', names))
+        if existing_names:
+            raise ValueError(f"Recipes already exist: {', '.join(existing_names)}")
+        
+        ingredient_ids = _lookup_ids(cursor, 'ingredients', {
+            item['ingredient'] for record in records for item in record.get('items', [])
+            if item.get('item_type') != 'sub_recipe' and item.get('ingredient')
+        })
+        existing_recipe_ids = _lookup_ids(cursor, 'recipes', {
+            item['sub_recipe'] for record in records for item in record.get('items', [])
+            if item.get('item_type') == 'sub_recipe' and item.get('sub_recipe')
+        } - set(names))
+        
+        def unit_id(data, key, recipe_name):
+            if data.get(key + '_id') is not None:
+                return data[key + '_id']
+            resolved = units.id_for(data.get(key) or '')
+            if resolved is None:
+                raise ValueError(f"Recipe '{recipe_name}': unknown unit '{data.get(key)}'")
+            return resolved
+        
+        recipe_rows = []
+        for record in records:
+            yield_unit_id = unit_id(record, 'yield_unit', record['name'])
+            if record.get('is_sub_recipe') and units.category_of(yield_unit_id) == 'special':
+                raise ValueError(f"Recipe '{record['name']}': sub-recipes cannot have \"servings\" as yield unit")
+            recipe_rows.append((
+                record['name'],
+                int(bool(record.get('is_sub_recipe'))),
+                record['yield_quantity'],
+                yield_unit_id,
+                record.get('page_number')
+            ))
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        pause_search_indexing(cursor)
+        cursor.executemany("""
+            INSERT INTO recipes (name, is_sub_recipe, yield_quantity, yield_unit_id, page_number)
+            VALUES (?, ?, ?, ?, ?)
+        """, recipe_rows)
+        recipe_ids = _lookup_ids(cursor, 'recipes', names)
+        
+        item_rows = []
+        sub_recipe_ids = {}
+        for record in records:
+            recipe_id = recipe_ids[record['name']]
+            sub_recipe_ids[recipe_id] = []
+            for item in record.get('items', []):
+                item_type = 'sub_recipe' if item.get('item_type') == 'sub_recipe' else 'ingredient'
+                ingredient_id = None
+                sub_recipe_id = None
+                if item_type == 'sub_recipe':
+                    sub_recipe_id = item.get('sub_recipe_id')
+                    if sub_recipe_id is None:
+                        sub_name = item.get('sub_recipe')
+                        sub_recipe_id = recipe_ids.get(sub_name, existing_recipe_ids.get(sub_name))
+                        if sub_recipe_id is None:
+                            raise ValueError(f"Recipe '{record['name']}': unknown sub-recipe '{sub_name}'")
+                    sub_recipe_ids[recipe_id].append(sub_recipe_id)
+                else:
+                    ingredient_id = item.get('ingredient_id')
+                    if ingredient_id is None:
+                        ingredient_id = ingredient_ids.get(item.get('ingredient'))
+                        if ingredient_id is None:
+                            raise ValueError(f"Recipe '{record['name']}': unknown ingredient '{item.get('ingredient')}'")
+                item_rows.append((
+                    recipe_id,
+                    item_type,
+                    ingredient_id,
+                    sub_recipe_id,
+                    item['quantity'],
+                    unit_id(item, 'unit', record['name']),
+                    item.get('size_qualifier'),
+                    item.get('preparation_notes')
+                ))
+        
+        cursor.executemany("""
+            INSERT INTO recipe_items (recipe_id, item_type, ingredient_id, sub_recipe_id,
+                                     quantity, unit_id, size_qualifier, preparation_notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, item_rows)
+        resume_search_indexing(cursor, recipe_ids.values())
+        db.commit()
+        return recipe_ids, sub_recipe_ids
+    
+    except Exception:
+        db.rollback()
+        raise
+    
+    finally:
+        if close_after:
+            db.close()
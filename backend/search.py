@@ -0,0 +1,193 @@
+"""
+Recipe search by ingredient and sub-recipe name.
+
+Searches use the recipe_search full-text index (see migrations.py): one
+trigram-tokenized document per recipe with the names of everything it uses,
+so a term matches anywhere inside a name, including partially typed
+prefixes. Terms shorter than three characters cannot use trigrams and are
+matched with LIKE against the same index. If this SQLite build has no FTS5
+the index does not exist and searches fall back to joining recipe_items.
+"""
+from backend import database
+from backend.migrations import INDEX_RECIPES_SQL
+
+RECIPE_COLUMNS = """
+    r.id, r.name, r.is_sub_recipe, r.yield_quantity, r.yield_unit_id, r.page_number,
+    ut.name as yield_unit_name
+"""
+
+MATCH_MODES = ('any', 'all')
+SORT_ORDERS = ('name', 'rank')
+
+TRIGRAM_LENGTH = 3
+
+
+def parse_search_terms(query):
+    """Split a search string on commas and whitespace into lowercase terms."""
+    return [term.lower() for term in query.replace(',', ' ').split()]
+
+
+def _has_search_index(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_search'")
+    return cursor.fetchone() is not None
+
+
+def _quote_match_term(term):
+    """Quote a term as an FTS5 string so operators and punctuation are literal."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _match_with_index(cursor, terms, match):
+    """
+    Find matching recipes in the full-text index.
+    
+    Returns:
+        Dictionary mapping recipe ID to bm25 score (lower is better)
+    """
+    long_terms = [term for term in terms if len(term) >= TRIGRAM_LENGTH]
+    short_terms = [term for term in terms if len(term) < TRIGRAM_LENGTH]
+    
+    # Each result set maps recipe ID -> score; short terms have no score
+    result_sets = []
+    if long_terms:
+        operator = ' OR ' if match == 'any' else ' AND '
+        cursor.execute("""
+            SELECT rowid, bm25(recipe_search) AS score
+            FROM recipe_search
+            WHERE recipe_search MATCH ?
+        """, (operator.join(_quote_match_term(term) for term in long_terms),))
+        result_sets.append({row['rowid']: row['score'] for row in cursor.fetchall()})
+    for term in short_terms:
+        cursor.execute("SELECT rowid FROM recipe_search WHERE names LIKE ?", (f'%{term}%',))
+        result_sets.append({row['rowid']: 0.0 for row in cursor.fetchall()})
+    
+    matches = result_sets[0]
+    for result_set in result_sets[1:]:
+        if match == 'any':
+            for recipe_id, score in result_set.items():
+                matches[recipe_id] = min(matches.get(recipe_id, 0.0), score)
+        else:
+            matches = {recipe_id: score for recipe_id, score in matches.items() if recipe_id in result_set}
+    return matches
+
+
+def _match_with_like(cursor, terms, match):
+    """
+    Find matching recipes by joining their items (no full-text index).
+    
+    Returns:
+        Dictionary mapping recipe ID to score (always 0.0)
+    """
+    term_condition = """
+        EXISTS (
+            SELECT 1
+            FROM recipe_items ri
+            LEFT JOIN ingredients i ON ri.item_type = 'ingredient' AND ri.ingredient_id = i.id
+            LEFT JOIN recipes sr ON ri.item_type = 'sub_recipe' AND ri.sub_recipe_id = sr.id
+            WHERE ri.recipe_id = r.id AND (LOWER(i.name) LIKE ? OR LOWER(sr.name) LIKE ?)
+        )
+    """
+    operator = ' OR ' if match == 'any' else ' AND '
+    params = []
+    for term in terms:
+        params.extend([f'%{term}%', f'%{term}%'])
+    cursor.execute(f"""
+        SELECT r.id
+        FROM recipes r
+        WHERE {operator.join([term_condition] * len(terms))}
+    """, params)
+    return {row['id']: 0.0 for row in cursor.fetchall()}
+
+
+def pause_search_indexing(cursor):
+    """
+    Pause the recipe_search triggers for a bulk write.
+    
+    Must be called inside the write transaction, and followed by
+    resume_search_indexing() in the same transaction.
+    
+    Args:
+        cursor: Cursor of the connection doing the bulk write
+    """
+    if _has_search_index(cursor):
+        cursor.execute("INSERT INTO recipe_search_paused (paused) VALUES (1)")
+
+
+def resume_search_indexing(cursor, recipe_ids):
+    """
+    Reindex the recipes written while paused and resume the triggers.
+    
+    Args:
+        cursor: Cursor of the connection doing the bulk write
+        recipe_ids: IDs of the recipes whose items were written
+    """
+    if not _has_search_index(cursor):
+        return
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), database.MAX_IN_PARAMETERS):
+        chunk = recipe_ids[start:start + database.MAX_IN_PARAMETERS]
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(f"DELETE FROM recipe_search WHERE rowid IN ({placeholders})", chunk)
+        cursor.execute(INDEX_RECIPES_SQL.format(recipe_filter=placeholders), chunk)
+    cursor.execute("DELETE FROM recipe_search_paused")
+
+
+def search_recipes(terms, match='any', sort='name', db=None):
+    """
+    Find recipes that use ingredients or sub-recipes matching search terms.
+    
+    Args:
+        terms: List of lowercase search terms (see parse_search_terms)
+        match: 'any' to require one matching term, 'all' to require every term
+        sort: 'name' to order alphabetically, 'rank' to order by relevance
+        db: Optional database connection
+    
+    Returns:
+        List of recipe dictionaries
+    
+    Raises:
+        ValueError: If match or sort is not a supported value
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"match must be one of: {', '.join(MATCH_MODES)}")
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_ORDERS)}")
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        if not terms:
+            cursor.execute(f"""
+                SELECT {RECIPE_COLUMNS}
+                FROM recipes r
+                JOIN unit_types ut ON r.yield_unit_id = ut.id
+                ORDER BY r.name
+            """)
+            return [dict(row) for row in cursor.fetchall()]
+        
+        if _has_search_index(cursor):
+            scores = _match_with_index(cursor, terms, match)
+        else:
+            scores = _match_with_like(cursor, terms, match)
+        
+        recipes = [dict(row) for row in database.fetch_in(cursor, f"""
+            SELECT {RECIPE_COLUMNS}
+            FROM recipes r
+            JOIN unit_types ut ON r.yield_unit_id = ut.id
+            WHERE r.id IN ({{placeholders}})
+        """, list(scores))]
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    if sort == 'rank':
+        recipes.sort(key=lambda recipe: (scores[recipe['id']], recipe['name']))
+    else:
+        recipes.sort(key=lambda recipe: recipe['name'])
+    return recipes
@@ -2,8 +2,23 @@
 Business logic services for conversion, aggregation, and shopping list generation.
 """
 import math
-from typing import Any, Optional
-from backend.database import get_db
+from typing import Optional
+from backend.conversions import get_conversion_graph, get_conversion_graphs
+from backend.database import fetch_in, get_db
+from backend.recipe_graph import get_bill_of_materials, would_create_cycle
+from backend.store_sections import STORE_SECTIONS, get_store_section, get_store_section_map
+from backend.units import get_unit_registry
+from backend.vectorized import HAS_NUMPY, aggregate_ingredient_totals_numpy
+
+
+# Shopping units for which the actual volume/weight needed is shown
+CONTAINER_UNITS = ['package', 'can', 'bottle', 'jar', 'container']
+
+# Preference order of unit categories when picking a size estimation reference unit
+REFERENCE_CATEGORY_RANK = {'weight': 1, 'volume': 2}
+
+# Selections with at least this many recipe items are aggregated with NumPy when it is installed
+VECTORIZE_MIN_ITEMS = 2000
 
 
 def convert_standard_volume(from_unit_id, to_unit_id, quantity, db=None):
@@ -15,65 +30,12 @@ def convert_standard_volume(from_unit_id, to_unit_id, quantity, db=None):
         from_unit_id: ID of source unit
         to_unit_id: ID of target unit
         quantity: Quantity to convert
-        db: Optional database connection
+        db: Optional database connection (only used if the unit registry is not loaded yet)
         
     Returns:
         Converted quantity or None if conversion not possible
     """
-    if db is None:
-        db = get_db()
-        close_after = True
-    else:
-        close_after = False
-    
-    try:
-        cursor = db.cursor()
-        
-        # Get unit names and categories
-        cursor.execute("SELECT id, name, category FROM unit_types WHERE id IN (?, ?)", 
-                      (from_unit_id, to_unit_id))
-        units = {row['id']: row for row in cursor.fetchall()}
-        
-        if from_unit_id not in units or to_unit_id not in units:
-            return None
-        
-        from_unit = units[from_unit_id]
-        to_unit = units[to_unit_id]
-        
-        # Only convert between volume units
-        if from_unit['category'] != 'volume' or to_unit['category'] != 'volume':
-            return None
-        
-        # Standard volume conversions (all to teaspoons as base)
-        # 1 cup = 48 teaspoons
-        # 1 tablespoon = 3 teaspoons
-        # 1 fluid_ounce = 6 teaspoons
-        # 1 milliliter ≈ 0.202884 teaspoons (1 ml = 0.202884 tsp)
-        
-        # Convert to teaspoons first
-        tsp_per_unit = {
-            'cup': 48.0,
-            'tablespoon': 3.0,
-            'teaspoon': 1.0,
-            'fluid_ounce': 6.0,
-            'milliliter': 0.202884,  # Approximate
-        }
-        
-        from_name = from_unit['name'].lower()
-        to_name = to_unit['name'].lower()
-        
-        if from_name not in tsp_per_unit or to_name not in tsp_per_unit:
-            return None
-        
-        # Convert: from_unit → teaspoons → to_unit
-        teaspoons = quantity * tsp_per_unit[from_name]
-        result = teaspoons / tsp_per_unit[to_name]
-        
-        return result
-    
-    finally:
-        if close_after:
-            db.close()
+    return get_unit_registry(db).convert_volume(from_unit_id, to_unit_id, quantity)
 
 
 def convert_to_shopping_unit(ingredient_id, quantity, from_unit_id, db=None):
@@ -87,7 +49,7 @@ def convert_to_shopping_unit(ingredient_id, quantity, from_unit_id, db=None):
         db: Optional database connection
         
     Returns:
-        Tuple of (shopping_quantity, shopping_unit_id) or None if no conversion rule found
+        Tuple of (shopping_quantity, shopping_unit_id) or None if no conversion path found
     """
     if db is None:
         db = get_db()
@@ -110,20 +72,11 @@ def convert_to_shopping_unit(ingredient_id, quantity, from_unit_id, db=None):
         if from_unit_id == shopping_unit_id:
             return (quantity, shopping_unit_id)
         
-        # Find conversion rule
-        cursor.execute("""
-            SELECT conversion_factor 
-            FROM conversion_rules 
-            WHERE ingredient_id = ? AND from_unit_id = ? AND to_unit_id = ?
-        """, (ingredient_id, from_unit_id, shopping_unit_id))
-        
-        rule = cursor.fetchone()
-        if not rule:
+        # Convert through the ingredient's conversion graph (direct or multi-hop)
+        shopping_quantity = get_conversion_graph(ingredient_id, db).convert(quantity, from_unit_id, shopping_unit_id)
+        if shopping_quantity is None:
             return None
         
-        conversion_factor = rule['conversion_factor']
-        shopping_quantity = quantity * conversion_factor
-        
         return (shopping_quantity, shopping_unit_id)
     
     finally:
@@ -193,6 +146,9 @@ def check_circular_reference(recipe_id, sub_recipe_id, db=None):
     """
     Check if adding a sub-recipe would create a circular reference.
     
+    Answered from the in-memory recipe dependency graph, which reflects
+    committed recipes only.
+    
     Args:
         recipe_id: ID of the recipe that wants to add the sub-recipe
         sub_recipe_id: ID of the sub-recipe to be added
@@ -201,151 +157,463 @@ def check_circular_reference(recipe_id, sub_recipe_id, db=None):
     Returns:
         True if circular reference would be created, False otherwise
     """
-    if db is None:
-        db = get_db()
-        close_after = True
-    else:
-        close_after = False
-    
-    try:
-        # Check if sub_recipe_id is in the chain of recipes that recipe_id depends on
-        visited = set[Any]()
-        cursor = db.cursor()
-        
-        def has_path_to_target(current_id, target_id):
-            if current_id == target_id:
-                return True
-            if current_id in visited:
-                return False
-            
-            visited.add(current_id)
-            
-            # Get all recipes that current_id uses as sub-recipes
-            cursor.execute("""
-                SELECT DISTINCT sub_recipe_id
-                FROM recipe_items
-                WHERE recipe_id = ? AND item_type = 'sub_recipe' AND sub_recipe_id IS NOT NULL
-            """, (current_id,))
-            
-            for row in cursor.fetchall():
-                if row['sub_recipe_id'] and has_path_to_target(row['sub_recipe_id'], target_id):
-                    return True
-            
-            return False
-        
-        # Check if sub_recipe_id (or anything in its chain) leads back to recipe_id
-        return has_path_to_target(sub_recipe_id, recipe_id)
-    
-    finally:
-        if close_after:
-            db.close()
+    return would_create_cycle(recipe_id, [sub_recipe_id], db)
 
 
 def expand_sub_recipe(sub_recipe_id, needed_quantity, needed_unit_id, batch_multiplier, visited=None, db=None):
     """
-    Recursively expand a sub-recipe to its base ingredients.
+    Expand a sub-recipe to its base ingredients.
+    
+    Uses the cached bill of materials from backend.recipe_graph, so nested
+    sub-recipes are flattened once and only scaled here. Items with the same
+    ingredient, unit, size qualifier and preparation notes are combined.
     
     Args:
         sub_recipe_id: ID of the sub-recipe to expand
         needed_quantity: Quantity needed from the sub-recipe
         needed_unit_id: Unit of the needed quantity
         batch_multiplier: Batch multiplier for the parent recipe
-        visited: Set of visited recipe IDs (for circular reference detection)
+        visited: Set of recipe IDs already being expanded (for circular reference detection)
         db: Optional database connection
         
     Returns:
         List of ingredient items with calculated quantities
     """
-    if visited is None:
-        visited = set[Any]()
-    
-    if sub_recipe_id in visited:
+    if visited is not None and sub_recipe_id in visited:
         raise ValueError(f"Circular reference detected with recipe {sub_recipe_id}")
     
-    visited.add(sub_recipe_id)
+    bom = get_bill_of_materials(sub_recipe_id, db)
+    if bom is None:
+        return []
     
-    if db is None:
-        db = get_db()
-        close_after = True
-    else:
-        close_after = False
+    # Quantities are per unit of yield; different units are assumed 1:1 for now (could be enhanced)
+    scale = needed_quantity * batch_multiplier
     
-    try:
-        cursor = db.cursor()
-        
-        # Get sub-recipe yield
-        cursor.execute("""
-            SELECT yield_quantity, yield_unit_id
-            FROM recipes
-            WHERE id = ?
-        """, (sub_recipe_id,))
-        
-        recipe = cursor.fetchone()
-        if not recipe:
-            return []
-        
-        yield_quantity = recipe['yield_quantity']
-        yield_unit_id = recipe['yield_unit_id']
-        
-        # Calculate proportion: how much of the sub-recipe do we need?
-        # If needed_unit_id == yield_unit_id, direct proportion
-        # Otherwise, we'd need unit conversion, but for now assume same unit type
-        if needed_unit_id == yield_unit_id:
-            proportion = needed_quantity / yield_quantity
+    return [
+        {
+            'ingredient_id': line.ingredient_id,
+            'quantity': line.quantity_per_yield * scale,
+            'unit_id': line.unit_id,
+            'size_qualifier': line.size_qualifier,
+            'preparation_notes': line.preparation_notes
+        }
+        for line in bom.lines
+    ]
+
+
+def load_shopping_list_data(recipe_selections, db):
+    """
+    Load everything needed to build a shopping list with set-based queries.
+    
+    The number of queries is fixed regardless of how many recipes, items
+    or ingredients are involved.
+    
+    Args:
+        recipe_selections: List of dicts with 'recipe_id' and 'batches' keys
+        db: Database connection
+    
+    Returns:
+        Dictionary with:
+        - 'units': the UnitRegistry
+        - 'recipe_items': recipe_items rows by recipe ID (in insertion order)
+        - 'ingredients': ingredient rows (with shopping unit name/category) by ID
+        - 'conversion_graphs': ConversionGraph by ingredient ID
+        - 'size_rules': size_estimation_rules rows by ingredient ID
+        - 'sub_recipes': sub-recipe rows (with yield unit name) by ID
+    """
+    cursor = db.cursor()
+    
+    units = get_unit_registry(db)
+    
+    # Items of every selected recipe
+    recipe_ids = list(dict.fromkeys(selection['recipe_id'] for selection in recipe_selections))
+    recipe_items = {}
+    for row in fetch_in(cursor, """
+        SELECT id, recipe_id, item_type, ingredient_id, sub_recipe_id, quantity, unit_id,
+               size_qualifier, preparation_notes
+        FROM recipe_items
+        WHERE recipe_id IN ({placeholders})
+        ORDER BY id
+    """, recipe_ids):
+        recipe_items.setdefault(row['recipe_id'], []).append(row)
+    
+    ingredient_ids = []
+    sub_recipe_ids = []
+    for items in recipe_items.values():
+        for item in items:
+            if item['item_type'] == 'sub_recipe':
+                sub_recipe_ids.append(item['sub_recipe_id'])
+            else:
+                ingredient_ids.append(item['ingredient_id'])
+    ingredient_ids = list(dict.fromkeys(ingredient_ids))
+    sub_recipe_ids = list(dict.fromkeys(sub_recipe_ids))
+    
+    ingredients = {row['id']: row for row in fetch_in(cursor, """
+        SELECT i.id, i.name, i.shopping_unit_id, ut.name as shopping_unit_name,
+               ut.category as shopping_unit_category
+        FROM ingredients i
+        JOIN unit_types ut ON i.shopping_unit_id = ut.id
+        WHERE i.id IN ({placeholders})
+    """, ingredient_ids)}
+    
+    conversion_graphs = get_conversion_graphs(ingredient_ids, db)
+    
+    size_rules = {}
+    for row in fetch_in(cursor, """
+        SELECT id, ingredient_id, size_qualifier, reference_unit_id, reference_value
+        FROM size_estimation_rules
+        WHERE ingredient_id IN ({placeholders})
+        ORDER BY id
+    """, ingredient_ids):
+        size_rules.setdefault(row['ingredient_id'], []).append(row)
+    
+    sub_recipes = {row['id']: row for row in fetch_in(cursor, """
+        SELECT r.id, r.name, r.yield_quantity, r.yield_unit_id,
+               ut.name as yield_unit_name
+        FROM recipes r
+        JOIN unit_types ut ON r.yield_unit_id = ut.id
+        WHERE r.id IN ({placeholders})
+    """, sub_recipe_ids)}
+    
+    return {
+        'units': units,
+        'recipe_items': recipe_items,
+        'ingredients': ingredients,
+        'conversion_graphs': conversion_graphs,
+        'size_rules': size_rules,
+        'sub_recipes': sub_recipes,
+    }
+
+
+def get_reference_unit_id(size_rules, units):
+    """
+    Pick the reference unit for size estimation from an ingredient's size rules.
+    
+    Weight units are preferred, then volume, then anything else.
+    
+    Args:
+        size_rules: size_estimation_rules rows of one ingredient
+        units: UnitRegistry
+    
+    Returns:
+        Unit ID, or None if the ingredient has no size rules
+    """
+    reference_unit_id = None
+    best_rank = None
+    for rule in size_rules:
+        rank = REFERENCE_CATEGORY_RANK.get(units.category_of(rule['reference_unit_id']), 3)
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            reference_unit_id = rule['reference_unit_id']
+    return reference_unit_id
+
+
+def ingredient_item_values(item, quantity, ingredient, graph, size_rules, reference_unit_id,
+                           volume_unit_id, weight_unit_id):
+    """
+    Convert one base ingredient item into the amounts a shopping list sums.
+    
+    Args:
+        item: recipe_items row
+        quantity: Item quantity with the batch multiplier applied
+        ingredient: Ingredient row from load_shopping_list_data()
+        graph: ConversionGraph of the ingredient
+        size_rules: size_estimation_rules rows of the ingredient
+        reference_unit_id: Size estimation reference unit ID, or None
+        volume_unit_id: Unit ID container volumes are summed in
+        weight_unit_id: Unit ID container weights are summed in
+    
+    Returns:
+        Tuple of (shopping quantity, reference value, container volume,
+        container weight), or None if the item has no conversion path to the
+        shopping unit
+    """
+    # Convert to shopping unit; items without a conversion path are skipped
+    item_shopping_quantity = graph.convert(quantity, item['unit_id'], ingredient['shopping_unit_id'])
+    if item_shopping_quantity is None:
+        return None
+    
+    # For container units, track actual volume/weight needed
+    item_volume = 0
+    item_weight = 0
+    if ingredient['shopping_unit_name'] in CONTAINER_UNITS:
+        if volume_unit_id:
+            item_volume = graph.convert(quantity, item['unit_id'], volume_unit_id) or 0
+        if weight_unit_id:
+            item_weight = graph.convert(quantity, item['unit_id'], weight_unit_id) or 0
+    
+    # If we have a reference unit, also convert to that for size estimation
+    item_ref_value = 0
+    if reference_unit_id:
+        if item['size_qualifier']:
+            # Each piece counts as the reference value for its size
+            for rule in size_rules:
+                if (rule['reference_unit_id'] == reference_unit_id and
+                        rule['size_qualifier'] == item['size_qualifier']):
+                    item_ref_value = item_shopping_quantity * rule['reference_value']
+                    break
         else:
-            # For different units, assume 1:1 for now (could be enhanced)
-            proportion = needed_quantity / yield_quantity
+            item_ref_value = graph.convert(quantity, item['unit_id'], reference_unit_id) or 0
+    
+    return item_shopping_quantity, item_ref_value, item_volume, item_weight
+
+
+def aggregate_ingredient_totals(recipe_selections, data, reference_unit_ids, volume_unit_id, weight_unit_id):
+    """
+    Sum the base ingredients of selected recipes, item by item.
+    
+    Items without a conversion path to their ingredient's shopping unit are
+    skipped. Ingredients missing from data['ingredients'] are left out.
+    
+    Args:
+        recipe_selections: List of dicts with 'recipe_id' and 'batches' keys
+        data: Dictionary from load_shopping_list_data()
+        reference_unit_ids: Size estimation reference unit ID (or None) by ingredient ID
+        volume_unit_id: Unit ID container volumes are summed in
+        weight_unit_id: Unit ID container weights are summed in
+    
+    Returns:
+        Dictionary mapping ingredient ID (in order of first use) to a list of
+        [shopping quantity, reference value, container volume, container weight]
+    """
+    # Group base ingredient items by ingredient ID
+    ingredient_groups = {}
+    for selection in recipe_selections:
+        batches = selection.get('batches', 1)
+        for item in data['recipe_items'].get(selection['recipe_id'], []):
+            if item['item_type'] != 'sub_recipe':
+                ingredient_groups.setdefault(item['ingredient_id'], []).append((item, item['quantity'] * batches))
+    
+    totals = {}
+    for ingredient_id, items in ingredient_groups.items():
+        ingredient = data['ingredients'].get(ingredient_id)
+        if not ingredient:
+            continue
         
-        # Get all items in the sub-recipe
-        cursor.execute("""
-            SELECT item_type, ingredient_id, sub_recipe_id, quantity, unit_id,
-                   size_qualifier, preparation_notes
-            FROM recipe_items
-            WHERE recipe_id = ?
-        """, (sub_recipe_id,))
+        total_shopping_quantity = 0
+        total_reference_value = 0  # Total weight or volume in reference unit
+        total_recipe_volume = 0  # Container units only
+        total_recipe_weight = 0  # Container units only
+        reference_unit_id = reference_unit_ids.get(ingredient_id)
+        ingredient_size_rules = data['size_rules'].get(ingredient_id, [])
         
-        expanded_items = []
+        # Conversion graph covers direct rules, their reciprocals and standard volume/weight equivalences
+        graph = data['conversion_graphs'][ingredient_id]
         
-        for item in cursor.fetchall():
-            # Calculate quantity with proportion and batch multiplier
-            item_quantity = item['quantity'] * proportion * batch_multiplier
+        for item, quantity in items:
+            values = ingredient_item_values(item, quantity, ingredient, graph, ingredient_size_rules,
+                                            reference_unit_id, volume_unit_id, weight_unit_id)
+            if values is None:
+                continue
             
+            total_shopping_quantity += values[0]
+            total_reference_value += values[1]
+            total_recipe_volume += values[2]
+            total_recipe_weight += values[3]
+        
+        totals[ingredient_id] = [total_shopping_quantity, total_reference_value, total_recipe_volume, total_recipe_weight]
+    
+    return totals
+
+
+def make_ingredient_item(ingredient_id, totals, data, reference_unit_ids, whole_unit_id):
+    """
+    Turn an ingredient's summed amounts into a shopping list item.
+    
+    Args:
+        ingredient_id: Ingredient ID
+        totals: [shopping quantity, reference value, container volume, container weight]
+        data: Dictionary from load_shopping_list_data()
+        reference_unit_ids: Size estimation reference unit ID (or None) by ingredient ID
+        whole_unit_id: ID of the "whole" unit, the only one size qualifiers apply to
+    
+    Returns:
+        Shopping list item, or None if nothing needs to be bought
+    """
+    total_shopping_quantity, total_reference_value, total_recipe_volume, total_recipe_weight = totals
+    if total_shopping_quantity <= 0:
+        return None
+    
+    ingredient = data['ingredients'][ingredient_id]
+    shopping_unit_id = ingredient['shopping_unit_id']
+    reference_unit_id = reference_unit_ids.get(ingredient_id)
+    is_container_unit = ingredient['shopping_unit_name'] in CONTAINER_UNITS
+    
+    # Optimize size qualifier selection to minimize number of items needed
+    # This is a knapsack-like problem: minimize items while covering total weight
+    optimized_size = None
+    optimized_quantity = math.ceil(total_shopping_quantity)
+    
+    if reference_unit_id and shopping_unit_id == whole_unit_id and total_reference_value > 0:
+        # Size rules for the reference unit, largest first
+        size_options = sorted(
+            (rule for rule in data['size_rules'][ingredient_id] if rule['reference_unit_id'] == reference_unit_id),
+            key=lambda rule: rule['reference_value'],
+            reverse=True
+        )
+        min_items = float('inf')
+        for rule in size_options:
+            # Items needed using this size (round up to cover total weight)
+            items_needed = math.ceil(total_reference_value / rule['reference_value'])
+            if items_needed < min_items:
+                min_items = items_needed
+                optimized_quantity, optimized_size = items_needed, rule['size_qualifier']
+    
+    shopping_item = {
+        'ingredient_id': ingredient_id,
+        'ingredient_name': ingredient['name'],
+        'quantity': optimized_quantity,
+        'unit_id': shopping_unit_id,
+        'unit_name': ingredient['shopping_unit_name'],
+        'size_qualifier': optimized_size,
+        'preparation_notes': None  # Not preserved for aggregated items
+    }
+    
+    # For container/package units, add the actual volume/weight needed
+    if is_container_unit:
+        if total_recipe_volume > 0:
+            # Convert cups to fluid ounces for display (1 cup = 8 fl oz)
+            shopping_item['recipe_volume'] = total_recipe_volume * 8
+            shopping_item['recipe_volume_unit'] = 'fl oz'
+        if total_recipe_weight > 0:
+            shopping_item['recipe_weight'] = total_recipe_weight
+            shopping_item['recipe_weight_unit'] = 'gram'
+    
+    return shopping_item
+
+
+def make_sub_recipe_items(sub_recipe_id, quantities, data):
+    """
+    Turn the requested amounts of a sub-recipe into shopping list items, one per unit.
+    
+    Args:
+        sub_recipe_id: Recipe ID of the sub-recipe
+        quantities: (unit ID, quantity) pairs in order of use
+        data: Dictionary from load_shopping_list_data()
+    
+    Returns:
+        List of sub-recipe shopping list items (empty if the sub-recipe is unknown)
+    """
+    sub_recipe = data['sub_recipes'].get(sub_recipe_id)
+    if not sub_recipe:
+        return []
+    
+    # Aggregate quantities by unit, since the same sub-recipe may be requested in different units
+    quantities_by_unit = {}
+    for unit_id, quantity in quantities:
+        quantities_by_unit[unit_id] = quantities_by_unit.get(unit_id, 0) + quantity
+    
+    return [
+        {
+            'is_sub_recipe': True,
+            'sub_recipe_id': sub_recipe_id,
+            'sub_recipe_name': sub_recipe['name'],
+            'quantity': total_quantity,
+            'unit_id': unit_id,
+            'unit_name': data['units'].name_of(unit_id, 'unit'),
+            'yield_quantity': sub_recipe['yield_quantity'],
+            'yield_unit_name': sub_recipe['yield_unit_name'],
+            'size_qualifier': None,
+            'preparation_notes': None
+        }
+        for unit_id, total_quantity in quantities_by_unit.items()
+    ]
+
+
+def shopping_list_sort_key(item):
+    """Sort key for shopping list items: sub-recipes first (with badge), then ingredients."""
+    if item.get('is_sub_recipe'):
+        return (0, item.get('sub_recipe_name', ''))
+    else:
+        return (1, item.get('ingredient_name', ''))
+
+
+def build_shopping_list(recipe_selections, data, vectorized=None):
+    """
+    Aggregate selected recipes into a shopping list entirely in memory.
+    
+    Args:
+        recipe_selections: List of dicts with 'recipe_id' and 'batches' keys
+        data: Dictionary from load_shopping_list_data()
+        vectorized: True to sum ingredients with NumPy, False for pure Python,
+            None to use NumPy when it is installed and the selection is large
+    
+    Returns:
+        List of shopping list items with ingredient name, quantity, unit, and size qualifier
+    """
+    units = data['units']
+    
+    # Step 1: Collect sub-recipes (not expanded - shown separately)
+    all_sub_recipes = []
+    item_count = 0
+    for selection in recipe_selections:
+        recipe_id = selection['recipe_id']
+        batches = selection.get('batches', 1)
+        items = data['recipe_items'].get(recipe_id, [])
+        item_count += len(items)
+        
+        for item in items:
             if item['item_type'] == 'sub_recipe':
-                # Recursively expand nested sub-recipes
-                nested_items = expand_sub_recipe(
-                    item['sub_recipe_id'],
-                    item_quantity,
-                    item['unit_id'],
-                    batch_multiplier=1.0,  # Already multiplied
-                    visited=visited.copy(),
-                    db=db
-                )
-                expanded_items.extend(nested_items)
-            else:
-                # Base ingredient
-                expanded_items.append({
-                    'ingredient_id': item['ingredient_id'],
-                    'quantity': item_quantity,
+                all_sub_recipes.append({
+                    'sub_recipe_id': item['sub_recipe_id'],
+                    'quantity': item['quantity'] * batches,
                     'unit_id': item['unit_id'],
                     'size_qualifier': item['size_qualifier'],
                     'preparation_notes': item['preparation_notes']
                 })
-        
-        return expanded_items
     
-    finally:
-        if close_after:
-            db.close()
+    # Step 2: Group sub-recipes by recipe ID
+    sub_recipe_groups = {}
+    for item in all_sub_recipes:
+        sub_recipe_groups.setdefault(item['sub_recipe_id'], []).append(item)
+    
+    # Size qualifiers apply when shopping unit is "whole"
+    whole_unit_id = units.id_for('whole')
+    # Standard volume and weight units for container amounts
+    volume_unit_id = units.id_for('cup')
+    weight_unit_id = units.id_for('gram')
+    
+    # Reference unit for size estimation (prefer weight, then volume)
+    reference_unit_ids = {
+        ingredient_id: get_reference_unit_id(size_rules, units)
+        for ingredient_id, size_rules in data['size_rules'].items()
+    }
+    
+    # Step 3: Sum base ingredients in shopping, reference and container units
+    if vectorized is None:
+        vectorized = HAS_NUMPY and item_count >= VECTORIZE_MIN_ITEMS
+    aggregate = aggregate_ingredient_totals_numpy if vectorized else aggregate_ingredient_totals
+    totals = aggregate(recipe_selections, data, reference_unit_ids, volume_unit_id, weight_unit_id)
+    
+    # Step 4: Turn each ingredient's totals into a shopping list item
+    shopping_list = []
+    for ingredient_id, ingredient_totals in totals.items():
+        shopping_item = make_ingredient_item(ingredient_id, ingredient_totals, data, reference_unit_ids, whole_unit_id)
+        if shopping_item is not None:
+            shopping_list.append(shopping_item)
+    
+    # Step 5: Process sub-recipes as separate shopping list items
+    for sub_recipe_id, items in sub_recipe_groups.items():
+        shopping_list.extend(make_sub_recipe_items(
+            sub_recipe_id, [(item['unit_id'], item['quantity']) for item in items], data
+        ))
+    
+    shopping_list.sort(key=shopping_list_sort_key)
+    
+    return shopping_list
 
 
 def generate_shopping_list(recipe_selections, db=None):
     """
     Generate a shopping list from selected recipes and batch counts.
     
+    All recipe items, ingredients and rules are loaded up front with
+    load_shopping_list_data(), then aggregated in memory.
+    
     Args:
         recipe_selections: List of dicts with 'recipe_id' and 'batches' keys
         db: Optional database connection
-        
+    
     Returns:
         List of shopping list items with ingredient name, quantity, unit, and size qualifier
     """
@@ -356,519 +624,21 @@ def generate_shopping_list(recipe_selections, db=None):
         close_after = False
     
     try:
-        cursor = db.cursor()
-        all_ingredients = []
-        all_sub_recipes = []  # Track sub-recipes separately
-        
-        # Step 1: Collect base ingredients and sub-recipes (without expanding sub-recipes)
-        for selection in recipe_selections:
-            recipe_id = selection['recipe_id']
-            batches = selection.get('batches', 1)
-            
-            # Get all items in the recipe
-            cursor.execute("""
-                SELECT item_type, ingredient_id, sub_recipe_id, quantity, unit_id,
-                       size_qualifier, preparation_notes
-                FROM recipe_items
-                WHERE recipe_id = ?
-            """, (recipe_id,))
-            
-            recipe_items = cursor.fetchall()
-            
-            for item in recipe_items:
-                item_quantity = item['quantity'] * batches
-                
-                if item['item_type'] == 'sub_recipe':
-                    # Don't expand sub-recipe - add it as-is to be shown separately
-                    all_sub_recipes.append({
-                        'sub_recipe_id': item['sub_recipe_id'],
-                        'quantity': item_quantity,
-                        'unit_id': item['unit_id'],
-                        'size_qualifier': item['size_qualifier'],
-                        'preparation_notes': item['preparation_notes']
-                    })
-                else:
-                    # Base ingredient
-                    all_ingredients.append({
-                        'ingredient_id': item['ingredient_id'],
-                        'quantity': item_quantity,
-                        'unit_id': item['unit_id'],
-                        'size_qualifier': item['size_qualifier'],
-                        'preparation_notes': item['preparation_notes']
-                    })
-        
-        # Step 2: Group by ingredient ID
-        ingredient_groups = {}
-        
-        for item in all_ingredients:
-            ingredient_id = item['ingredient_id']
-            if ingredient_id not in ingredient_groups:
-                ingredient_groups[ingredient_id] = []
-            ingredient_groups[ingredient_id].append(item)
-        
-        # Step 2b: Group sub-recipes by recipe ID and aggregate quantities
-        sub_recipe_groups = {}
-        
-        for item in all_sub_recipes:
-            sub_recipe_id = item['sub_recipe_id']
-            if sub_recipe_id not in sub_recipe_groups:
-                sub_recipe_groups[sub_recipe_id] = []
-            sub_recipe_groups[sub_recipe_id].append(item)
-        
-        # Get the "whole" unit ID (size qualifiers apply when shopping unit is "whole")
-        cursor.execute("SELECT id FROM unit_types WHERE name = 'whole'")
-        whole_unit_row = cursor.fetchone()
-        whole_unit_id = whole_unit_row['id'] if whole_unit_row else None
-        
-        # Step 3: Process each ingredient group
-        shopping_list = []
-        
-        for ingredient_id, items in ingredient_groups.items():
-            # Get ingredient details
-            cursor.execute("""
-                SELECT i.name, i.shopping_unit_id, ut.name as shopping_unit_name,
-                       ut.category as shopping_unit_category
-                FROM ingredients i
-                JOIN unit_types ut ON i.shopping_unit_id = ut.id
-                WHERE i.id = ?
-            """, (ingredient_id,))
-            
-            ingredient = cursor.fetchone()
-            if not ingredient:
-                continue
-            
-            # Aggregate ALL items together and estimate size qualifier based on total weight/volume
-            # Strategy:
-            # 1. Convert all items to a reference unit (weight/volume)
-            # 2. Sum the total reference value
-            # 3. Convert total to shopping units
-            # 4. Estimate size qualifier based on average weight per piece
-            
-            total_shopping_quantity = 0
-            total_reference_value = 0  # Total weight or volume in reference unit
-            reference_unit_id = None
-            
-            # First, try to get a reference unit for size estimation (prefer weight)
-            cursor.execute("""
-                SELECT reference_unit_id FROM size_estimation_rules 
-                WHERE ingredient_id = ? 
-                ORDER BY 
-                    CASE 
-                        WHEN reference_unit_id IN (SELECT id FROM unit_types WHERE category = 'weight') THEN 1
-                        WHEN reference_unit_id IN (SELECT id FROM unit_types WHERE category = 'volume') THEN 2
-                        ELSE 3
-                    END
-                LIMIT 1
-            """, (ingredient_id,))
-            ref_rule = cursor.fetchone()
-            if ref_rule:
-                reference_unit_id = ref_rule['reference_unit_id']
-            
-            # Track original recipe quantities for packaged ingredients (to show actual volume/weight needed)
-            # For ingredients where shopping unit is a container/package, we want to show the actual amount needed
-            total_recipe_volume = 0  # Total in a standard volume unit (cup)
-            total_recipe_weight = 0  # Total in a standard weight unit (gram)
-            volume_unit_id = None
-            weight_unit_id = None
-            
-            # Get standard volume and weight units
-            cursor.execute("SELECT id FROM unit_types WHERE name = 'cup'")
-            cup_unit = cursor.fetchone()
-            volume_unit_id = cup_unit['id'] if cup_unit else None
-            
-            cursor.execute("SELECT id FROM unit_types WHERE name = 'gram'")
-            gram_unit = cursor.fetchone()
-            weight_unit_id = gram_unit['id'] if gram_unit else None
-            
-            # Check if shopping unit is a container/package type (for which we should show actual amounts)
-            container_units = ['package', 'can', 'bottle', 'jar', 'container']
-            is_container_unit = ingredient['shopping_unit_name'] in container_units
-            
-            # Convert all items to shopping unit AND to reference unit (if available)
-            for item in items:
-                # Convert to shopping unit
-                result = convert_to_shopping_unit(
-                    ingredient_id,
-                    item['quantity'],
-                    item['unit_id'],
-                    db
-                )
-                
-                if result:
-                    item_shopping_quantity, shopping_unit_id = result
-                    total_shopping_quantity += item_shopping_quantity
-                    
-                    # For container units, track actual volume/weight needed
-                    if is_container_unit:
-                        # Try to convert item quantity to volume (cup)
-                        if volume_unit_id:
-                            if item['unit_id'] == volume_unit_id:
-                                total_recipe_volume += item['quantity']
-                            else:
-                                # Try direct conversion
-                                cursor.execute("""
-                                    SELECT conversion_factor FROM conversion_rules
-                                    WHERE ingredient_id = ? 
-                                    AND from_unit_id = ? 
-                                    AND to_unit_id = ?
-                                """, (ingredient_id, item['unit_id'], volume_unit_id))
-                                vol_conv = cursor.fetchone()
-                                if vol_conv:
-                                    total_recipe_volume += item['quantity'] * vol_conv['conversion_factor']
-                                else:
-                                    # Try standard volume conversion (for volume units)
-                                    standard_vol = convert_standard_volume(item['unit_id'], volume_unit_id, item['quantity'], db)
-                                    if standard_vol is not None:
-                                        total_recipe_volume += standard_vol
-                                    else:
-                                        # Try indirect: item_unit → shopping_unit → volume_unit
-                                        # Use the item shopping quantity (converted from this item only)
-                                        if item_shopping_quantity > 0:
-                                            # Reverse convert from shopping unit to volume unit
-                                            cursor.execute("""
-                                                SELECT conversion_factor FROM conversion_rules
-                                                WHERE ingredient_id = ? 
-                                                AND from_unit_id = ? 
-                                                AND to_unit_id = ?
-                                            """, (ingredient_id, volume_unit_id, shopping_unit_id))
-                                            reverse_conv = cursor.fetchone()
-                                            if reverse_conv:
-                                                # Reverse conversion: shopping → volume
-                                                # item_shopping_quantity is packages, reverse_conv is cup→package
-                                                # So: packages / (cup→package) = cups
-                                                item_volume = item_shopping_quantity / reverse_conv['conversion_factor']
-                                                total_recipe_volume += item_volume
-                        
-                        # Try to convert item quantity to weight (gram)
-                        if weight_unit_id:
-                            if item['unit_id'] == weight_unit_id:
-                                total_recipe_weight += item['quantity']
-                            else:
-                                # Try direct conversion
-                                cursor.execute("""
-                                    SELECT conversion_factor FROM conversion_rules
-                                    WHERE ingredient_id = ? 
-                                    AND from_unit_id = ? 
-                                    AND to_unit_id = ?
-                                """, (ingredient_id, item['unit_id'], weight_unit_id))
-                                wt_conv = cursor.fetchone()
-                                if wt_conv:
-                                    total_recipe_weight += item['quantity'] * wt_conv['conversion_factor']
-                                else:
-                                    # Try indirect: item_unit → shopping_unit → weight_unit
-                                    # Use the item shopping quantity (converted from this item only)
-                                    if item_shopping_quantity > 0:
-                                        # Reverse convert from shopping unit to weight unit
-                                        cursor.execute("""
-                                            SELECT conversion_factor FROM conversion_rules
-                                            WHERE ingredient_id = ? 
-                                            AND from_unit_id = ? 
-                                            AND to_unit_id = ?
-                                        """, (ingredient_id, weight_unit_id, shopping_unit_id))
-                                        reverse_conv = cursor.fetchone()
-                                        if reverse_conv:
-                                            # Reverse conversion: shopping → weight
-                                            # item_shopping_quantity is packages, reverse_conv is gram→package
-                                            # So: packages / (gram→package) = grams
-                                            item_weight = item_shopping_quantity / reverse_conv['conversion_factor']
-                                            total_recipe_weight += item_weight
-                    
-                    # If we have a reference unit, also convert to that for size estimation
-                    if reference_unit_id:
-                        item_ref_value = 0
-                        
-                        # Check if item has a size qualifier (count units with size qualifiers)
-                        if item['size_qualifier']:
-                            # Get the reference value for this size qualifier
-                            cursor.execute("""
-                                SELECT reference_value FROM size_estimation_rules
-                                WHERE ingredient_id = ? 
-                                AND reference_unit_id = ?
-                                AND size_qualifier = ?
-                            """, (ingredient_id, reference_unit_id, item['size_qualifier']))
-                            size_rule = cursor.fetchone()
-                            
-                            if size_rule:
-                                # For each piece, use the size's reference value
-                                # Since item_shopping_quantity is already converted to pieces,
-                                # multiply by the reference value for this size
-                                item_ref_value = item_shopping_quantity * size_rule['reference_value']
-                            else:
-                                # Size qualifier doesn't have a rule, skip this item's reference value
-                                pass
-                        elif item['unit_id'] == reference_unit_id:
-                            # Item is already in reference unit (weight/volume)
-                            item_ref_value = item['quantity']
-                        else:
-                            # Try to convert item's unit to reference unit
-                            # Check if there's a conversion path from item's unit to reference unit
-                            cursor.execute("""
-                                SELECT conversion_factor FROM conversion_rules
-                                WHERE ingredient_id = ? 
-                                AND from_unit_id = ? 
-                                AND to_unit_id = ?
-                            """, (ingredient_id, item['unit_id'], reference_unit_id))
-                            direct_conv = cursor.fetchone()
-                            
-                            if direct_conv:
-                                # Direct conversion exists
-                                item_ref_value = item['quantity'] * direct_conv['conversion_factor']
-                            else:
-                                # Try indirect: item -> shopping_unit -> reference_unit
-                                # First convert item to shopping unit (already have item_shopping_quantity)
-                                # Then need conversion from shopping unit to reference unit
-                                cursor.execute("""
-                                    SELECT conversion_factor FROM conversion_rules
-                                    WHERE ingredient_id = ? 
-                                    AND from_unit_id = ? 
-                                    AND to_unit_id = ?
-                                """, (ingredient_id, shopping_unit_id, reference_unit_id))
-                                indirect_conv = cursor.fetchone()
-                                
-                                if indirect_conv:
-                                    # Use item shopping quantity as intermediate
-                                    item_ref_value = item_shopping_quantity * indirect_conv['conversion_factor']
-                        
-                        total_reference_value += item_ref_value
-            
-            # Round up total shopping quantity
-            if total_shopping_quantity > 0:
-                # Optimize size qualifier selection to minimize number of items needed
-                # This is a knapsack-like problem: minimize items while covering total weight
-                optimized_quantity = total_shopping_quantity
-                optimized_size = None
-                
-                if (reference_unit_id and total_shopping_quantity > 0 and 
-                    ingredient['shopping_unit_id'] == whole_unit_id):
-                    # Get all size estimation rules, ordered by size (largest first)
-                    cursor.execute("""
-                        SELECT size_qualifier, reference_value
-                        FROM size_estimation_rules
-                        WHERE ingredient_id = ? AND reference_unit_id = ?
-                        ORDER BY reference_value DESC
-                    """, (ingredient_id, reference_unit_id))
-                    
-                    size_rules = cursor.fetchall()
-                    
-                    if size_rules and total_reference_value > 0:
-                        # Calculate total weight needed (from reference value)
-                        total_weight_needed = total_reference_value
-                        
-                        # Optimize to minimize number of items (knapsack-like problem)
-                        # Strategy: Try all sizes to find the one that minimizes items needed
-                        best_combination = None
-                        min_items = float('inf')
-                        
-                        # For each size option, calculate how many items we'd need
-                        for rule in size_rules:
-                            # Calculate items needed using this size (round up to cover total weight)
-                            items_needed = math.ceil(total_weight_needed / rule['reference_value'])
-                            
-                            # Track the best option (fewest items)
-                            if items_needed < min_items:
-                                min_items = items_needed
-                                best_combination = (items_needed, rule['size_qualifier'])
-                        
-                        if best_combination:
-                            optimized_quantity, optimized_size = best_combination
-                        else:
-                            # Fallback: estimate size based on average
-                            optimized_quantity = math.ceil(total_shopping_quantity)
-                            optimized_size = estimate_size_qualifier(
-                                ingredient_id,
-                                total_reference_value,
-                                optimized_quantity,
-                                reference_unit_id,
-                                db
-                            )
-                    else:
-                        # No size estimation rules, just round up
-                        optimized_quantity = math.ceil(total_shopping_quantity)
-                else:
-                    # Not a "whole" unit or no reference unit, just round up
-                    optimized_quantity = math.ceil(total_shopping_quantity)
-                
-                shopping_item = {
-                    'ingredient_id': ingredient_id,
-                    'ingredient_name': ingredient['name'],
-                    'quantity': optimized_quantity,
-                    'unit_id': ingredient['shopping_unit_id'],
-                    'unit_name': ingredient['shopping_unit_name'],
-                    'size_qualifier': optimized_size,
-                    'preparation_notes': None  # Not preserved for aggregated items
-                }
-                
-                # For container/package units, add the actual volume/weight needed
-                if is_container_unit:
-                    if total_recipe_volume > 0:
-                        # Convert cups to fluid ounces for display (1 cup = 8 fl oz)
-                        shopping_item['recipe_volume'] = total_recipe_volume * 8
-                        shopping_item['recipe_volume_unit'] = 'fl oz'
-                    if total_recipe_weight > 0:
-                        shopping_item['recipe_weight'] = total_recipe_weight
-                        shopping_item['recipe_weight_unit'] = 'gram'
-                
-                shopping_list.append(shopping_item)
-        
-        # Step 4: Process sub-recipes as separate shopping list items
-        for sub_recipe_id, items in sub_recipe_groups.items():
-            # Get sub-recipe details
-            cursor.execute("""
-                SELECT r.name, r.yield_quantity, r.yield_unit_id,
-                       ut.name as yield_unit_name
-                FROM recipes r
-                JOIN unit_types ut ON r.yield_unit_id = ut.id
-                WHERE r.id = ?
-            """, (sub_recipe_id,))
-            
-            sub_recipe = cursor.fetchone()
-            if not sub_recipe:
-                continue
-            
-            # Aggregate quantities by unit
-            # Group by unit_id to handle cases where the same sub-recipe is requested in different units
-            quantities_by_unit = {}
-            
-            for item in items:
-                unit_id = item['unit_id']
-                if unit_id not in quantities_by_unit:
-                    quantities_by_unit[unit_id] = 0
-                quantities_by_unit[unit_id] += item['quantity']
-            
-            # For each unit, create a shopping list item
-            for unit_id, total_quantity in quantities_by_unit.items():
-                # Get unit name
-                cursor.execute("SELECT name FROM unit_types WHERE id = ?", (unit_id,))
-                unit_row = cursor.fetchone()
-                unit_name = unit_row['name'] if unit_row else 'unit'
-                
-                sub_recipe_item = {
-                    'is_sub_recipe': True,
-                    'sub_recipe_id': sub_recipe_id,
-                    'sub_recipe_name': sub_recipe['name'],
-                    'quantity': total_quantity,
-                    'unit_id': unit_id,
-                    'unit_name': unit_name,
-                    'yield_quantity': sub_recipe['yield_quantity'],
-                    'yield_unit_name': sub_recipe['yield_unit_name'],
-                    'size_qualifier': None,
-                    'preparation_notes': None
-                }
-                
-                shopping_list.append(sub_recipe_item)
-        
-        # Sort: sub-recipes first (with badge), then ingredients
-        def sort_key(item):
-            if item.get('is_sub_recipe'):
-                return (0, item.get('sub_recipe_name', ''))
-            else:
-                return (1, item.get('ingredient_name', ''))
-        
-        shopping_list.sort(key=sort_key)
-        
-        return shopping_list
+        data = load_shopping_list_data(recipe_selections, db)
+        return build_shopping_list(recipe_selections, data)
     
     finally:
         if close_after:
             db.close()
 
 
-def get_store_section(ingredient_name, ingredient_type_name, shopping_unit_name, db=None):
-    """
-    Determine grocery store section for an ingredient.
-    
-    Args:
-        ingredient_name: Name of the ingredient (e.g., "Fresh Mango", "Frozen Blueberries")
-        ingredient_type_name: Ingredient type name (e.g., "Fruits", "Vegetables")
-        shopping_unit_name: Shopping unit name (e.g., "whole", "package", "can")
-        db: Optional database connection
-        
-    Returns: 
-        'produce', 'dry_bulk', 'canned_preserved', 'refrigerated', 'frozen'
-    """
-    name_lower = ingredient_name.lower()
-    type_lower = ingredient_type_name.lower()
-    unit_lower = shopping_unit_name.lower()
-    
-    # FROZEN - highest priority (explicit in name)
-    if 'frozen' in name_lower:
-        return 'frozen'
-    
-    # REFRIGERATED - check before produce (milk, tempeh, tortillas, miso paste)
-    if 'milk' in name_lower or 'tempeh' in name_lower or 'tortilla' in name_lower:
-        return 'refrigerated'
-    # Miso paste is refrigerated
-    if 'miso' in name_lower:
-        return 'refrigerated'
-    if type_lower == 'liquids':
-        # Most liquids in this system are plant-based milks (refrigerated)
-        return 'refrigerated'
-    
-    # PRODUCE
-    # Fresh ginger and garlic go to produce (even though they're in Spices type)
-    if 'fresh ginger' in name_lower or (name_lower == 'ginger' and 'fresh' not in name_lower):
-        return 'produce'
-    if name_lower == 'garlic' or (name_lower.startswith('garlic') and 'powder' not in name_lower and 'salt' not in name_lower):
-        return 'produce'
-    
-    if type_lower == 'vegetables' and 'frozen' not in name_lower:
-        return 'produce'
-    if type_lower == 'fruits':
-        # Fresh fruits go to produce, frozen go to frozen (already handled above)
-        if 'frozen' not in name_lower:
-            return 'produce'
-    if type_lower == 'herbs':
-        # Fresh herbs go to produce, dried go to dry_bulk
-        if 'fresh' in name_lower or 'dried' not in name_lower:
-            return 'produce'
-    
-    # DRY/BULK (includes baking section)
-    # Vanilla extract goes to dry/bulk (baking section)
-    if 'vanilla extract' in name_lower or 'vanilla' in name_lower:
-        return 'dry_bulk'
-    
-    if type_lower in ['grains', 'nuts & seeds', 'spices']:
-        return 'dry_bulk'
-    if type_lower == 'herbs' and 'dried' in name_lower:
-        return 'dry_bulk'
-    if type_lower == 'pantry items':
-        # Check for dry goods patterns
-        dry_keywords = ['flour', 'sugar', 'yeast', 'oats', 'rice', 'quinoa', 'barley', 
-                       'millet', 'farro', 'buckwheat', 'lentil']
-        if any(word in name_lower for word in dry_keywords):
-            # Make sure it's not canned - exclude canned beans/lentils
-            if not any(canned_word in name_lower for canned_word in ['canned', 'can', 'salt-free']):
-                return 'dry_bulk'
-    
-    # CANNED/PRESERVED
-    if type_lower == 'pantry items':
-        # Canned/jarred items
-        if unit_lower in ['can', 'jar', 'bottle']:
-            return 'canned_preserved'
-        if any(word in name_lower for word in ['salt-free', 'canned', 'crushed', 'diced', 
-                                               'marinara', 'tahini', 'molasses', 
-                                               'vinegar', 'sauce']):
-            # Note: miso is handled above as refrigerated
-            return 'canned_preserved'
-    
-    # PLANT PROTEINS - most are canned/preserved (beans) or refrigerated (tempeh)
-    if type_lower == 'plant proteins':
-        if 'tempeh' in name_lower:
-            return 'refrigerated'
-        # Most others are canned beans
-        return 'canned_preserved'
-    
-    # Default fallback
-    return 'dry_bulk'  # Safe default for unclassified items
-
-
 def organize_shopping_list_by_sections(shopping_list, db=None):
     """
     Organize shopping list items by grocery store sections.
     
     Args:
         shopping_list: List of shopping list items from generate_shopping_list()
-        db: Optional database connection
+        db: Optional database connection (only used if the section map is not loaded yet)
         
     Returns:
         Dictionary mapping section names to arrays of items:
@@ -881,70 +651,36 @@ def organize_shopping_list_by_sections(shopping_list, db=None):
             'sub_recipes': [...]
         }
     """
-    if db is None:
-        db = get_db()
-        close_after = True
-    else:
-        close_after = False
+    ingredient_ids = [
+        item['ingredient_id'] for item in shopping_list
+        if not item.get('is_sub_recipe') and item.get('ingredient_id')
+    ]
+    sections = get_store_section_map(db, ingredient_ids)
     
-    try:
-        cursor = db.cursor()
-        organized = {
-            'produce': [],
-            'dry_bulk': [],
-            'canned_preserved': [],
-            'refrigerated': [],
-            'frozen': [],
-            'sub_recipes': []
-        }
-        
-        # Get ingredient details for each item
-        for item in shopping_list:
-            # Sub-recipes go to separate section
-            if item.get('is_sub_recipe'):
-                organized['sub_recipes'].append(item)
-                continue
-            
-            # Get ingredient type and shopping unit
-            ingredient_id = item.get('ingredient_id')
-            if not ingredient_id:
-                # Skip items without ingredient_id
-                continue
-            
-            cursor.execute("""
-                SELECT i.name as ingredient_name, it.name as type_name, ut.name as shopping_unit_name
-                FROM ingredients i
-                JOIN ingredient_types it ON i.type_id = it.id
-                JOIN unit_types ut ON i.shopping_unit_id = ut.id
-                WHERE i.id = ?
-            """, (ingredient_id,))
-            
-            ingredient_info = cursor.fetchone()
-            if not ingredient_info:
-                continue
-            
-            # Determine section
-            section = get_store_section(
-                ingredient_info['ingredient_name'],
-                ingredient_info['type_name'],
-                ingredient_info['shopping_unit_name'],
-                db
-            )
-            
-            organized[section].append(item)
+    organized = {section: [] for section, _ in STORE_SECTIONS}
+    organized['sub_recipes'] = []
+    
+    for item in shopping_list:
+        # Sub-recipes go to separate section
+        if item.get('is_sub_recipe'):
+            organized['sub_recipes'].append(item)
+            continue
         
-        # Sort each section alphabetically by ingredient/sub-recipe name
-        for section in organized:
-            organized[section].sort(key=lambda x: (
-                x.get('ingredient_name', '') or 
-                x.get('sub_recipe_name', '')
-            ).lower())
+        # Skip items without ingredient_id or unknown ingredients
+        section = sections.get(item.get('ingredient_id'))
+        if section is None:
+            continue
         
-        return organized
+        organized[section].append(item)
     
-    finally:
-        if close_after:
-            db.close()
+    # Sort each section alphabetically by ingredient/sub-recipe name
+    for section in organized:
+        organized[section].sort(key=lambda x: (
+            x.get('ingredient_name', '') or 
+            x.get('sub_recipe_name', '')
+        ).lower())
+    
+    return organized
 
 
 def get_item_id(item):
@@ -978,14 +714,7 @@ def format_shopping_list_text(organized_list, recipes_info=None, checked_item_id
             if item_id in checked_set:
                 checked_items_by_id[item_id] = item
     
-    sections = [
-        ('produce', '🥬 PRODUCE'),
-        ('dry_bulk', '📦 DRY/BULK GOODS'),
-        ('canned_preserved', '🥫 CANNED/PRESERVED'),
-        ('refrigerated', '🥛 REFRIGERATED'),
-        ('frozen', '❄️ FROZEN'),
-        ('sub_recipes', '🔄 SUB-RECIPES'),
-    ]
+    sections = STORE_SECTIONS + [('sub_recipes', '🔄 SUB-RECIPES')]
     
     lines = ['🛒 Shopping List', '']  # Header
     
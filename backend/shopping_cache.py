@@ -0,0 +1,170 @@
+"""
+Content-addressed cache of generated shopping lists.
+
+A shopping list depends only on the recipe selections and the recipe,
+ingredient and rule data they touch. Lists are cached under a hash of the
+normalized selections together with a data version that the write endpoints
+bump after every committed change, so stale lists are never served: after a
+write their keys can no longer be produced and they age out of the LRU.
+
+The version counter lives in this process; writes made by other processes
+(e.g. setup_database.py) are only seen after a restart.
+
+Each bump also records which tables changed and when, for the HTTP
+validators of the read-only endpoints (see http_cache.py).
+"""
+import hashlib
+import json
+import threading
+import time
+
+from backend import database
+from backend.lru_cache import LRUCache
+from backend.services import generate_shopping_list
+
+SHOPPING_LIST_CACHE_SIZE = 128
+
+# Tables with their own versions, bumped by the write endpoints
+DATA_TABLES = ('ingredient_types', 'unit_types', 'ingredients', 'recipes')
+
+_data_version = 0
+_version_lock = threading.Lock()
+
+# table -> (data version of its last change, Unix time of that change, data version of its first change
+# in the same second); unchanged since startup at first
+_table_versions = {table: (0, time.time(), 0) for table in DATA_TABLES}
+
+
+def get_data_version():
+    """Get the current version of recipe, ingredient and rule data."""
+    return _data_version
+
+
+def get_table_versions(tables):
+    """
+    Get the versions of tables.
+    
+    Args:
+        tables: Names from DATA_TABLES
+    
+    Returns:
+        List of (data version, Unix time, first version) triples, in the order given: the
+        version and time of each table's last change, and the version of its first change
+        within the same second (equal to the version if it changed once in that second)
+    """
+    return [_table_versions[table] for table in tables]
+
+
+def bump_data_version(*tables):
+    """
+    Record that recipe, ingredient or rule data changed.
+    
+    Call after the change is committed.
+    
+    Args:
+        tables: Names from DATA_TABLES that changed; all of them if none are given
+    
+    Returns:
+        The new data version
+    """
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        changed_at = time.time()
+        for table in tables or DATA_TABLES:
+            _, previous_changed_at, previous_first = _table_versions[table]
+            first = previous_first if int(previous_changed_at) == int(changed_at) else _data_version
+            _table_versions[table] = (_data_version, changed_at, first)
+        return _data_version
+
+
+def normalize_selections(recipe_selections):
+    """
+    Normalize recipe selections to the values generate_shopping_list() uses.
+    
+    Selection order is kept: it decides the order of summation and of
+    sub-recipe entries.
+    
+    Args:
+        recipe_selections: List of dicts with 'recipe_id' and optional 'batches' keys
+    
+    Returns:
+        List of {'recipe_id': int, 'batches': float} dicts
+    
+    Raises:
+        KeyError, TypeError, ValueError: If a selection is malformed
+    """
+    return [
+        {'recipe_id': int(selection['recipe_id']), 'batches': float(selection.get('batches', 1))}
+        for selection in recipe_selections
+    ]
+
+
+def selections_key(recipe_selections):
+    """
+    Get the content hash of normalized recipe selections.
+    
+    Args:
+        recipe_selections: List of normalized selections from normalize_selections()
+    
+    Returns:
+        Hex SHA-256 digest
+    """
+    canonical = json.dumps(
+        [[selection['recipe_id'], selection['batches']] for selection in recipe_selections],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ShoppingListCache(LRUCache):
+    """Thread-safe LRU mapping of cache keys to shopping lists."""
+    
+    def __init__(self, max_size=SHOPPING_LIST_CACHE_SIZE):
+        super().__init__(max_size)
+
+
+_cache = ShoppingListCache()
+
+
+def get_shopping_list(recipe_selections, db=None):
+    """
+    Get the shopping list for recipe selections, generating it only on a cache miss.
+    
+    The returned list is shared with the cache and must not be modified.
+    
+    Args:
+        recipe_selections: List of dicts with 'recipe_id' and 'batches' keys
+        db: Optional database connection
+    
+    Returns:
+        List of shopping list items (see generate_shopping_list())
+    """
+    recipe_selections = normalize_selections(recipe_selections)
+    # Read the version before generating: a write committed meanwhile bumps it,
+    # so a list built from partly old data is stored under a key never looked up again
+    key = (str(database.DB_PATH), get_data_version(), selections_key(recipe_selections))
+    
+    shopping_list = _cache.get(key)
+    if shopping_list is None:
+        shopping_list = generate_shopping_list(recipe_selections, db)
+        _cache.put(key, shopping_list)
+    return shopping_list
+
+
+def cache_shopping_list(recipe_selections, shopping_list, data_version):
+    """
+    Store a list built elsewhere (e.g. by an incremental update) for get_shopping_list().
+    
+    Args:
+        recipe_selections: Selections the list was built from
+        shopping_list: The list (must not be modified afterwards)
+        data_version: Data version the list was built from
+    """
+    key = (str(database.DB_PATH), data_version, selections_key(normalize_selections(recipe_selections)))
+    _cache.put(key, shopping_list)
+
+
+def clear_shopping_list_cache():
+    """Drop every cached shopping list."""
+    _cache.clear()
@@ -0,0 +1,363 @@
+"""
+Background SMS delivery queue.
+
+Sending blocks for seconds (a Twilio HTTP call) up to most of a minute
+(several Messages.app AppleScript attempts with 5-10 s timeouts each), so
+requests only enqueue a job and a bounded pool of worker threads delivers
+it. Jobs are stored in the sms_jobs table: they survive restarts and their
+status can be polled.
+
+Each attempt tries the transports in order (Messages.app first on macOS,
+then Twilio) and stops at the first success. A failed attempt is retried
+with exponential backoff until SMS_MAX_ATTEMPTS is reached. A worker claims
+a job by leasing it for SMS_LEASE_SECONDS; a job whose worker died
+mid-send becomes claimable again when its lease expires.
+
+The SHOPLIST_SMS_TRANSPORTS environment variable overrides the transports
+(comma-separated names from TRANSPORTS), e.g. "fake" to run without Twilio
+or macOS.
+"""
+import logging
+import os
+import platform
+import threading
+import time
+
+from backend import database
+
+# Number of worker threads delivering messages
+SMS_WORKERS = 2
+
+# Attempts per job (each trying every transport) before it is marked failed
+SMS_MAX_ATTEMPTS = 5
+
+# Delay before the first retry, doubled for each later one up to the maximum
+SMS_RETRY_BASE_SECONDS = 2.0
+SMS_RETRY_MAX_SECONDS = 300.0
+
+# How long a claimed job is reserved for its worker (longer than the slowest send)
+SMS_LEASE_SECONDS = 120.0
+
+# Longest a worker sleeps before checking for jobs again (e.g. enqueued by another process)
+SMS_POLL_SECONDS = 30.0
+
+logger = logging.getLogger('shoplist.sms')
+
+JOB_COLUMNS = """
+    id, phone_number, status, attempts, next_attempt_at, method, message_sid, last_error,
+    created_at, updated_at
+"""
+
+
+class FakeTransport:
+    """Transport that records messages instead of sending them."""
+    
+    def __init__(self, failures=0, delay=0.0):
+        """
+        Args:
+            failures: Number of calls that fail before messages are accepted
+            delay: Seconds each call takes
+        """
+        self.failures = failures
+        self.delay = delay
+        self.sent = []
+        self._lock = threading.Lock()
+    
+    def __call__(self, phone_number, text):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            if self.failures > 0:
+                self.failures -= 1
+                return {'success': False, 'error': 'Simulated failure'}
+            self.sent.append((phone_number, text))
+            return {
+                'success': True,
+                'message_sid': f'fake-{len(self.sent)}',
+                'message': 'Message recorded by the fake transport'
+            }
+
+
+def send_with_messages_app(phone_number, text):
+    from backend.mac_messages import send_sms_via_messages_app
+    return send_sms_via_messages_app(phone_number, text)
+
+
+def send_with_twilio(phone_number, text):
+    from backend.services import send_sms_shopping_list
+    return send_sms_shopping_list(phone_number, text)
+
+
+TRANSPORTS = {
+    'messages': send_with_messages_app,
+    'twilio': send_with_twilio,
+    'fake': FakeTransport(),
+}
+
+
+def default_transports():
+    """
+    Get the configured transports in the order they are tried.
+    
+    Returns:
+        List of (name, callable) pairs
+    
+    Raises:
+        ValueError: If SHOPLIST_SMS_TRANSPORTS names an unknown transport
+    """
+    configured = os.environ.get('SHOPLIST_SMS_TRANSPORTS')
+    if configured:
+        names = [name.strip() for name in configured.split(',') if name.strip()]
+    elif platform.system() == 'Darwin':
+        names = ['messages', 'twilio']
+    else:
+        names = ['twilio']
+    
+    unknown = [name for name in names if name not in TRANSPORTS]
+    if unknown:
+        raise ValueError(f"Unknown SMS transports: {', '.join(unknown)}")
+    return [(name, TRANSPORTS[name]) for name in names]
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a job that has failed attempts times."""
+    return min(SMS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), SMS_RETRY_MAX_SECONDS)
+
+
+def get_sms_job(job_id, db=None):
+    """
+    Get a job's delivery status.
+    
+    Returns:
+        Job dictionary (without the message text), or None if there is no such job
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        row = db.execute(f"SELECT {JOB_COLUMNS} FROM sms_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    finally:
+        if close_after:
+            db.close()
+
+
+class SmsQueue:
+    """Pool of worker threads delivering jobs from the sms_jobs table."""
+    
+    def __init__(self, transports, workers=SMS_WORKERS):
+        """
+        Args:
+            transports: List of (name, callable) pairs; each callable takes
+                (phone_number, text) and returns a dict with 'success' and 'error'
+            workers: Number of worker threads
+        """
+        self.transports = transports
+        self.workers = workers
+        self._threads = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+    
+    def start(self):
+        """Start the worker threads, replacing any that have exited (no-op if all are running)."""
+        with self._wakeup:
+            self._stopping = False
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            running = {thread.name for thread in self._threads}
+            for number in range(self.workers):
+                name = f'sms-worker-{number + 1}'
+                if name in running:
+                    continue
+                thread = threading.Thread(target=self._run, name=name, daemon=True)
+                self._threads.append(thread)
+                thread.start()
+    
+    def stop(self, timeout=None):
+        """Stop the workers after their current job."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+    
+    def enqueue(self, phone_number, text, db=None):
+        """
+        Queue a message for delivery.
+        
+        Args:
+            phone_number: Phone number in E.164 format (e.g., "+15551234567")
+            text: Message text
+            db: Optional database connection (committed by this function)
+        
+        Returns:
+            Job ID
+        """
+        if db is None:
+            db = database.get_db()
+            close_after = True
+        else:
+            close_after = False
+        
+        try:
+            cursor = db.cursor()
+            cursor.execute("""
+                INSERT INTO sms_jobs (phone_number, text, status, next_attempt_at)
+                VALUES (?, ?, 'queued', ?)
+            """, (phone_number, text, time.time()))
+            db.commit()
+            job_id = cursor.lastrowid
+        
+        finally:
+            if close_after:
+                db.close()
+        
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+    
+    def _claim(self, db):
+        """
+        Lease the next due job.
+        
+        Returns:
+            Tuple of (job row or None, seconds until the next job is due or None)
+        """
+        now = time.time()
+        cursor = db.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("""
+                SELECT id, phone_number, text, attempts
+                FROM sms_jobs
+                WHERE status IN ('queued', 'sending') AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT 1
+            """, (now,))
+            job = cursor.fetchone()
+            wait = None
+            if job:
+                cursor.execute("""
+                    UPDATE sms_jobs
+                    SET status = 'sending', attempts = attempts + 1, next_attempt_at = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (now + SMS_LEASE_SECONDS, job['id']))
+            else:
+                cursor.execute("""
+                    SELECT MIN(next_attempt_at) FROM sms_jobs WHERE status IN ('queued', 'sending')
+                """)
+                next_due = cursor.fetchone()[0]
+                if next_due is not None:
+                    wait = max(0.0, next_due - now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return job, wait
+    
+    def _deliver(self, phone_number, text):
+        """
+        Try each transport in order.
+        
+        Returns:
+            Tuple of (transport name or None, result of the successful transport, errors by transport)
+        """
+        errors = []
+        for name, transport in self.transports:
+            try:
+                result = transport(phone_number, text)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            if result.get('success'):
+                return name, result, errors
+            errors.append(f"{name}: {result.get('error', 'unknown error')}")
+        return None, None, errors
+    
+    def _finish(self, db, job, method, result, errors):
+        attempts = job['attempts'] + 1
+        if method is not None:
+            db.execute("""
+                UPDATE sms_jobs
+                SET status = 'sent', method = ?, message_sid = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (method, result.get('message_sid'), '; '.join(errors) or None, job['id']))
+        elif attempts >= SMS_MAX_ATTEMPTS:
+            db.execute("""
+                UPDATE sms_jobs
+                SET status = 'failed', last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, ('; '.join(errors), job['id']))
+        else:
+            db.execute("""
+                UPDATE sms_jobs
+                SET status = 'queued', next_attempt_at = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (time.time() + retry_delay(attempts), '; '.join(errors), job['id']))
+        db.commit()
+    
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            
+            job = wait = None
+            try:
+                db = database.get_db()
+                try:
+                    job, wait = self._claim(db)
+                    if job:
+                        method, result, errors = self._deliver(job['phone_number'], job['text'])
+                        self._finish(db, job, method, result, errors)
+                finally:
+                    db.close()
+            except Exception:
+                # E.g. "database is locked": keep the worker alive and try again after a pause.
+                # A job claimed before the error is retried when its lease expires.
+                logger.exception("SMS worker error; retrying in %s s", SMS_POLL_SECONDS)
+                job = None
+                wait = SMS_POLL_SECONDS
+            
+            if job:
+                continue
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(SMS_POLL_SECONDS if wait is None else min(wait, SMS_POLL_SECONDS))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_sms_queue():
+    """Get the process-wide queue using the configured transports, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SmsQueue(default_transports())
+        return _queue
+
+
+def resume_sms_jobs(db=None):
+    """Start the workers if jobs from a previous run are still waiting for delivery."""
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        pending = db.execute("SELECT 1 FROM sms_jobs WHERE status IN ('queued', 'sending') LIMIT 1").fetchone()
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    if pending:
+        get_sms_queue().start()
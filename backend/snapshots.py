@@ -0,0 +1,443 @@
+"""
+Compact storage of shopping list history snapshots.
+
+A snapshot row holds its recipe selections and a reference to a payload
+row with the list itself. Payloads are stored once per distinct list
+(deduplicated by content hash), in a compact form:
+
+- Items are positional rows with IDs: ["i", ingredient_id, quantity,
+  unit_id, size_qualifier, recipe_volume, recipe_weight] for ingredients
+  and ["s", sub_recipe_id, quantity, unit_id] for sub-recipes. Ingredient,
+  recipe and unit names are stored once per payload in ID-keyed tables, so
+  a snapshot still shows the names it was generated with. Items that do
+  not have the standard shape are stored as ["x", item].
+- The canonical JSON of that form is zlib-compressed. Payloads are delta
+  encoded against the latest keyframe payload (used as a zlib preset
+  dictionary), since consecutive lists of a plan share most of their
+  contents. A payload whose delta is not much smaller than compressing it
+  alone becomes the next keyframe.
+
+Snapshots are kept until they are pruned with prune_snapshots() (POST
+/api/shopping-lists/prune), or, if SHOPLIST_SNAPSHOT_RETENTION is set, when
+a new snapshot is saved (only the latest SNAPSHOT_RETENTION are kept).
+Payloads no longer referenced are deleted with them.
+"""
+import hashlib
+import json
+import os
+import zlib
+
+from backend import database
+
+# Number of most recent snapshots kept when a new one is saved (None keeps every snapshot)
+SNAPSHOT_RETENTION = (
+    int(os.environ['SHOPLIST_SNAPSHOT_RETENTION']) if os.environ.get('SHOPLIST_SNAPSHOT_RETENTION') else None
+)
+
+# Default and maximum page sizes of list_snapshots()
+SNAPSHOT_PAGE_SIZE = 50
+MAX_SNAPSHOT_PAGE_SIZE = 500
+
+# A delta must be at most this fraction of the standalone size to be stored as a delta
+DELTA_MAX_RATIO = 0.5
+
+INGREDIENT_ITEM_KEYS = {
+    'ingredient_id', 'ingredient_name', 'quantity', 'unit_id', 'unit_name', 'size_qualifier', 'preparation_notes'
+}
+SUB_RECIPE_ITEM_KEYS = {
+    'is_sub_recipe', 'sub_recipe_id', 'sub_recipe_name', 'quantity', 'unit_id', 'unit_name',
+    'yield_quantity', 'yield_unit_name', 'size_qualifier', 'preparation_notes'
+}
+
+# Optional container amounts of ingredient items: amount key -> (unit key, unit)
+CONTAINER_AMOUNTS = {'recipe_volume': ('recipe_volume_unit', 'fl oz'), 'recipe_weight': ('recipe_weight_unit', 'gram')}
+
+
+def _encode_item(item, names):
+    """Encode one item as a positional row, registering its names; None if it has another shape."""
+    if item.get('preparation_notes') is not None:
+        return None
+    
+    if item.get('is_sub_recipe') is True:
+        if set(item) != SUB_RECIPE_ITEM_KEYS or item['size_qualifier'] is not None:
+            return None
+        recipe = [item['sub_recipe_name'], item['yield_quantity'], item['yield_unit_name']]
+        if names['recipes'].setdefault(item['sub_recipe_id'], recipe) != recipe:
+            return None
+        if names['units'].setdefault(item['unit_id'], item['unit_name']) != item['unit_name']:
+            return None
+        return ['s', item['sub_recipe_id'], item['quantity'], item['unit_id']]
+    
+    keys = set(item)
+    for amount_key, (unit_key, unit) in CONTAINER_AMOUNTS.items():
+        if amount_key in item or unit_key in item:
+            if item.get(amount_key) is None or item.get(unit_key) != unit:
+                return None
+            keys -= {amount_key, unit_key}
+    if keys != INGREDIENT_ITEM_KEYS:
+        return None
+    if names['ingredients'].setdefault(item['ingredient_id'], item['ingredient_name']) != item['ingredient_name']:
+        return None
+    if names['units'].setdefault(item['unit_id'], item['unit_name']) != item['unit_name']:
+        return None
+    return ['i', item['ingredient_id'], item['quantity'], item['unit_id'], item['size_qualifier'],
+            item.get('recipe_volume'), item.get('recipe_weight')]
+
+
+def encode_shopping_list(shopping_list):
+    """
+    Encode a shopping list in the compact form (canonical JSON bytes).
+    
+    Args:
+        shopping_list: List of shopping list items
+    
+    Returns:
+        UTF-8 encoded JSON; decode_shopping_list() restores an equal list
+    """
+    names = {'ingredients': {}, 'recipes': {}, 'units': {}}
+    rows = []
+    for item in shopping_list:
+        # Names registered by an item that falls back to verbatim storage are harmless
+        row = _encode_item(item, names)
+        rows.append(row if row is not None else ['x', item])
+    
+    compact = {
+        'names': {table: [[key, value] for key, value in entries.items()] for table, entries in names.items()},
+        'items': rows
+    }
+    return json.dumps(compact, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def decode_shopping_list(raw):
+    """
+    Decode a shopping list from encode_shopping_list() output.
+    
+    Args:
+        raw: Compact JSON bytes
+    
+    Returns:
+        List of shopping list items
+    """
+    compact = json.loads(raw)
+    ingredients = dict((key, value) for key, value in compact['names']['ingredients'])
+    recipes = dict((key, value) for key, value in compact['names']['recipes'])
+    units = dict((key, value) for key, value in compact['names']['units'])
+    
+    shopping_list = []
+    for row in compact['items']:
+        if row[0] == 'x':
+            shopping_list.append(row[1])
+        elif row[0] == 's':
+            _, sub_recipe_id, quantity, unit_id = row
+            name, yield_quantity, yield_unit_name = recipes[sub_recipe_id]
+            shopping_list.append({
+                'is_sub_recipe': True,
+                'sub_recipe_id': sub_recipe_id,
+                'sub_recipe_name': name,
+                'quantity': quantity,
+                'unit_id': unit_id,
+                'unit_name': units[unit_id],
+                'yield_quantity': yield_quantity,
+                'yield_unit_name': yield_unit_name,
+                'size_qualifier': None,
+                'preparation_notes': None
+            })
+        else:
+            _, ingredient_id, quantity, unit_id, size_qualifier, recipe_volume, recipe_weight = row
+            item = {
+                'ingredient_id': ingredient_id,
+                'ingredient_name': ingredients[ingredient_id],
+                'quantity': quantity,
+                'unit_id': unit_id,
+                'unit_name': units[unit_id],
+                'size_qualifier': size_qualifier,
+                'preparation_notes': None
+            }
+            if recipe_volume is not None:
+                item['recipe_volume'] = recipe_volume
+                item['recipe_volume_unit'] = 'fl oz'
+            if recipe_weight is not None:
+                item['recipe_weight'] = recipe_weight
+                item['recipe_weight_unit'] = 'gram'
+            shopping_list.append(item)
+    return shopping_list
+
+
+def _compress(raw, zdict=None):
+    compressor = zlib.compressobj(level=9, zdict=zdict) if zdict else zlib.compressobj(level=9)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _decompress(data, zdict=None):
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def store_payload(cursor, raw):
+    """
+    Store an encoded list unless an identical one is stored already.
+    
+    Args:
+        cursor: Cursor inside the caller's write transaction
+        raw: Output of encode_shopping_list()
+    
+    Returns:
+        Payload ID
+    """
+    content_hash = hashlib.sha256(raw).hexdigest()
+    cursor.execute("SELECT id FROM shopping_list_payloads WHERE content_hash = ?", (content_hash,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    
+    data = _compress(raw)
+    base_id = None
+    cursor.execute("SELECT id, data FROM shopping_list_payloads WHERE base_id IS NULL ORDER BY id DESC LIMIT 1")
+    keyframe = cursor.fetchone()
+    if keyframe:
+        delta = _compress(raw, zdict=_decompress(keyframe[1]))
+        if len(delta) <= len(data) * DELTA_MAX_RATIO:
+            data, base_id = delta, keyframe[0]
+    
+    # A writer that stored the same list since the lookup wins; its row is used
+    cursor.execute("""
+        INSERT OR IGNORE INTO shopping_list_payloads (content_hash, base_id, data)
+        VALUES (?, ?, ?)
+    """, (content_hash, base_id, data))
+    if cursor.rowcount:
+        return cursor.lastrowid
+    cursor.execute("SELECT id FROM shopping_list_payloads WHERE content_hash = ?", (content_hash,))
+    return cursor.fetchone()[0]
+
+
+def load_payload(cursor, payload_id):
+    """
+    Load and decode a stored list.
+    
+    Returns:
+        List of shopping list items
+    """
+    cursor.execute("""
+        SELECT p.data, b.data AS base_data
+        FROM shopping_list_payloads p
+        LEFT JOIN shopping_list_payloads b ON p.base_id = b.id
+        WHERE p.id = ?
+    """, (payload_id,))
+    row = cursor.fetchone()
+    zdict = _decompress(row['base_data']) if row['base_data'] is not None else None
+    return decode_shopping_list(_decompress(row['data'], zdict))
+
+
+def _delete_unused_payloads(cursor):
+    """
+    Delete payloads no snapshot uses, deltas first so their keyframes can go too.
+    
+    Returns:
+        Number of payloads deleted
+    """
+    deleted = 0
+    for condition in ("base_id IS NOT NULL", "base_id IS NULL"):
+        cursor.execute(f"""
+            DELETE FROM shopping_list_payloads
+            WHERE {condition}
+              AND NOT EXISTS (SELECT 1 FROM shopping_lists s WHERE s.payload_id = shopping_list_payloads.id)
+              AND NOT EXISTS (SELECT 1 FROM shopping_list_payloads d WHERE d.base_id = shopping_list_payloads.id)
+        """)
+        deleted += cursor.rowcount
+    return deleted
+
+
+def _prune(cursor, keep_latest=None, older_than_days=None):
+    """Delete old snapshots and their unused payloads; returns (snapshots, payloads) deleted."""
+    deleted = 0
+    if keep_latest is not None:
+        cursor.execute("""
+            DELETE FROM shopping_lists
+            WHERE id <= (SELECT id FROM shopping_lists ORDER BY id DESC LIMIT 1 OFFSET ?)
+        """, (keep_latest,))
+        deleted += cursor.rowcount
+    if older_than_days is not None:
+        cursor.execute("""
+            DELETE FROM shopping_lists WHERE created_at < datetime('now', ?)
+        """, (f'-{older_than_days} days',))
+        deleted += cursor.rowcount
+    return deleted, _delete_unused_payloads(cursor) if deleted else 0
+
+
+def save_snapshot(recipe_selections, shopping_list, db=None):
+    """
+    Save a generated list to the history, applying SNAPSHOT_RETENTION if it is set.
+    
+    Args:
+        recipe_selections: Selections the list was generated from
+        shopping_list: List of shopping list items
+        db: Optional database connection (committed by this function)
+    
+    Returns:
+        Snapshot ID
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    raw = encode_shopping_list(shopping_list)
+    try:
+        cursor = db.cursor()
+        if not db.in_transaction:
+            # Take the write lock before the payload lookup, so the lookup and
+            # the keyframe it deltas against cannot change before the insert
+            cursor.execute("BEGIN IMMEDIATE")
+        payload_id = store_payload(cursor, raw)
+        cursor.execute("""
+            INSERT INTO shopping_lists (recipe_selections, payload_id)
+            VALUES (?, ?)
+        """, (json.dumps(recipe_selections, separators=(',', ':')), payload_id))
+        snapshot_id = cursor.lastrowid
+        if SNAPSHOT_RETENTION is not None:
+            _prune(cursor, keep_latest=SNAPSHOT_RETENTION)
+        db.commit()
+        return snapshot_id
+    
+    except Exception:
+        db.rollback()
+        raise
+    
+    finally:
+        if close_after:
+            db.close()
+
+
+def get_snapshot(snapshot_id, db=None):
+    """
+    Get a snapshot with its selections and list.
+    
+    Returns:
+        Dictionary with 'id', 'created_at', 'recipe_selections' and
+        'shopping_list', or None if there is no such snapshot
+    """
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT id, created_at, recipe_selections, payload_id
+            FROM shopping_lists
+            WHERE id = ?
+        """, (snapshot_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {
+            'id': row['id'],
+            'created_at': row['created_at'],
+            'recipe_selections': json.loads(row['recipe_selections']),
+            'shopping_list': load_payload(cursor, row['payload_id'])
+        }
+    
+    finally:
+        if close_after:
+            db.close()
+
+
+def get_snapshot_selections(snapshot_id, db=None):
+    """Get a snapshot's recipe selections without loading its list, or None."""
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        row = db.execute("SELECT recipe_selections FROM shopping_lists WHERE id = ?", (snapshot_id,)).fetchone()
+        return json.loads(row['recipe_selections']) if row else None
+    
+    finally:
+        if close_after:
+            db.close()
+
+
+def list_snapshots(limit=SNAPSHOT_PAGE_SIZE, before=None, db=None):
+    """
+    List snapshots newest first, one page at a time.
+    
+    Pages are selected by ID (keyset pagination), so each page costs the
+    same however long the history is.
+    
+    Args:
+        limit: Page size (capped at MAX_SNAPSHOT_PAGE_SIZE)
+        before: Only list snapshots with a smaller ID (the last ID of the previous page)
+        db: Optional database connection
+    
+    Returns:
+        Tuple of (list of {'id', 'created_at'} dicts, cursor for the next page or None)
+    """
+    limit = max(1, min(limit, MAX_SNAPSHOT_PAGE_SIZE))
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        if before is None:
+            cursor.execute("SELECT id, created_at FROM shopping_lists ORDER BY id DESC LIMIT ?", (limit + 1,))
+        else:
+            cursor.execute("""
+                SELECT id, created_at FROM shopping_lists WHERE id < ? ORDER BY id DESC LIMIT ?
+            """, (before, limit + 1))
+        rows = [dict(row) for row in cursor.fetchall()]
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]['id']
+    return rows, None
+
+
+def prune_snapshots(keep_latest=None, older_than_days=None, db=None):
+    """
+    Delete old snapshots and the payloads only they used.
+    
+    Args:
+        keep_latest: Keep only this many of the most recent snapshots
+        older_than_days: Delete snapshots created more than this many days ago
+        db: Optional database connection (committed by this function)
+    
+    Returns:
+        Dictionary with 'deleted_snapshots' and 'deleted_payloads' counts
+    
+    Raises:
+        ValueError: If a limit is negative
+    """
+    if (keep_latest is not None and keep_latest < 0) or (older_than_days is not None and older_than_days < 0):
+        raise ValueError("keep_latest and older_than_days must not be negative")
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        deleted_snapshots, deleted_payloads = _prune(db.cursor(), keep_latest, older_than_days)
+        db.commit()
+        return {'deleted_snapshots': deleted_snapshots, 'deleted_payloads': deleted_payloads}
+    
+    except Exception:
+        db.rollback()
+        raise
+    
+    finally:
+        if close_after:
+            db.close()
@@ -0,0 +1,182 @@
+"""
+Grocery store sections for ingredients.
+
+Every ingredient's section is derived from its name, type and shopping unit
+by get_store_section(). The sections of all ingredients are computed
+together from one query and kept in memory until ingredients change, so
+organizing a shopping list needs no per-item lookups.
+"""
+import threading
+
+from backend import database
+
+# Store sections in display order, with their headers
+STORE_SECTIONS = [
+    ('produce', '🥬 PRODUCE'),
+    ('dry_bulk', '📦 DRY/BULK GOODS'),
+    ('canned_preserved', '🥫 CANNED/PRESERVED'),
+    ('refrigerated', '🥛 REFRIGERATED'),
+    ('frozen', '❄️ FROZEN'),
+]
+
+
+def get_store_section(ingredient_name, ingredient_type_name, shopping_unit_name, db=None):
+    """
+    Determine grocery store section for an ingredient.
+    
+    Args:
+        ingredient_name: Name of the ingredient (e.g., "Fresh Mango", "Frozen Blueberries")
+        ingredient_type_name: Ingredient type name (e.g., "Fruits", "Vegetables")
+        shopping_unit_name: Shopping unit name (e.g., "whole", "package", "can")
+        db: Optional database connection
+        
+    Returns: 
+        'produce', 'dry_bulk', 'canned_preserved', 'refrigerated', 'frozen'
+    """
+    name_lower = ingredient_name.lower()
+    type_lower = ingredient_type_name.lower()
+    unit_lower = shopping_unit_name.lower()
+    
+    # FROZEN - highest priority (explicit in name)
+    if 'frozen' in name_lower:
+        return 'frozen'
+    
+    # REFRIGERATED - check before produce (milk, tempeh, tortillas, miso paste)
+    if 'milk' in name_lower or 'tempeh' in name_lower or 'tortilla' in name_lower:
+        return 'refrigerated'
+    # Miso paste is refrigerated
+    if 'miso' in name_lower:
+        return 'refrigerated'
+    if type_lower == 'liquids':
+        # Most liquids in this system are plant-based milks (refrigerated)
+        return 'refrigerated'
+    
+    # PRODUCE
+    # Fresh ginger and garlic go to produce (even though they're in Spices type)
+    if 'fresh ginger' in name_lower or (name_lower == 'ginger' and 'fresh' not in name_lower):
+        return 'produce'
+    if name_lower == 'garlic' or (name_lower.startswith('garlic') and 'powder' not in name_lower and 'salt' not in name_lower):
+        return 'produce'
+    
+    if type_lower == 'vegetables' and 'frozen' not in name_lower:
+        return 'produce'
+    if type_lower == 'fruits':
+        # Fresh fruits go to produce, frozen go to frozen (already handled above)
+        if 'frozen' not in name_lower:
+            return 'produce'
+    if type_lower == 'herbs':
+        # Fresh herbs go to produce, dried go to dry_bulk
+        if 'fresh' in name_lower or 'dried' not in name_lower:
+            return 'produce'
+    
+    # DRY/BULK (includes baking section)
+    # Vanilla extract goes to dry/bulk (baking section)
+    if 'vanilla extract' in name_lower or 'vanilla' in name_lower:
+        return 'dry_bulk'
+    
+    if type_lower in ['grains', 'nuts & seeds', 'spices']:
+        return 'dry_bulk'
+    if type_lower == 'herbs' and 'dried' in name_lower:
+        return 'dry_bulk'
+    if type_lower == 'pantry items':
+        # Check for dry goods patterns
+        dry_keywords = ['flour', 'sugar', 'yeast', 'oats', 'rice', 'quinoa', 'barley', 
+                       'millet', 'farro', 'buckwheat', 'lentil']
+        if any(word in name_lower for word in dry_keywords):
+            # Make sure it's not canned - exclude canned beans/lentils
+            if not any(canned_word in name_lower for canned_word in ['canned', 'can', 'salt-free']):
+                return 'dry_bulk'
+    
+    # CANNED/PRESERVED
+    if type_lower == 'pantry items':
+        # Canned/jarred items
+        if unit_lower in ['can', 'jar', 'bottle']:
+            return 'canned_preserved'
+        if any(word in name_lower for word in ['salt-free', 'canned', 'crushed', 'diced', 
+                                               'marinara', 'tahini', 'molasses', 
+                                               'vinegar', 'sauce']):
+            # Note: miso is handled above as refrigerated
+            return 'canned_preserved'
+    
+    # PLANT PROTEINS - most are canned/preserved (beans) or refrigerated (tempeh)
+    if type_lower == 'plant proteins':
+        if 'tempeh' in name_lower:
+            return 'refrigerated'
+        # Most others are canned beans
+        return 'canned_preserved'
+    
+    # Default fallback
+    return 'dry_bulk'  # Safe default for unclassified items
+
+
+_sections = None  # Ingredient ID -> store section
+_sections_db_path = None
+_sections_version = 0  # Bumped on invalidation so a concurrent load is not installed stale
+_lock = threading.Lock()
+
+
+def _load_store_sections(db):
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT i.id, i.name as ingredient_name, it.name as type_name, ut.name as shopping_unit_name
+        FROM ingredients i
+        JOIN ingredient_types it ON i.type_id = it.id
+        JOIN unit_types ut ON i.shopping_unit_id = ut.id
+    """)
+    return {
+        row['id']: get_store_section(row['ingredient_name'], row['type_name'], row['shopping_unit_name'])
+        for row in cursor.fetchall()
+    }
+
+
+def get_store_section_map(db=None, ingredient_ids=()):
+    """
+    Get the store section of every ingredient.
+    
+    The map is loaded with one query the first time it is needed, and
+    reloaded if any of ingredient_ids is missing from it (e.g. an ingredient
+    added by another process).
+    
+    Args:
+        db: Optional database connection
+        ingredient_ids: IDs of ingredients the caller needs
+    
+    Returns:
+        Dictionary mapping ingredient ID to store section; must not be modified
+    """
+    global _sections, _sections_db_path
+    
+    with _lock:
+        if _sections_db_path != str(database.DB_PATH):
+            _sections = None
+            _sections_db_path = str(database.DB_PATH)
+        sections = _sections
+        version = _sections_version
+    if sections is not None and all(i in sections for i in ingredient_ids):
+        return sections
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        sections = _load_store_sections(db)
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    with _lock:
+        if _sections_db_path == str(database.DB_PATH) and version == _sections_version:
+            _sections = sections
+    return sections
+
+
+def invalidate_store_sections():
+    """Drop the section map after ingredients are added or changed."""
+    global _sections, _sections_version
+    with _lock:
+        _sections = None
+        _sections_version += 1
@@ -0,0 +1,172 @@
+"""
+In-process registry of unit types.
+
+unit_types is tiny and practically never changes, so it is loaded once
+(at init_db) and unit lookups become dictionary lookups instead of SQL.
+"""
+import threading
+from types import MappingProxyType
+from typing import List, NamedTuple, Optional
+
+from backend import database
+
+# Standard volume conversions (all to teaspoons as base)
+# 1 cup = 48 teaspoons
+# 1 tablespoon = 3 teaspoons
+# 1 fluid_ounce = 6 teaspoons
+# 1 milliliter ≈ 0.202884 teaspoons (1 ml = 0.202884 tsp)
+TSP_PER_UNIT = {
+    'cup': 48.0,
+    'tablespoon': 3.0,
+    'teaspoon': 1.0,
+    'fluid_ounce': 6.0,
+    'milliliter': 0.202884,  # Approximate
+}
+
+# Standard weight conversions (all to grams as base)
+GRAMS_PER_UNIT = {
+    'gram': 1.0,
+    'kilogram': 1000.0,
+    'ounce': 28.349523125,
+    'pound': 453.59237,
+}
+
+
+class Unit(NamedTuple):
+    id: int
+    name: str
+    category: str
+
+
+class UnitRegistry:
+    """
+    Immutable snapshot of the unit_types table.
+    
+    Attributes:
+        by_id: Unit by ID
+        ids_by_name: Unit ID by name
+        tsp_factors: Teaspoons per unit for standard volume units, by unit ID
+        gram_factors: Grams per unit for standard weight units, by unit ID
+        db_path: Database file the snapshot was loaded from
+    """
+    
+    __slots__ = ('by_id', 'ids_by_name', 'tsp_factors', 'gram_factors', 'db_path')
+    
+    def __init__(self, units, db_path=None):
+        by_id = {unit.id: unit for unit in units}
+        object.__setattr__(self, 'by_id', MappingProxyType(by_id))
+        object.__setattr__(self, 'ids_by_name', MappingProxyType({unit.name: unit.id for unit in by_id.values()}))
+        object.__setattr__(self, 'tsp_factors', MappingProxyType({
+            unit.id: TSP_PER_UNIT[unit.name.lower()]
+            for unit in by_id.values()
+            if unit.category == 'volume' and unit.name.lower() in TSP_PER_UNIT
+        }))
+        object.__setattr__(self, 'gram_factors', MappingProxyType({
+            unit.id: GRAMS_PER_UNIT[unit.name.lower()]
+            for unit in by_id.values()
+            if unit.category == 'weight' and unit.name.lower() in GRAMS_PER_UNIT
+        }))
+        object.__setattr__(self, 'db_path', db_path)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("UnitRegistry is immutable")
+    
+    def get(self, unit_id) -> Optional[Unit]:
+        """Get a unit by ID, or None if unknown."""
+        return self.by_id.get(unit_id)
+    
+    def id_for(self, name) -> Optional[int]:
+        """Get a unit ID by name, or None if unknown."""
+        return self.ids_by_name.get(name)
+    
+    def name_of(self, unit_id, default=None):
+        """Get a unit name by ID."""
+        unit = self.by_id.get(unit_id)
+        return unit.name if unit else default
+    
+    def category_of(self, unit_id, default=None):
+        """Get a unit category by ID."""
+        unit = self.by_id.get(unit_id)
+        return unit.category if unit else default
+    
+    def convert_volume(self, from_unit_id, to_unit_id, quantity):
+        """
+        Convert between standard volume units using TSP_PER_UNIT.
+        
+        Returns:
+            Converted quantity or None if either unit is not a standard volume unit
+        """
+        from_tsp = self.tsp_factors.get(from_unit_id)
+        to_tsp = self.tsp_factors.get(to_unit_id)
+        if from_tsp is None or to_tsp is None:
+            return None
+        
+        # Convert: from_unit → teaspoons → to_unit
+        teaspoons = quantity * from_tsp
+        return teaspoons / to_tsp
+    
+    def list_units(self, category=None) -> List[dict]:
+        """Units as dicts ordered by name, optionally filtered by category."""
+        units = sorted(self.by_id.values(), key=lambda unit: unit.name)
+        return [unit._asdict() for unit in units if category is None or unit.category == category]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def load_unit_registry(db=None):
+    """
+    (Re)load the unit registry from the database.
+    
+    Args:
+        db: Optional database connection
+    
+    Returns:
+        The new UnitRegistry
+    """
+    global _registry
+    
+    if db is None:
+        db = database.get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT id, name, category FROM unit_types")
+        registry = UnitRegistry(
+            [Unit(row['id'], row['name'], row['category']) for row in cursor.fetchall()],
+            db_path=str(database.DB_PATH)
+        )
+    
+    finally:
+        if close_after:
+            db.close()
+    
+    with _registry_lock:
+        _registry = registry
+    return registry
+
+
+def get_unit_registry(db=None):
+    """
+    Get the process-wide unit registry, loading it on first use.
+    
+    The registry is reloaded if DB_PATH has changed since it was loaded.
+    
+    Args:
+        db: Optional database connection used if the registry must be loaded
+    """
+    registry = _registry
+    if registry is None or registry.db_path != str(database.DB_PATH):
+        registry = load_unit_registry(db)
+    return registry
+
+
+def invalidate_unit_registry():
+    """Drop the cached registry; call after writing to unit_types."""
+    global _registry
+    with _registry_lock:
+        _registry = None
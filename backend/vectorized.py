@@ -0,0 +1,133 @@
+"""
+NumPy implementation of shopping list ingredient aggregation.
+
+The base ingredient items of the selected recipes are laid out as columns
+(quantity and an index into the distinct ingredient/unit/size combinations).
+Conversion factors and size reference values are looked up once per
+combination, gathered onto the items, and summed per ingredient with
+np.bincount. Python only loops over distinct recipes and combinations, not
+over every item of every batch, which matters for lists built from hundreds
+of recipes.
+
+Every item is computed with the same float operations, and summed in the
+same order, as services.aggregate_ingredient_totals(), so both give
+identical results. NumPy is optional: HAS_NUMPY is False when it is not
+installed and services then always uses the pure-Python path.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def aggregate_ingredient_totals_numpy(recipe_selections, data, reference_unit_ids, volume_unit_id, weight_unit_id):
+    """
+    Sum the base ingredients of selected recipes with vectorized operations.
+    
+    Same arguments and result as services.aggregate_ingredient_totals().
+    
+    Raises:
+        RuntimeError: If NumPy is not installed
+    """
+    if np is None:
+        raise RuntimeError("NumPy is not installed. Please install with: pip install numpy")
+    
+    # Columns per distinct recipe: index of each item's (ingredient, unit, size) combination, and quantity
+    combinations = {}
+    recipe_columns = {}
+    for recipe_id in dict.fromkeys(selection['recipe_id'] for selection in recipe_selections):
+        combination_indices = []
+        quantities = []
+        for item in data['recipe_items'].get(recipe_id, []):
+            if item['item_type'] == 'sub_recipe':
+                continue
+            combination = (item['ingredient_id'], item['unit_id'], item['size_qualifier'])
+            combination_indices.append(combinations.setdefault(combination, len(combinations)))
+            quantities.append(item['quantity'])
+        recipe_columns[recipe_id] = (
+            np.array(combination_indices, dtype=np.intp),
+            np.array(quantities, dtype=np.float64)
+        )
+    
+    if not combinations:
+        return {}
+    
+    # Factors per combination; items that cannot reach the shopping unit are not valid
+    count = len(combinations)
+    ingredient_positions = {}  # Ingredient ID -> position, in order of first use
+    combination_ingredient = np.empty(count, dtype=np.intp)
+    valid = np.zeros(count, dtype=bool)
+    shopping_factor = np.zeros(count)
+    volume_factor = np.zeros(count)
+    weight_factor = np.zeros(count)
+    reference_factor = np.zeros(count)
+    uses_size_value = np.zeros(count, dtype=bool)
+    size_value = np.zeros(count)
+    
+    for index, (ingredient_id, unit_id, size_qualifier) in enumerate(combinations):
+        combination_ingredient[index] = ingredient_positions.setdefault(ingredient_id, len(ingredient_positions))
+        ingredient = data['ingredients'].get(ingredient_id)
+        if not ingredient:
+            continue
+        graph = data['conversion_graphs'][ingredient_id]
+        factor = graph.factor(unit_id, ingredient['shopping_unit_id'])
+        if factor is None:
+            continue
+        
+        valid[index] = True
+        shopping_factor[index] = factor
+        if volume_unit_id:
+            volume_factor[index] = graph.factor(unit_id, volume_unit_id) or 0.0
+        if weight_unit_id:
+            weight_factor[index] = graph.factor(unit_id, weight_unit_id) or 0.0
+        
+        reference_unit_id = reference_unit_ids.get(ingredient_id)
+        if not reference_unit_id:
+            continue
+        if size_qualifier:
+            # Each piece counts as the reference value for its size
+            for rule in data['size_rules'].get(ingredient_id, []):
+                if rule['reference_unit_id'] == reference_unit_id and rule['size_qualifier'] == size_qualifier:
+                    uses_size_value[index] = True
+                    size_value[index] = rule['reference_value']
+                    break
+        else:
+            reference_factor[index] = graph.factor(unit_id, reference_unit_id) or 0.0
+    
+    # Item columns for every selection, with batch multipliers applied
+    item_combinations = []
+    item_quantities = []
+    for selection in recipe_selections:
+        combination_indices, quantities = recipe_columns[selection['recipe_id']]
+        item_combinations.append(combination_indices)
+        item_quantities.append(quantities * selection.get('batches', 1))
+    item_combinations = np.concatenate(item_combinations)
+    item_quantities = np.concatenate(item_quantities)
+    
+    keep = valid[item_combinations]
+    item_combinations = item_combinations[keep]
+    item_quantities = item_quantities[keep]
+    
+    shopping = item_quantities * shopping_factor[item_combinations]
+    reference = np.where(
+        uses_size_value[item_combinations],
+        shopping * size_value[item_combinations],
+        item_quantities * reference_factor[item_combinations]
+    )
+    volume = item_quantities * volume_factor[item_combinations]
+    weight = item_quantities * weight_factor[item_combinations]
+    
+    # bincount adds each bin's weights in item order, like the pure-Python loop
+    groups = combination_ingredient[item_combinations]
+    sums = [
+        np.bincount(groups, weights=values, minlength=len(ingredient_positions))
+        for values in (shopping, reference, volume, weight)
+    ]
+    
+    return {
+        ingredient_id: [float(column[position]) for column in sums]
+        for ingredient_id, position in ingredient_positions.items()
+        if ingredient_id in data['ingredients']
+    }
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Benchmark shopping list generation and the recipe APIs.
+
+Builds synthetic databases (see setup_database.seed_synthetic_dataset) at
+several sizes and sub-recipe nesting depths, then times service functions
+and Flask routes (through app.test_client()) and counts the SQL statements
+each call runs.
+
+Usage:
+    python benchmark.py                                # Default grid, table only
+    python benchmark.py --output results.json          # Also save machine-readable results
+    python benchmark.py --compare results.json         # Show changes against saved results
+    python benchmark.py --items 10 1000 --depths 1 3 --repeat 10
+
+The first call of each operation on a fresh database is reported
+separately (cold caches); the median/min columns cover the repeated calls.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend import database
+
+DEFAULT_ITEMS = [10, 1000, 100000]
+DEFAULT_DEPTHS = [1, 5, 10]
+ITEMS_PER_RECIPE = 10
+
+# Number of top-level recipes in the shopping list selection
+SELECTION_SIZE = 20
+
+
+class QueryCounter:
+    """Counts SQL statements reported by the connection trace callback."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement):
+        # Statements run by triggers are reported as "-- TRIGGER ..." comments
+        if not statement.startswith('--'):
+            self.count += 1
+
+
+def build_database(path, items, depth, seed):
+    """
+    Create and seed a synthetic database.
+
+    Returns:
+        Dictionary describing the dataset
+    """
+    import setup_database
+
+    recipes = max(depth + 1, items // ITEMS_PER_RECIPE)
+    items_per_recipe = max(1, items // recipes)
+    ingredients = min(500, max(20, items // 20))
+
+    database.DB_PATH = Path(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+    setup_database.seed_default_ingredients()
+    counts = setup_database.seed_synthetic_dataset(
+        ingredients=ingredients,
+        recipes=recipes,
+        depth=depth,
+        items_per_recipe=items_per_recipe,
+        seed=seed
+    )
+    return {'items': items, 'depth': depth, **counts}
+
+
+def time_call(func, repeat, counter):
+    """
+    Call func repeat + 1 times.
+
+    Returns:
+        Dictionary with first-call and repeated-call timings (ms) and query counts
+    """
+    timings = []
+    queries = []
+    for _ in range(repeat + 1):
+        counter.count = 0
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+    repeated = timings[1:] or timings
+    return {
+        'first_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(repeated), 3),
+        'min_ms': round(min(repeated), 3),
+        'queries_first': queries[0],
+        'queries_repeat': queries[-1],
+    }
+
+
+def operations(client):
+    """
+    Build the benchmarked operations for the current database.
+
+    Returns:
+        List of (name, callable) pairs
+    """
+    from backend.recipe_graph import get_recipe_descendants
+    from backend.search import search_recipes
+    from backend.services import check_circular_reference, expand_sub_recipe, generate_shopping_list
+    from backend.units import get_unit_registry
+
+    db = database.get_db()
+    top_ids = [row['id'] for row in db.execute("""
+        SELECT id FROM recipes WHERE is_sub_recipe = 0 ORDER BY id DESC LIMIT ?
+    """, (SELECTION_SIZE,))]
+    deepest_sub_recipe = db.execute("SELECT MAX(id) FROM recipes WHERE is_sub_recipe = 1").fetchone()[0]
+    search_term = db.execute("""
+        SELECT substr(name, -6) FROM ingredients WHERE name LIKE 'Synthetic Ingredient %' ORDER BY id LIMIT 1
+    """).fetchone()[0]
+    db.close()
+
+    cup_id = get_unit_registry().id_for('cup')
+    top_id = top_ids[0]
+    selections = [{'recipe_id': recipe_id, 'batches': 2} for recipe_id in top_ids]
+    descendants = get_recipe_descendants(top_id)
+    leaf_id = min(descendants) if descendants else top_id
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.method} {response.request.path} returned {response.status_code}")
+
+    ops = [
+        ('generate_shopping_list', lambda: generate_shopping_list(selections)),
+        ('check_circular_reference', lambda: check_circular_reference(leaf_id, top_id)),
+        ('search_recipes', lambda: search_recipes([search_term])),
+        ('POST /api/shopping-lists', lambda: check(client.post('/api/shopping-lists', json={'recipe_selections': selections}))),
+        ('POST /api/shopping-list/formatted-text',
+         lambda: check(client.post('/api/shopping-list/formatted-text', json={'recipe_selections': selections}))),
+        ('GET /api/recipes?ingredients=', lambda: check(client.get(f'/api/recipes?ingredients={search_term}'))),
+        ('GET /api/recipes/<id>', lambda: check(client.get(f'/api/recipes/{top_id}'))),
+        ('GET /api/recipes', lambda: check(client.get('/api/recipes'))),
+    ]
+    if deepest_sub_recipe:
+        ops.insert(1, ('expand_sub_recipe', lambda: expand_sub_recipe(deepest_sub_recipe, 2, cup_id, 1)))
+    return ops
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(items_list, depths, repeat, seed):
+    """Run every operation on every database size and depth."""
+    counter = QueryCounter()
+    results = []
+    client = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for items in items_list:
+            for depth in depths:
+                dataset = build_database(os.path.join(tmp, f'bench-{items}-{depth}.db'), items, depth, seed)
+                if client is None:
+                    # Importing app initializes DB_PATH, which now points at the benchmark database
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        from app import app
+                    client = app.test_client()
+
+                database.set_trace_callback(counter)
+                try:
+                    for name, func in operations(client):
+                        result = {'operation': name, **dataset, **time_call(func, repeat, counter)}
+                        results.append(result)
+                        print(f"{items:>7} {depth:>5}  {name:<42} {result['first_ms']:>10.2f} {result['median_ms']:>10.2f} "
+                              f"{result['queries_first']:>7} {result['queries_repeat']:>7}")
+                finally:
+                    database.set_trace_callback(None)
+                    database.close_all_connections()
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline_path):
+    """Print median time and query count changes against a saved report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['items'], r['depth'], r['operation']): r for r in baseline['results']}
+
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for result in report['results']:
+        before = previous.get((result['items'], result['depth'], result['operation']))
+        if not before:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        print(f"{result['items']:>7} {result['depth']:>5}  {result['operation']:<42} "
+              f"{before['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms ({ratio:>5.2f}x)  "
+              f"queries {before['queries_repeat']} -> {result['queries_repeat']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark shopping list generation and recipe APIs.")
+    parser.add_argument('--items', type=int, nargs='+', default=DEFAULT_ITEMS, help="Recipe item counts to test")
+    parser.add_argument('--depths', type=int, nargs='+', default=DEFAULT_DEPTHS, help="Sub-recipe nesting depths to test")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed calls after the first (cold) call")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for synthetic data")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', metavar='FILE', help="Compare with results saved by --output")
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>7} {'depth':>5}  {'operation':<42} {'first ms':>10} {'median ms':>10} {'q first':>7} {'q rep':>7}")
+    report = run(args.items, args.depths, args.repeat, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
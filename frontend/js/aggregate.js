@@ -0,0 +1,277 @@
+/**
+ * Shopping list aggregation over the data bundle from GET /api/bundle.
+ *
+ * A port of build_shopping_list() in backend/services.py: the same steps run
+ * in the same order with the same floating point operations, so a list
+ * computed here matches the server's item for item (test_bundle_parity.py
+ * checks this). Lists computed here are previews; the server generates the
+ * list that is saved.
+ */
+
+// Preference order of unit categories when picking a size estimation reference unit
+const REFERENCE_CATEGORY_RANK = { weight: 1, volume: 2 };
+
+/**
+ * Index a bundle for computeShoppingList().
+ */
+function compileBundle(bundle) {
+    const units = new Map(bundle.units.map(([id, name, category]) => [id, { id, name, category }]));
+    const unitIds = new Map(bundle.units.map(([id, name]) => [name, id]));
+    
+    const ingredients = new Map();
+    bundle.ingredients.forEach(([id, name, shoppingUnitId, factors, sizeRules]) => {
+        ingredients.set(id, {
+            id,
+            name,
+            shoppingUnitId,
+            shoppingUnitName: units.get(shoppingUnitId).name,
+            factors: new Map(factors.map(([fromUnitId, toUnitId, factor]) => [`${fromUnitId}:${toUnitId}`, factor])),
+            sizeRules: sizeRules.map(([sizeQualifier, referenceUnitId, referenceValue]) => ({
+                sizeQualifier,
+                referenceUnitId,
+                referenceValue,
+            })),
+        });
+    });
+    
+    const recipes = new Map();
+    bundle.recipes.forEach(([id, name, yieldQuantity, yieldUnitId, items]) => {
+        recipes.set(id, {
+            id,
+            name,
+            yieldQuantity,
+            yieldUnitName: units.get(yieldUnitId).name,
+            items: items.map(item => (item[0] === 's'
+                ? { isSubRecipe: true, subRecipeId: item[1], quantity: item[2], unitId: item[3] }
+                : { isSubRecipe: false, ingredientId: item[1], quantity: item[2], unitId: item[3], sizeQualifier: item[4] })),
+        });
+    });
+    
+    return {
+        version: bundle.version,
+        containerUnits: new Set(bundle.container_units),
+        units,
+        unitIds,
+        ingredients,
+        recipes,
+    };
+}
+
+/**
+ * Check that a compiled bundle knows every selected recipe (a recipe created
+ * after the bundle was loaded needs a newer bundle).
+ */
+function bundleHasRecipes(compiled, recipeSelections) {
+    return recipeSelections.every(selection => compiled.recipes.has(selection.recipe_id));
+}
+
+// Convert a quantity, or return null if there is no conversion path (ConversionGraph.convert)
+function convertQuantity(ingredient, quantity, fromUnitId, toUnitId) {
+    if (fromUnitId === toUnitId) {
+        return quantity * 1.0;
+    }
+    const factor = ingredient.factors.get(`${fromUnitId}:${toUnitId}`);
+    return factor === undefined ? null : quantity * factor;
+}
+
+// Weight units are preferred, then volume, then anything else (get_reference_unit_id)
+function getReferenceUnitId(sizeRules, units) {
+    let referenceUnitId = null;
+    let bestRank = null;
+    sizeRules.forEach(rule => {
+        const unit = units.get(rule.referenceUnitId);
+        const rank = (unit && REFERENCE_CATEGORY_RANK[unit.category]) || 3;
+        if (bestRank === null || rank < bestRank) {
+            bestRank = rank;
+            referenceUnitId = rule.referenceUnitId;
+        }
+    });
+    return referenceUnitId;
+}
+
+// [shopping quantity, reference value, container volume, container weight] of one item, or null
+function ingredientItemValues(compiled, item, quantity, ingredient, referenceUnitId, volumeUnitId, weightUnitId) {
+    const itemShoppingQuantity = convertQuantity(ingredient, quantity, item.unitId, ingredient.shoppingUnitId);
+    if (itemShoppingQuantity === null) {
+        return null;
+    }
+    
+    let itemVolume = 0;
+    let itemWeight = 0;
+    if (compiled.containerUnits.has(ingredient.shoppingUnitName)) {
+        if (volumeUnitId) {
+            itemVolume = convertQuantity(ingredient, quantity, item.unitId, volumeUnitId) || 0;
+        }
+        if (weightUnitId) {
+            itemWeight = convertQuantity(ingredient, quantity, item.unitId, weightUnitId) || 0;
+        }
+    }
+    
+    let itemRefValue = 0;
+    if (referenceUnitId) {
+        if (item.sizeQualifier) {
+            // Each piece counts as the reference value for its size
+            const rule = ingredient.sizeRules.find(rule => (
+                rule.referenceUnitId === referenceUnitId && rule.sizeQualifier === item.sizeQualifier
+            ));
+            if (rule) {
+                itemRefValue = itemShoppingQuantity * rule.referenceValue;
+            }
+        } else {
+            itemRefValue = convertQuantity(ingredient, quantity, item.unitId, referenceUnitId) || 0;
+        }
+    }
+    
+    return [itemShoppingQuantity, itemRefValue, itemVolume, itemWeight];
+}
+
+function makeIngredientItem(compiled, ingredient, totals, referenceUnitId, wholeUnitId) {
+    const [totalShoppingQuantity, totalReferenceValue, totalRecipeVolume, totalRecipeWeight] = totals;
+    if (totalShoppingQuantity <= 0) {
+        return null;
+    }
+    
+    // Pick the size needing the fewest items to cover the total weight or volume
+    let optimizedSize = null;
+    let optimizedQuantity = Math.ceil(totalShoppingQuantity);
+    if (referenceUnitId && ingredient.shoppingUnitId === wholeUnitId && totalReferenceValue > 0) {
+        const sizeOptions = ingredient.sizeRules
+            .filter(rule => rule.referenceUnitId === referenceUnitId)
+            .sort((a, b) => b.referenceValue - a.referenceValue);
+        let minItems = Infinity;
+        sizeOptions.forEach(rule => {
+            const itemsNeeded = Math.ceil(totalReferenceValue / rule.referenceValue);
+            if (itemsNeeded < minItems) {
+                minItems = itemsNeeded;
+                optimizedQuantity = itemsNeeded;
+                optimizedSize = rule.sizeQualifier;
+            }
+        });
+    }
+    
+    const shoppingItem = {
+        ingredient_id: ingredient.id,
+        ingredient_name: ingredient.name,
+        quantity: optimizedQuantity,
+        unit_id: ingredient.shoppingUnitId,
+        unit_name: ingredient.shoppingUnitName,
+        size_qualifier: optimizedSize,
+        preparation_notes: null,
+    };
+    
+    if (compiled.containerUnits.has(ingredient.shoppingUnitName)) {
+        if (totalRecipeVolume > 0) {
+            // Cups to fluid ounces for display
+            shoppingItem.recipe_volume = totalRecipeVolume * 8;
+            shoppingItem.recipe_volume_unit = 'fl oz';
+        }
+        if (totalRecipeWeight > 0) {
+            shoppingItem.recipe_weight = totalRecipeWeight;
+            shoppingItem.recipe_weight_unit = 'gram';
+        }
+    }
+    
+    return shoppingItem;
+}
+
+// Sub-recipes first, then ingredients, each by name (shopping_list_sort_key)
+function compareShoppingListItems(a, b) {
+    const groupA = a.is_sub_recipe ? 0 : 1;
+    const groupB = b.is_sub_recipe ? 0 : 1;
+    if (groupA !== groupB) {
+        return groupA - groupB;
+    }
+    const nameA = (a.is_sub_recipe ? a.sub_recipe_name : a.ingredient_name) || '';
+    const nameB = (b.is_sub_recipe ? b.sub_recipe_name : b.ingredient_name) || '';
+    return nameA < nameB ? -1 : (nameA > nameB ? 1 : 0);
+}
+
+/**
+ * Compute a shopping list from recipe selections ({ recipe_id, batches }),
+ * in the same shape as POST /api/shopping-lists returns.
+ */
+function computeShoppingList(compiled, recipeSelections) {
+    const { units, unitIds } = compiled;
+    const wholeUnitId = unitIds.get('whole');
+    const volumeUnitId = unitIds.get('cup');
+    const weightUnitId = unitIds.get('gram');
+    
+    // Base ingredient items and sub-recipe amounts, in order of first use
+    const ingredientGroups = new Map();
+    const subRecipeGroups = new Map();
+    recipeSelections.forEach(selection => {
+        const batches = selection.batches === undefined ? 1 : selection.batches;
+        const recipe = compiled.recipes.get(selection.recipe_id);
+        (recipe ? recipe.items : []).forEach(item => {
+            const quantity = item.quantity * batches;
+            if (item.isSubRecipe) {
+                if (!subRecipeGroups.has(item.subRecipeId)) {
+                    subRecipeGroups.set(item.subRecipeId, new Map());
+                }
+                // The same sub-recipe may be requested in different units
+                const quantitiesByUnit = subRecipeGroups.get(item.subRecipeId);
+                quantitiesByUnit.set(item.unitId, (quantitiesByUnit.get(item.unitId) || 0) + quantity);
+            } else {
+                if (!ingredientGroups.has(item.ingredientId)) {
+                    ingredientGroups.set(item.ingredientId, []);
+                }
+                ingredientGroups.get(item.ingredientId).push([item, quantity]);
+            }
+        });
+    });
+    
+    const shoppingList = [];
+    ingredientGroups.forEach((items, ingredientId) => {
+        const ingredient = compiled.ingredients.get(ingredientId);
+        if (!ingredient) {
+            return;
+        }
+        
+        const referenceUnitId = getReferenceUnitId(ingredient.sizeRules, units);
+        const totals = [0, 0, 0, 0];
+        items.forEach(([item, quantity]) => {
+            const values = ingredientItemValues(compiled, item, quantity, ingredient, referenceUnitId,
+                                                volumeUnitId, weightUnitId);
+            if (values !== null) {
+                for (let i = 0; i < 4; i++) {
+                    totals[i] += values[i];
+                }
+            }
+        });
+        
+        const shoppingItem = makeIngredientItem(compiled, ingredient, totals, referenceUnitId, wholeUnitId);
+        if (shoppingItem !== null) {
+            shoppingList.push(shoppingItem);
+        }
+    });
+    
+    subRecipeGroups.forEach((quantitiesByUnit, subRecipeId) => {
+        const subRecipe = compiled.recipes.get(subRecipeId);
+        if (!subRecipe) {
+            return;
+        }
+        quantitiesByUnit.forEach((quantity, unitId) => {
+            const unit = units.get(unitId);
+            shoppingList.push({
+                is_sub_recipe: true,
+                sub_recipe_id: subRecipeId,
+                sub_recipe_name: subRecipe.name,
+                quantity,
+                unit_id: unitId,
+                unit_name: unit ? unit.name : 'unit',
+                yield_quantity: subRecipe.yieldQuantity,
+                yield_unit_name: subRecipe.yieldUnitName,
+                size_qualifier: null,
+                preparation_notes: null,
+            });
+        });
+    });
+    
+    // Array.prototype.sort is stable, like Python's sort
+    return shoppingList.sort(compareShoppingListItems);
+}
+
+// Loadable with require() for the parity tests
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { compileBundle, bundleHasRecipes, computeShoppingList };
+}
@@ -4,7 +4,39 @@
 
 const API_BASE = '';
 
+// Most requests sent in one POST /api/batch (the server's limit)
+const BATCH_MAX_REQUESTS = 20;
+
+// GETs in flight by endpoint: identical requests share one fetch, and each
+// caller gets its own copy of the parsed body (see sharedResult())
+const inFlightGets = new Map();
+
+// Reads queued by batchedGet() in the current tick, by endpoint
+let pendingBatch = null;
+
 async function apiRequest(endpoint, options = {}) {
+    const method = (options.method || 'GET').toUpperCase();
+    // A cancellable request is not shared: aborting it must not fail other callers
+    if (method !== 'GET' || options.signal) {
+        return sendApiRequest(endpoint, options);
+    }
+    
+    if (!inFlightGets.has(endpoint)) {
+        const request = sendApiRequest(endpoint, options).finally(() => {
+            inFlightGets.delete(endpoint);
+        });
+        inFlightGets.set(endpoint, request);
+    }
+    return sharedResult(endpoint);
+}
+
+// A copy of the body of the GET in flight for endpoint, so that a caller
+// modifying its result cannot change what the other callers see
+function sharedResult(endpoint) {
+    return inFlightGets.get(endpoint).then(body => structuredClone(body));
+}
+
+async function sendApiRequest(endpoint, options = {}) {
     const url = `${API_BASE}${endpoint}`;
     const config = {
         headers: {
@@ -38,26 +70,149 @@ async function apiRequest(endpoint, options = {}) {
         const data = await response.json();
         return data;
     } catch (error) {
-        console.error('API request failed:', error);
+        // Cancelled requests (AbortController) are expected, not failures
+        if (error.name !== 'AbortError') {
+            console.error('API request failed:', error);
+        }
         throw error;
     }
 }
 
+/**
+ * GET a resource, batching it with the other reads made in the same tick into
+ * one POST /api/batch. Pages that need several resources then pay for one
+ * round trip, answered from one server-side connection and snapshot.
+ *
+ * Batching is skipped whenever a service worker controls the page: reads
+ * then go out one by one through apiRequest(), so the worker can answer
+ * the ones it caches (see STALE_WHILE_REVALIDATE_PATHS in
+ * service-worker.js) at once. The worker does not split a POST /api/batch
+ * into cached reads, so a batch would always wait for the network.
+ */
+function batchedGet(endpoint) {
+    if (inFlightGets.has(endpoint)) {
+        return sharedResult(endpoint);
+    }
+    if ('serviceWorker' in navigator && navigator.serviceWorker.controller) {
+        return apiRequest(endpoint);
+    }
+    
+    if (!pendingBatch) {
+        pendingBatch = new Map();
+        setTimeout(flushBatch, 0);
+    }
+    let resolve;
+    let reject;
+    const request = new Promise((res, rej) => {
+        resolve = res;
+        reject = rej;
+    }).finally(() => {
+        inFlightGets.delete(endpoint);
+    });
+    pendingBatch.set(endpoint, { resolve, reject });
+    inFlightGets.set(endpoint, request);
+    return sharedResult(endpoint);
+}
+
+function flushBatch() {
+    const batch = [...pendingBatch];
+    pendingBatch = null;
+    for (let start = 0; start < batch.length; start += BATCH_MAX_REQUESTS) {
+        sendBatch(batch.slice(start, start + BATCH_MAX_REQUESTS));
+    }
+}
+
+// Send [endpoint, { resolve, reject }] entries as one POST /api/batch
+async function sendBatch(entries) {
+    if (entries.length === 1) {
+        const [endpoint, { resolve, reject }] = entries[0];
+        sendApiRequest(endpoint).then(resolve, reject);
+        return;
+    }
+    
+    let responses;
+    try {
+        responses = (await sendApiRequest('/api/batch', {
+            method: 'POST',
+            body: { requests: entries.map(([endpoint]) => ({ path: endpoint })) },
+        })).responses;
+    } catch (error) {
+        // E.g. offline: plain GETs may still be answered from a cache
+        entries.forEach(([endpoint, { resolve, reject }]) => sendApiRequest(endpoint).then(resolve, reject));
+        return;
+    }
+    
+    entries.forEach(([endpoint, { resolve, reject }], i) => {
+        const { status, body } = responses[i];
+        if (status >= 200 && status < 300) {
+            resolve(body);
+        } else {
+            reject(new Error((body && body.error) || `HTTP error! status: ${status}`));
+        }
+    });
+}
+
+// One page of a list endpoint (keyset pagination). Resolves to { items, next }, where next is
+// the cursor to pass as `after` for the following page, or null on the last page.
+async function apiRequestPage(endpoint, { limit = 100, after = null, fields = null, ...params } = {}) {
+    const query = new URLSearchParams({ ...params, limit });
+    if (after) {
+        query.set('after', after);
+    }
+    if (fields) {
+        query.set('fields', fields.join(','));
+    }
+    
+    const response = await fetch(`${API_BASE}${endpoint}?${query}`);
+    if (!response.ok) {
+        let errorMessage = `HTTP error! status: ${response.status}`;
+        try {
+            errorMessage = (await response.json()).error || errorMessage;
+        } catch (e) {
+            errorMessage = response.statusText || errorMessage;
+        }
+        throw new Error(errorMessage);
+    }
+    
+    const link = response.headers.get('Link');
+    const match = link && link.match(/[?&]after=([^&>]+)/);
+    return {
+        items: await response.json(),
+        next: match ? decodeURIComponent(match[1]) : null,
+    };
+}
+
+// Reference data a page starts with, in one request and one consistent snapshot.
+// sections: any of 'ingredient_types', 'unit_types', 'ingredients', 'recipes' (default all)
+async function getBootstrap(sections = null) {
+    return apiRequest(sections ? `/api/bootstrap?include=${sections.join(',')}` : '/api/bootstrap');
+}
+
 // Ingredient Types
 async function getIngredientTypes() {
-    return apiRequest('/api/ingredient-types');
+    return batchedGet('/api/ingredient-types');
 }
 
 // Unit Types
 async function getUnitTypes(category = null) {
     const url = category ? `/api/unit-types?category=${category}` : '/api/unit-types';
-    return apiRequest(url);
+    return batchedGet(url);
 }
 
 // Ingredients
 async function getIngredients(typeId = null) {
     const url = typeId ? `/api/ingredients?type_id=${typeId}` : '/api/ingredients';
-    return apiRequest(url);
+    return batchedGet(url);
+}
+
+// Options: limit, after, fields (array), type_id
+async function getIngredientsPage(options = {}) {
+    return apiRequestPage('/api/ingredients', options);
+}
+
+async function getIngredientCount(typeId = null) {
+    const url = typeId ? `/api/ingredients?type_id=${typeId}&count=1` : '/api/ingredients?count=1';
+    return (await apiRequest(url)).count;
 }
 
 async function createIngredient(ingredient) {
@@ -67,9 +222,28 @@ async function createIngredient(ingredient) {
     });
 }
 
+// Store sections (ingredient ID -> section, sections in display order)
+async function getStoreSections() {
+    return batchedGet('/api/store-sections');
+}
+
 // Recipes
 async function getRecipes() {
-    return apiRequest('/api/recipes');
+    return batchedGet('/api/recipes');
+}
+
+// Ranked search-as-you-type by recipe or ingredient name (in-memory index on the server).
+// Pass an AbortSignal to cancel a search superseded by a newer one.
+async function searchRecipesAPI(query, excludeIds = [], limit = 20, signal = null) {
+    const params = new URLSearchParams({ q: query, limit });
+    if (excludeIds.length > 0) {
+        params.set('exclude', excludeIds.join(','));
+    }
+    return apiRequest(`/api/recipes/search?${params}`, signal ? { signal } : {});
+}
+
+async function getRecipesByIds(recipeIds) {
+    return apiRequest(`/api/recipes/search?ids=${recipeIds.join(',')}`);
 }
 
 async function getRecipe(recipeId) {
@@ -96,18 +270,35 @@ async function deleteRecipeAPI(recipeId) {
     });
 }
 
+// Compact snapshot of the data shopping lists are computed from (see aggregate.js)
+async function getBundleAPI() {
+    return apiRequest('/api/bundle');
+}
+
 // Shopping Lists
-async function generateShoppingListAPI(recipeSelections) {
-    const res = await apiRequest('/api/shopping-lists', {
+async function createShoppingListAPI(recipeSelections) {
+    return apiRequest('/api/shopping-lists', {
         method: 'POST',
         body: { recipe_selections: recipeSelections },
     });
+}
+
+async function generateShoppingListAPI(recipeSelections) {
+    const res = await createShoppingListAPI(recipeSelections);
     // Backend may return { id, shopping_list } – unwrap for callers expecting an array
     if (Array.isArray(res)) return res;
     if (res && Array.isArray(res.shopping_list)) return res.shopping_list;
     return res;
 }
 
+// Apply selection changes to a previous list: base is { token } or { list_id }
+async function updateShoppingListAPI(base, changes) {
+    return apiRequest('/api/shopping-lists/update', {
+        method: 'POST',
+        body: { ...base, changes },
+    });
+}
+
 async function getFormattedShoppingListText(recipeSelections, checkedItemIds = []) {
     return apiRequest('/api/shopping-list/formatted-text', {
         method: 'POST',
@@ -121,15 +312,28 @@ async function getFormattedShoppingListText(recipeSelections, checkedItemIds = [
 
 // Default Ingredients
 async function getDefaultIngredients() {
-    return apiRequest('/api/default-ingredients');
+    return batchedGet('/api/default-ingredients');
 }
 
 // Shopping list snapshots (audit history)
-async function getShoppingListSnapshots() {
-    return apiRequest('/api/shopping-lists');
+// Newest first, one page at a time; pass the last ID of a page to get the next one
+async function getShoppingListSnapshots(before = null) {
+    return apiRequest(before ? `/api/shopping-lists?before=${before}` : '/api/shopping-lists');
 }
 
 async function getShoppingListSnapshot(snapshotId) {
     return apiRequest(`/api/shopping-lists/${snapshotId}`);
 }
 
+
+// SMS (delivered in the background; poll the job for the outcome)
+async function sendSmsAPI(phoneNumber, text) {
+    return apiRequest('/api/sms', {
+        method: 'POST',
+        body: { phone_number: phoneNumber, text },
+    });
+}
+
+async function getSmsJobAPI(jobId) {
+    return apiRequest(`/api/sms/${jobId}`);
+}
@@ -10,6 +10,14 @@ let conversionRules = [];
 let sizeEstimationRules = [];
 let defaultIngredients = [];
 
+// Ingredients listed per page (keyset pagination), with only the columns the list shows
+const INGREDIENT_PAGE_SIZE = 200;
+const INGREDIENT_LIST_FIELDS = ['id', 'name', 'type_name', 'shopping_unit_name'];
+
+// Cursor of the next page of the list (null once every ingredient is shown) and the total count
+let nextIngredientsCursor = null;
+let ingredientCount = 0;
+
 // Initialize page
 async function initIngredientsPage() {
     try {
@@ -62,57 +70,103 @@ async function displayIngredients() {
     if (!container) return;
     
     try {
-        // Load ingredients fresh from API
-        const allIngredients = await getIngredients();
-        
-        if (allIngredients.length === 0) {
-            container.innerHTML = '<p>No ingredients found.</p>';
-            return;
-        }
-        
-        // Group by type
-        const grouped = {};
-        allIngredients.forEach(ing => {
-            const typeName = ing.type_name || 'Unknown';
-            if (!grouped[typeName]) {
-                grouped[typeName] = [];
-            }
-            grouped[typeName].push(ing);
+        // Load the first page fresh from the API
+        const [page, count] = await Promise.all([
+            getIngredientsPage({ limit: INGREDIENT_PAGE_SIZE, fields: INGREDIENT_LIST_FIELDS }),
+            getIngredientCount(),
+        ]);
+        ingredients = page.items;
+        nextIngredientsCursor = page.next;
+        ingredientCount = count;
+        renderIngredients(container);
+    } catch (error) {
+        container.innerHTML = `<p style="color: red;">Error loading ingredients: ${error.message}</p>`;
+    }
+}
+
+async function loadMoreIngredients() {
+    const container = document.getElementById('ingredients-list');
+    const button = document.getElementById('load-more-ingredients');
+    if (!container || !nextIngredientsCursor) return;
+    
+    if (button) {
+        button.disabled = true;
+    }
+    try {
+        const page = await getIngredientsPage({
+            limit: INGREDIENT_PAGE_SIZE,
+            after: nextIngredientsCursor,
+            fields: INGREDIENT_LIST_FIELDS,
         });
+        ingredients = ingredients.concat(page.items);
+        nextIngredientsCursor = page.next;
+        renderIngredients(container);
+    } catch (error) {
+        showError('Failed to load more ingredients: ' + error.message);
+        if (button) {
+            button.disabled = false;
+        }
+    }
+}
+
+// Render the loaded ingredients grouped by type, with a button for the next page
+function renderIngredients(container) {
+    if (ingredients.length === 0) {
+        container.innerHTML = '<p>No ingredients found.</p>';
+        return;
+    }
+    
+    // Group by type (pages arrive in name order, so each group stays sorted)
+    const grouped = {};
+    ingredients.forEach(ing => {
+        const typeName = ing.type_name || 'Unknown';
+        if (!grouped[typeName]) {
+            grouped[typeName] = [];
+        }
+        grouped[typeName].push(ing);
+    });
+    
+    container.innerHTML = '';
+    
+    Object.keys(grouped).sort().forEach(typeName => {
+        const typeSection = document.createElement('div');
+        typeSection.className = 'type-section';
         
-        container.innerHTML = '';
+        const heading = document.createElement('h4');
+        heading.textContent = typeName;
+        heading.style.marginTop = '1.5rem';
+        heading.style.marginBottom = '0.5rem';
+        heading.style.fontSize = '1.2rem';
+        typeSection.appendChild(heading);
         
-        Object.keys(grouped).sort().forEach(typeName => {
-            const typeSection = document.createElement('div');
-            typeSection.className = 'type-section';
-            
-            const heading = document.createElement('h4');
-            heading.textContent = typeName;
-            heading.style.marginTop = '1.5rem';
-            heading.style.marginBottom = '0.5rem';
-            heading.style.fontSize = '1.2rem';
-            typeSection.appendChild(heading);
-            
-            const list = document.createElement('ul');
-            list.style.listStyle = 'none';
-            list.style.padding = '0';
-            list.style.margin = '0';
-            grouped[typeName].forEach(ing => {
-                const li = document.createElement('li');
-                li.style.padding = '0.5rem 0';
-                li.style.borderBottom = '1px solid #eee';
-                li.innerHTML = `
-                    <strong>${ing.name}</strong> 
-                    <span class="shopping-unit" style="color: #666; margin-left: 0.5rem;">(Shopping unit: ${ing.shopping_unit_name})</span>
-                `;
-                list.appendChild(li);
-            });
-            
-            typeSection.appendChild(list);
-            container.appendChild(typeSection);
+        const list = document.createElement('ul');
+        list.style.listStyle = 'none';
+        list.style.padding = '0';
+        list.style.margin = '0';
+        grouped[typeName].forEach(ing => {
+            const li = document.createElement('li');
+            li.style.padding = '0.5rem 0';
+            li.style.borderBottom = '1px solid #eee';
+            li.innerHTML = `
+                <strong>${ing.name}</strong> 
+                <span class="shopping-unit" style="color: #666; margin-left: 0.5rem;">(Shopping unit: ${ing.shopping_unit_name})</span>
+            `;
+            list.appendChild(li);
         });
-    } catch (error) {
-        container.innerHTML = `<p style="color: red;">Error loading ingredients: ${error.message}</p>`;
+        
+        typeSection.appendChild(list);
+        container.appendChild(typeSection);
+    });
+    
+    if (nextIngredientsCursor) {
+        const more = document.createElement('p');
+        more.style.marginTop = '1rem';
+        more.innerHTML = `
+            <span style="color: #666;">Showing ${ingredients.length} of ${ingredientCount} ingredients</span>
+            <button type="button" id="load-more-ingredients" class="btn-secondary" style="margin-left: 0.5rem;">Load more</button>
+        `;
+        more.querySelector('button').addEventListener('click', loadMoreIngredients);
+        container.appendChild(more);
     }
 }
 
@@ -164,8 +218,7 @@ async function saveIngredient() {
         showSuccess('Ingredient created successfully!');
         
         // Reload ingredients
-        ingredients = await getIngredients();
-        displayIngredients();
+        await displayIngredients();
         
         // Reset form
         document.getElementById('ingredient-form').reset();
@@ -15,18 +15,11 @@ async function initRecipesPage() {
     try {
         console.log('Initializing recipes page...');
         
-        // Load data
-        console.log('Loading recipes...');
-        recipes = await getRecipes();
-        console.log(`Loaded ${recipes.length} recipes`);
-        
-        console.log('Loading ingredients...');
-        ingredients = await getIngredients();
-        console.log(`Loaded ${ingredients.length} ingredients`);
-        
-        console.log('Loading unit types...');
-        unitTypes = await getUnitTypes();
-        console.log(`Loaded ${unitTypes.length} unit types`);
+        // Load data (one request)
+        console.log('Loading recipes, ingredients and unit types...');
+        const data = await getBootstrap(['recipes', 'ingredients', 'unit_types']);
+        ({ recipes, ingredients, unit_types: unitTypes } = data);
+        console.log(`Loaded ${recipes.length} recipes, ${ingredients.length} ingredients and ${unitTypes.length} unit types`);
         
         // Filter sub-recipes
         subRecipes = recipes.filter(r => r.is_sub_recipe);
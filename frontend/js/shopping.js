@@ -2,18 +2,30 @@
  * Shopping List Generator Page Logic
  */
 
-let recipes = [];
 let selectedRecipes = [];
 let filteredRecipesForDropdown = [];
 let recipesWithIngredients = null; // Cache for recipes with ingredient data
+let dropdownSearchController = null; // Cancels the search superseded by a later keystroke
+let dropdownSearchTimer = null;
+let listBundle = null; // Compiled data bundle for computing lists locally (see aggregate.js)
+let listBundleLoading = null;
+let storeSections = null; // { sections: [{ key, label }], ingredients: { id: key } } from GET /api/store-sections
+let storeSectionsLoading = null;
+
+// Number of recipes shown in the search dropdown
+const RECIPE_DROPDOWN_LIMIT = 50;
+
+// Typing pause before searching, so fast typing sends one request
+const RECIPE_SEARCH_DEBOUNCE_MS = 150;
+
+// Headings of the groups after the store sections (the first matches the formatted text)
+const STORE_SECTION_SUB_RECIPES_LABEL = '🔄 SUB-RECIPES';
+const STORE_SECTION_OTHER_LABEL = 'OTHER';
 
 // Initialize page
 async function initShoppingPage() {
     try {
-        // Load recipes
-        recipes = await getRecipes();
-        
-        // Setup search dropdown
+        // Setup search dropdown (recipes are searched on the server as the user types)
         setupRecipeDropdown();
         
         // Display selected recipes
@@ -25,11 +37,133 @@ async function initShoppingPage() {
         // Load snapshots history
         loadSnapshots();
         
+        // Deliver shopping lists saved while offline
+        setupOfflineQueue();
+        
+        // Batch changes are previewed locally once the bundle is here
+        loadListBundle();
+        
+        // Lists are grouped by store section once the section map is here
+        loadStoreSections();
+        
     } catch (error) {
         showError('Failed to load recipes: ' + error.message);
     }
 }
 
+function setupOfflineQueue() {
+    if (!('serviceWorker' in navigator)) return;
+    
+    // The service worker reports shopping lists it queued offline and has now saved
+    navigator.serviceWorker.addEventListener('message', event => {
+        if (event.data && event.data.type === 'queue-replayed') {
+            showSuccess(`Saved ${event.data.delivered} shopping list(s) made while offline`);
+            loadSnapshots();
+        }
+    });
+    
+    window.addEventListener('online', () => {
+        if (navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage({ type: 'replay-queue' });
+        }
+    });
+}
+
+function loadListBundle() {
+    if (!listBundleLoading) {
+        listBundleLoading = getBundleAPI()
+            .then(bundle => {
+                listBundle = compileBundle(bundle);
+            })
+            .catch(error => console.warn('Shopping list bundle unavailable:', error))
+            .finally(() => {
+                listBundleLoading = null;
+            });
+    }
+    return listBundleLoading;
+}
+
+function loadStoreSections() {
+    if (!storeSectionsLoading) {
+        storeSectionsLoading = getStoreSections()
+            .then(data => {
+                storeSections = data;
+            })
+            .catch(error => console.warn('Store sections unavailable:', error))
+            .finally(() => {
+                storeSectionsLoading = null;
+            });
+    }
+    return storeSectionsLoading;
+}
+
+// Split a list into [{ label, items }] groups: store sections in display order, then
+// sub-recipes, then ingredients without a known section. One unlabelled group until
+// the section map is loaded.
+function groupByStoreSection(shoppingList) {
+    if (!storeSections) {
+        return [{ label: null, items: shoppingList }];
+    }
+    
+    const groups = new Map(storeSections.sections.map(section => [section.key, { label: section.label, items: [] }]));
+    const subRecipes = { label: STORE_SECTION_SUB_RECIPES_LABEL, items: [] };
+    const other = { label: STORE_SECTION_OTHER_LABEL, items: [] };
+    let unknownIngredients = false;
+    shoppingList.forEach(item => {
+        if (item.is_sub_recipe) {
+            subRecipes.items.push(item);
+            return;
+        }
+        const group = groups.get(storeSections.ingredients[item.ingredient_id]);
+        if (group) {
+            group.items.push(item);
+        } else {
+            other.items.push(item);
+            unknownIngredients = true;
+        }
+    });
+    if (unknownIngredients) {
+        // Ingredient added since the map was loaded; the next display has its section
+        loadStoreSections();
+    }
+    return [...groups.values(), subRecipes, other].filter(group => group.items.length > 0);
+}
+
+// Recompute the shown list from the bundle after a selection change, without a round trip.
+// The preview is not saved: Generate sends the selections to the server, whose list replaces it.
+function previewShoppingList() {
+    if (!currentShoppingList || !listBundle || selectedRecipes.length === 0) return;
+    
+    const recipeSelections = selectedRecipes.map(r => ({
+        recipe_id: r.recipe_id,
+        batches: r.batches || 1
+    }));
+    if (!bundleHasRecipes(listBundle, recipeSelections)) {
+        // Recipe created since the bundle was loaded; the next change is previewed
+        loadListBundle();
+        return;
+    }
+    
+    const shoppingList = computeShoppingList(listBundle, recipeSelections);
+    currentShoppingList = shoppingList;
+    displayShoppingList(shoppingList);
+    
+    const container = document.getElementById('shopping-list');
+    if (container) {
+        container.insertAdjacentHTML('afterbegin',
+            '<p class="preview-note">Preview: click "Generate Shopping List" to save this list.</p>');
+    }
+    // The formatted text is built by the server for saved lists
+    const textarea = document.getElementById('formatted-text');
+    const copyBtn = document.getElementById('copy-text-btn');
+    if (textarea) {
+        textarea.value = '';
+    }
+    if (copyBtn) {
+        copyBtn.disabled = true;
+    }
+}
+
 function setupRecipeDropdown() {
     const searchInput = document.getElementById('recipe-search');
     const dropdown = document.getElementById('recipe-dropdown');
@@ -62,13 +196,16 @@ function setupRecipeDropdown() {
             }
         }
         
-        // Don't await - let it run async
-        filterAndShowDropdown().catch(error => {
-            console.error('Error in filterAndShowDropdown:', error);
-            if (dropdown) {
-                dropdown.innerHTML = '<div style="padding: 12px; color: red;">Error searching recipes</div>';
-            }
-        });
+        // Search once typing pauses - let it run async
+        clearTimeout(dropdownSearchTimer);
+        dropdownSearchTimer = setTimeout(() => {
+            filterAndShowDropdown().catch(error => {
+                console.error('Error in filterAndShowDropdown:', error);
+                if (dropdown) {
+                    dropdown.innerHTML = '<div style="padding: 12px; color: red;">Error searching recipes</div>';
+                }
+            });
+        }, RECIPE_SEARCH_DEBOUNCE_MS);
     });
     
     // Hide dropdown when clicking outside
@@ -92,59 +229,30 @@ async function filterAndShowDropdown() {
     
     const query = searchInput.value.trim();
     
-    // If empty query, show all unselected recipes
-    if (query === '') {
-        filteredRecipesForDropdown = recipes.filter(r => !selectedRecipes.find(sr => sr.recipe_id === r.id));
-        displayDropdownItems();
-        return;
+    // Cancel the previous search: its results would be replaced anyway
+    if (dropdownSearchController) {
+        dropdownSearchController.abort();
     }
+    const controller = new AbortController();
+    dropdownSearchController = controller;
     
-    const queryLower = query.toLowerCase();
-    
-    // Search by recipe name (fast, local)
-    let nameMatches = recipes.filter(recipe => 
-        recipe.name.toLowerCase().includes(queryLower) &&
-        !selectedRecipes.find(sr => sr.recipe_id === recipe.id)
-    );
-    
-    // Always search by ingredients via API (in addition to name search)
-    let ingredientMatches = [];
+    // One ranked request matches both recipe names and ingredient names; an empty
+    // query lists recipes alphabetically
+    const selectedIds = selectedRecipes.map(sr => sr.recipe_id);
+    let results;
     try {
-        const params = new URLSearchParams();
-        params.append('ingredients', query);
-        const url = `/api/recipes?${params.toString()}`;
-        
-        const apiResults = await apiRequest(url);
-        
-        if (apiResults && Array.isArray(apiResults)) {
-            // Filter out already selected recipes
-            ingredientMatches = apiResults.filter(recipe => 
-                !selectedRecipes.find(sr => sr.recipe_id === recipe.id)
-            );
-        }
+        results = await searchRecipesAPI(query, selectedIds, RECIPE_DROPDOWN_LIMIT, controller.signal);
     } catch (error) {
-        console.error('Error searching by ingredients:', error);
-        // Continue with just name matches if ingredient search fails
-    }
-    
-    // Combine results, removing duplicates (by recipe ID)
-    const combinedMatches = new Map();
-    
-    // Add name matches first
-    nameMatches.forEach(recipe => {
-        combinedMatches.set(recipe.id, recipe);
-    });
-    
-    // Add ingredient matches (won't duplicate if already in name matches)
-    ingredientMatches.forEach(recipe => {
-        if (!combinedMatches.has(recipe.id)) {
-            combinedMatches.set(recipe.id, recipe);
+        if (error.name === 'AbortError') {
+            return;
         }
-    });
-    
-    // Convert map to array
-    filteredRecipesForDropdown = Array.from(combinedMatches.values());
+        throw error;
+    }
+    if (controller !== dropdownSearchController) {
+        return;
+    }
     
+    filteredRecipesForDropdown = results;
     displayDropdownItems();
 }
 
@@ -199,11 +307,13 @@ function addRecipe(recipe) {
     });
     
     displaySelectedRecipes();
+    previewShoppingList();
 }
 
 function removeRecipe(recipeId) {
     selectedRecipes = selectedRecipes.filter(r => r.recipe_id !== recipeId);
     displaySelectedRecipes();
+    previewShoppingList();
     // Refresh dropdown to show removed recipe
     filterAndShowDropdown();
 }
@@ -217,21 +327,26 @@ function updateBatches(recipeId, batches) {
         } else {
             selection.batches = batchesNum;
         }
+        previewShoppingList();
     }
 }
 
-async function loadSnapshots() {
+async function loadSnapshots(before = null) {
     const container = document.getElementById('snapshots-container');
     if (!container) return;
     try {
-        const snapshots = await getShoppingListSnapshots();
-        if (!snapshots || snapshots.length === 0) {
+        const snapshots = await getShoppingListSnapshots(before);
+        if (!before && (!snapshots || snapshots.length === 0)) {
             container.innerHTML = '<p style="color: #666;">No snapshots yet.</p>';
             return;
         }
-        const list = document.createElement('ul');
-        list.style.listStyle = 'none';
-        list.style.padding = '0';
+        // Older pages are appended to the list already shown
+        let list = before ? container.querySelector('ul') : null;
+        if (!list) {
+            list = document.createElement('ul');
+            list.style.listStyle = 'none';
+            list.style.padding = '0';
+        }
         snapshots.forEach(s => {
             const li = document.createElement('li');
             li.style.display = 'flex';
@@ -249,8 +364,20 @@ async function loadSnapshots() {
             li.appendChild(btn);
             list.appendChild(li);
         });
-        container.innerHTML = '';
-        container.appendChild(list);
+        if (!before) {
+            container.innerHTML = '';
+            container.appendChild(list);
+        }
+        
+        const olderBtn = container.querySelector('.snapshots-older-btn');
+        if (olderBtn) olderBtn.remove();
+        if (snapshots.length > 0 && snapshots.length >= SNAPSHOT_PAGE_SIZE) {
+            const btn = document.createElement('button');
+            btn.className = 'btn-secondary snapshots-older-btn';
+            btn.textContent = 'Show older';
+            btn.onclick = () => loadSnapshots(snapshots[snapshots.length - 1].id);
+            container.appendChild(btn);
+        }
     } catch (e) {
         container.innerHTML = '<p style="color: red;">Failed to load history.</p>';
     }
@@ -265,8 +392,10 @@ async function viewSnapshot(id) {
             selectedRecipes = [];
             
             // Match recipe selections with full recipe data
+            const snapshotRecipes = await getRecipesByIds(snap.recipe_selections.map(s => s.recipe_id));
+            const recipesById = new Map(snapshotRecipes.map(r => [r.id, r]));
             for (const selection of snap.recipe_selections) {
-                const recipe = recipes.find(r => r.id === selection.recipe_id);
+                const recipe = recipesById.get(selection.recipe_id);
                 if (recipe) {
                     selectedRecipes.push({
                         recipe_id: recipe.id,
@@ -283,6 +412,11 @@ async function viewSnapshot(id) {
             displaySelectedRecipes();
         }
         
+        // Later changes can update this snapshot instead of regenerating
+        shoppingListBase = Array.isArray(snap.recipe_selections)
+            ? { base: { list_id: id }, selections: snap.recipe_selections.map(s => ({ recipe_id: s.recipe_id, batches: s.batches || 1 })) }
+            : null;
+        
         // Replace current list with snapshot data for review
         currentShoppingList = snap.shopping_list;
         displayShoppingList(snap.shopping_list);
@@ -309,9 +443,6 @@ function displaySelectedRecipes() {
     container.innerHTML = '';
     
     selectedRecipes.forEach(selection => {
-        const recipe = recipes.find(r => r.id === selection.recipe_id);
-        if (!recipe) return;
-        
         const recipeDiv = document.createElement('div');
         recipeDiv.className = 'selected-recipe-item';
         recipeDiv.id = `selected-recipe-${selection.recipe_id}`;
@@ -340,6 +471,8 @@ function displaySelectedRecipes() {
 }
 
 let currentShoppingList = null; // Store current shopping list
+const SNAPSHOT_PAGE_SIZE = 50; // Default page size of GET /api/shopping-lists
+let shoppingListBase = null; // { base: { token } or { list_id }, selections } of the last generated list
 let checkedItems = new Set(); // Track which items are checked (using item IDs)
 
 function setupHandlers() {
@@ -380,8 +513,14 @@ async function generateShoppingList() {
             batches: r.batches || 1
         }));
         
-        // Call API to generate shopping list
-        const shoppingList = await generateShoppingListAPI(recipeSelections);
+        // Update the previous list with just the changed recipes when possible
+        const result = await generateOrUpdateShoppingList(recipeSelections);
+        if (result && result.queued) {
+            // Offline: the service worker saves the list when the connection returns
+            showSuccess("You're offline. The shopping list will be generated and saved when the connection returns.");
+            return;
+        }
+        const shoppingList = result && result.shopping_list;
         
         if (!shoppingList || !Array.isArray(shoppingList)) {
             throw new Error('Invalid response from server');
@@ -407,6 +546,51 @@ async function generateShoppingList() {
     }
 }
 
+/**
+ * Changes turning the previous selections into the current ones, or null if
+ * the recipe order differs (the server appends added recipes at the end).
+ */
+function selectionChanges(previous, current) {
+    const previousBatches = new Map(previous.map(s => [s.recipe_id, s.batches]));
+    const currentIds = new Set(current.map(s => s.recipe_id));
+    const kept = previous.filter(s => currentIds.has(s.recipe_id));
+    if (previousBatches.size !== previous.length ||
+        kept.some((s, i) => current[i].recipe_id !== s.recipe_id)) {
+        return null;
+    }
+    
+    const changes = previous
+        .filter(s => !currentIds.has(s.recipe_id))
+        .map(s => ({ recipe_id: s.recipe_id, remove: true }));
+    current.forEach(s => {
+        if (previousBatches.get(s.recipe_id) !== s.batches) {
+            changes.push({ recipe_id: s.recipe_id, batches: s.batches });
+        }
+    });
+    return changes;
+}
+
+async function generateOrUpdateShoppingList(recipeSelections) {
+    const changes = shoppingListBase && selectionChanges(shoppingListBase.selections, recipeSelections);
+    let result = null;
+    if (changes) {
+        try {
+            result = await updateShoppingListAPI(shoppingListBase.base, changes);
+        } catch (error) {
+            // Expired token or snapshot gone: fall back to a full generation
+            result = null;
+        }
+    }
+    
+    if (result) {
+        shoppingListBase = { base: { token: result.token }, selections: recipeSelections };
+    } else {
+        result = await createShoppingListAPI(recipeSelections);
+        shoppingListBase = result && result.id ? { base: { list_id: result.id }, selections: recipeSelections } : null;
+    }
+    return result;
+}
+
 function getItemId(item) {
     // Generate a unique ID for each item
     if (item.is_sub_recipe) {
@@ -467,145 +651,156 @@ function displayShoppingList(shoppingList) {
         checkedItems.clear();
     }
     
-    // Create the list without duplicate heading (heading already exists in HTML)
-    container.innerHTML = '<ul class="shopping-list-items"></ul>';
-    const list = container.querySelector('.shopping-list-items');
-    
-    shoppingList.forEach(item => {
-        const li = document.createElement('li');
-        li.className = 'shopping-list-item';
-        
-        const itemId = getItemId(item);
-        const isChecked = checkedItems.has(itemId);
-        if (isChecked) {
-            li.classList.add('checked-item');
+    // One list per store section, as in the formatted text (the page heading is in the HTML)
+    container.innerHTML = '';
+    groupByStoreSection(shoppingList).forEach(({ label, items }) => {
+        if (label) {
+            const heading = document.createElement('h4');
+            heading.className = 'store-section-heading';
+            heading.textContent = label;
+            container.appendChild(heading);
+        }
+        const list = document.createElement('ul');
+        list.className = 'shopping-list-items';
+        items.forEach(item => list.appendChild(createShoppingListItem(item)));
+        container.appendChild(list);
+    });
+}
+
+function createShoppingListItem(item) {
+    const li = document.createElement('li');
+    li.className = 'shopping-list-item';
+    
+    const itemId = getItemId(item);
+    const isChecked = checkedItems.has(itemId);
+    if (isChecked) {
+        li.classList.add('checked-item');
+    }
+    
+    // Create checkbox
+    const checkbox = document.createElement('input');
+    checkbox.type = 'checkbox';
+    checkbox.className = 'item-checkbox';
+    checkbox.checked = isChecked;
+    checkbox.setAttribute('data-item-id', itemId);
+    checkbox.addEventListener('change', () => toggleItemChecked(itemId));
+    
+    // Create label wrapper for checkbox and text
+    const label = document.createElement('label');
+    label.className = 'shopping-item-label';
+    label.appendChild(checkbox);
+    
+    // Check if this is a sub-recipe
+    if (item.is_sub_recipe) {
+        // Handle sub-recipe display
+        const quantity = item.quantity || 0;
+        const subRecipeName = item.sub_recipe_name || 'Unknown Recipe';
+        const yieldQuantity = item.yield_quantity || 0;
+        const yieldUnitName = item.yield_unit_name || '';
+        
+        // For sub-recipes, display the amount in the unit requested by the recipe
+        // Keep the yield info in parentheses for context
+        const displayUnitName = item.unit_name || '';
+        
+        // Build sub-recipe text
+        let itemText = `${quantity} ${displayUnitName} ${subRecipeName}`;
+        
+        // Add yield info if available
+        if (yieldQuantity && yieldUnitName) {
+            itemText += ` (yields ${yieldQuantity} ${yieldUnitName})`;
         }
         
-        // Create checkbox
-        const checkbox = document.createElement('input');
-        checkbox.type = 'checkbox';
-        checkbox.className = 'item-checkbox';
-        checkbox.checked = isChecked;
-        checkbox.setAttribute('data-item-id', itemId);
-        checkbox.addEventListener('change', () => toggleItemChecked(itemId));
-        
-        // Create label wrapper for checkbox and text
-        const label = document.createElement('label');
-        label.className = 'shopping-item-label';
-        label.appendChild(checkbox);
+        // Add sub-recipe badge
+        const subRecipeBadge = document.createElement('span');
+        subRecipeBadge.className = 'badge';
+        subRecipeBadge.textContent = 'Sub-Recipe';
         
-        // Check if this is a sub-recipe
-        if (item.is_sub_recipe) {
-            // Handle sub-recipe display
-            const quantity = item.quantity || 0;
-            const subRecipeName = item.sub_recipe_name || 'Unknown Recipe';
-            const yieldQuantity = item.yield_quantity || 0;
-            const yieldUnitName = item.yield_unit_name || '';
-            
-            // For sub-recipes, display the amount in the unit requested by the recipe
-            // Keep the yield info in parentheses for context
-            const displayUnitName = item.unit_name || '';
-            
-            // Build sub-recipe text
-            let itemText = `${quantity} ${displayUnitName} ${subRecipeName}`;
+        const textSpan = document.createElement('span');
+        textSpan.innerHTML = subRecipeBadge.outerHTML + ' ' + itemText;
+        label.appendChild(textSpan);
+        li.appendChild(label);
+    } else {
+        // Handle regular ingredient display
+        const quantity = item.quantity || 0;
+        const unitName = item.unit_name || '';
+        const ingredientName = item.ingredient_name || 'Unknown';
+        const sizeQualifier = item.size_qualifier;
+        
+        // Check if this is a container/package unit (bottle, package, can, jar, etc.)
+        const containerUnits = ['package', 'can', 'bottle', 'jar', 'container'];
+        const isContainerUnit = containerUnits.includes(unitName.toLowerCase());
+        
+        // For packaged/container ingredients with recipe_volume or recipe_weight,
+        // show only the needed amount, not the package count
+        // Check if recipe_volume/recipe_weight exist and are not null/undefined
+        const hasRecipeVolume = item.recipe_volume !== null && item.recipe_volume !== undefined && item.recipe_volume > 0;
+        const hasRecipeWeight = item.recipe_weight !== null && item.recipe_weight !== undefined && item.recipe_weight > 0;
+        
+        if (isContainerUnit && (hasRecipeVolume || hasRecipeWeight)) {
+            const details = [];
             
-            // Add yield info if available
-            if (yieldQuantity && yieldUnitName) {
-                itemText += ` (yields ${yieldQuantity} ${yieldUnitName})`;
+            if (hasRecipeVolume) {
+                const vol = parseFloat(item.recipe_volume);
+                // For fluid ounces: if less than 1 oz, show 2 decimals; otherwise show 1 decimal
+                const volFormatted = vol < 1 ? vol.toFixed(2) : vol.toFixed(1);
+                details.push(`${volFormatted} ${item.recipe_volume_unit || 'fl oz'}`);
             }
             
-            // Add sub-recipe badge
-            const subRecipeBadge = document.createElement('span');
-            subRecipeBadge.className = 'badge';
-            subRecipeBadge.textContent = 'Sub-Recipe';
+            if (hasRecipeWeight) {
+                const wt = parseFloat(item.recipe_weight);
+                // For weights less than 1g, show 2 decimal places; otherwise show 1 decimal place
+                const wtFormatted = wt < 1 ? wt.toFixed(2) : wt.toFixed(1);
+                details.push(`${wtFormatted} ${item.recipe_weight_unit || 'g'}`);
+            }
             
-            const textSpan = document.createElement('span');
-            textSpan.innerHTML = subRecipeBadge.outerHTML + ' ' + itemText;
-            label.appendChild(textSpan);
-            li.appendChild(label);
+            if (details.length > 0) {
+                // Show only the need amount for container ingredients
+                let itemText = `${ingredientName} (need: ${details.join(', ')})`;
+                const textSpan = document.createElement('span');
+                textSpan.textContent = itemText;
+                label.appendChild(textSpan);
+            } else {
+                // Fallback if no details available
+                const textSpan = document.createElement('span');
+                textSpan.textContent = `${quantity} ${unitName} ${ingredientName}`;
+                label.appendChild(textSpan);
+            }
         } else {
-            // Handle regular ingredient display
-            const quantity = item.quantity || 0;
-            const unitName = item.unit_name || '';
-            const ingredientName = item.ingredient_name || 'Unknown';
-            const sizeQualifier = item.size_qualifier;
-            
-            // Check if this is a container/package unit (bottle, package, can, jar, etc.)
-            const containerUnits = ['package', 'can', 'bottle', 'jar', 'container'];
-            const isContainerUnit = containerUnits.includes(unitName.toLowerCase());
-            
-            // For packaged/container ingredients with recipe_volume or recipe_weight,
-            // show only the needed amount, not the package count
-            // Check if recipe_volume/recipe_weight exist and are not null/undefined
-            const hasRecipeVolume = item.recipe_volume !== null && item.recipe_volume !== undefined && item.recipe_volume > 0;
-            const hasRecipeWeight = item.recipe_weight !== null && item.recipe_weight !== undefined && item.recipe_weight > 0;
+            // For non-container ingredients, show quantity and unit as normal
+            let itemText = `${quantity} ${unitName} ${ingredientName}`;
+            if (sizeQualifier) {
+                itemText = `${quantity} ${sizeQualifier} ${unitName} ${ingredientName}`;
+            }
             
-            if (isContainerUnit && (hasRecipeVolume || hasRecipeWeight)) {
+            // For non-container ingredients, still show need amount if available
+            if (item.recipe_volume || item.recipe_weight) {
                 const details = [];
                 
-                if (hasRecipeVolume) {
+                if (item.recipe_volume) {
                     const vol = parseFloat(item.recipe_volume);
-                    // For fluid ounces: if less than 1 oz, show 2 decimals; otherwise show 1 decimal
                     const volFormatted = vol < 1 ? vol.toFixed(2) : vol.toFixed(1);
                     details.push(`${volFormatted} ${item.recipe_volume_unit || 'fl oz'}`);
                 }
                 
-                if (hasRecipeWeight) {
+                if (item.recipe_weight) {
                     const wt = parseFloat(item.recipe_weight);
-                    // For weights less than 1g, show 2 decimal places; otherwise show 1 decimal place
                     const wtFormatted = wt < 1 ? wt.toFixed(2) : wt.toFixed(1);
                     details.push(`${wtFormatted} ${item.recipe_weight_unit || 'g'}`);
                 }
                 
                 if (details.length > 0) {
-                    // Show only the need amount for container ingredients
-                    let itemText = `${ingredientName} (need: ${details.join(', ')})`;
-                    const textSpan = document.createElement('span');
-                    textSpan.textContent = itemText;
-                    label.appendChild(textSpan);
-                } else {
-                    // Fallback if no details available
-                    const textSpan = document.createElement('span');
-                    textSpan.textContent = `${quantity} ${unitName} ${ingredientName}`;
-                    label.appendChild(textSpan);
+                    itemText += ` (need: ${details.join(', ')})`;
                 }
-            } else {
-                // For non-container ingredients, show quantity and unit as normal
-                let itemText = `${quantity} ${unitName} ${ingredientName}`;
-                if (sizeQualifier) {
-                    itemText = `${quantity} ${sizeQualifier} ${unitName} ${ingredientName}`;
-                }
-                
-                // For non-container ingredients, still show need amount if available
-                if (item.recipe_volume || item.recipe_weight) {
-                    const details = [];
-                    
-                    if (item.recipe_volume) {
-                        const vol = parseFloat(item.recipe_volume);
-                        const volFormatted = vol < 1 ? vol.toFixed(2) : vol.toFixed(1);
-                        details.push(`${volFormatted} ${item.recipe_volume_unit || 'fl oz'}`);
-                    }
-                    
-                    if (item.recipe_weight) {
-                        const wt = parseFloat(item.recipe_weight);
-                        const wtFormatted = wt < 1 ? wt.toFixed(2) : wt.toFixed(1);
-                        details.push(`${wtFormatted} ${item.recipe_weight_unit || 'g'}`);
-                    }
-                    
-                    if (details.length > 0) {
-                        itemText += ` (need: ${details.join(', ')})`;
-                    }
-                }
-                
-                const textSpan = document.createElement('span');
-                textSpan.textContent = itemText;
-                label.appendChild(textSpan);
             }
+            
+            const textSpan = document.createElement('span');
+            textSpan.textContent = itemText;
+            label.appendChild(textSpan);
         }
-        
-        li.appendChild(label);
-        list.appendChild(li);
-    });
+    }
+    
+    li.appendChild(label);
+    return li;
 }
 
 function clearShoppingList() {
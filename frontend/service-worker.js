@@ -1,52 +1,262 @@
 // Service Worker for ShopList PWA
-const CACHE_NAME = 'recipe-kit-v1';
+//
+// - Static files are precached under a cache named after a hash of their
+//   contents (the server fills in ASSET_VERSION), so any change to a file
+//   installs a new worker with a fresh cache and old caches are evicted.
+// - Ingredient, unit and recipe lists, the page bootstrap data and the
+//   shopping list data bundle are served stale-while-revalidate: the cached
+//   copy answers at once and is refreshed in the background (the server's
+//   ETags make an unchanged refresh a cheap 304).
+// - Shopping list POSTs made while offline are queued in IndexedDB and
+//   replayed in order when the connection returns.
+
+// Replaced by the server with a hash of the frontend files (see backend/assets.py)
+const ASSET_VERSION = '__ASSET_VERSION__';
+
+const CACHE_PREFIX = 'recipe-kit-';
+const STATIC_CACHE = `${CACHE_PREFIX}static-${ASSET_VERSION}`;
+const API_CACHE = `${CACHE_PREFIX}api-v1`;
+
 const urlsToCache = [
   '/',
+  '/index.html',
   '/ingredients.html',
   '/recipes.html',
   '/shopping.html',
+  '/manifest.json',
   '/css/style.css',
+  '/js/aggregate.js',
   '/js/api.js',
   '/js/ingredients.js',
   '/js/recipes.js',
   '/js/shopping.js'
 ];
 
+// GET endpoints served stale-while-revalidate (exact paths; any query string)
+const STALE_WHILE_REVALIDATE_PATHS = [
+  '/api/ingredients', '/api/unit-types', '/api/recipes', '/api/bundle', '/api/bootstrap'
+];
+
+// POST endpoints queued while offline. Incremental updates (/api/shopping-lists/update)
+// are not queued: their tokens are single-use and held in server memory.
+const QUEUED_POST_PATHS = ['/api/shopping-lists'];
+
+// POST endpoints that only read, so cached API data stays valid
+const READ_ONLY_POST_PATHS = ['/api/batch'];
+
+const QUEUE_DB_NAME = 'recipe-kit-sw';
+const QUEUE_STORE = 'outbox';
+const REPLAY_SYNC_TAG = 'replay-shopping-lists';
+
 // Install event - cache resources
 self.addEventListener('install', (event) => {
   event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then((cache) => {
-        console.log('Opened cache');
-        return cache.addAll(urlsToCache);
-      })
+    caches.open(STATIC_CACHE)
+      .then((cache) => cache.addAll(urlsToCache.map((url) => new Request(url, { cache: 'reload' }))))
+      .then(() => self.skipWaiting())
   );
 });
 
-// Fetch event - serve from cache, fallback to network
-self.addEventListener('fetch', (event) => {
-  event.respondWith(
-    caches.match(event.request)
-      .then((response) => {
-        // Return cached version or fetch from network
-        return response || fetch(event.request);
-      })
-  );
-});
-
-// Activate event - clean up old caches
+// Activate event - evict caches of previous versions, replay queued requests
 self.addEventListener('activate', (event) => {
   event.waitUntil(
-    caches.keys().then((cacheNames) => {
-      return Promise.all(
-        cacheNames.map((cacheName) => {
-          if (cacheName !== CACHE_NAME) {
+    caches.keys()
+      .then((cacheNames) => Promise.all(
+        cacheNames
+          .filter((cacheName) => cacheName !== STATIC_CACHE && cacheName !== API_CACHE)
+          .map((cacheName) => {
             console.log('Deleting old cache:', cacheName);
             return caches.delete(cacheName);
-          }
-        })
-      );
-    })
+          })
+      ))
+      .then(() => self.clients.claim())
+      .then(() => replayQueue().catch(() => {}))
   );
 });
 
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.method === 'POST' && QUEUED_POST_PATHS.includes(url.pathname)) {
+    event.respondWith(postOrQueue(request));
+    return;
+  }
+  if (request.method !== 'GET') {
+    if (url.pathname.startsWith('/api/') && !READ_ONLY_POST_PATHS.includes(url.pathname)) {
+      event.respondWith(fetchAndInvalidate(request));
+    }
+    return;
+  }
+
+  if (STALE_WHILE_REVALIDATE_PATHS.includes(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(event));
+    return;
+  }
+  if (url.pathname.startsWith('/api/')) {
+    // Other API data (shopping lists, search results) is always fetched
+    return;
+  }
+
+  event.respondWith(cacheFirst(request));
+});
+
+// Background Sync (where supported) and pages coming back online trigger a replay
+self.addEventListener('sync', (event) => {
+  if (event.tag === REPLAY_SYNC_TAG) {
+    event.waitUntil(replayQueue());
+  }
+});
+
+self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'replay-queue') {
+    event.waitUntil(replayQueue());
+  }
+});
+
+// Static files: cache first, network for anything not precached
+async function cacheFirst(request) {
+  const cached = await caches.match(request, { cacheName: STATIC_CACHE });
+  if (cached) {
+    return cached;
+  }
+  try {
+    return await fetch(request);
+  } catch (error) {
+    // Offline navigation to a page with a query string: serve the page itself
+    if (request.mode === 'navigate') {
+      const page = await caches.match(new URL(request.url).pathname, { cacheName: STATIC_CACHE });
+      if (page) {
+        return page;
+      }
+    }
+    throw error;
+  }
+}
+
+async function staleWhileRevalidate(event) {
+  const cache = await caches.open(API_CACHE);
+  const cached = await cache.match(event.request);
+  const refresh = fetch(event.request)
+    .then((response) => {
+      if (response.ok) {
+        return cache.put(event.request, response.clone()).then(() => response);
+      }
+      return response;
+    });
+
+  if (cached) {
+    // Keep the worker alive until the cache is refreshed; offline, the stale copy stands
+    event.waitUntil(refresh.catch(() => {}));
+    return cached;
+  }
+  return refresh;
+}
+
+// Writes make cached API data stale: drop it so the next read goes to the server
+async function fetchAndInvalidate(request) {
+  const response = await fetch(request);
+  if (response.ok) {
+    await caches.delete(API_CACHE);
+  }
+  return response;
+}
+
+async function postOrQueue(request) {
+  const body = await request.clone().text();
+  try {
+    const response = await fetch(request);
+    // Online again: deliver anything queued earlier
+    replayQueue().catch(() => {});
+    return response;
+  } catch (error) {
+    const id = await enqueueRequest({
+      url: request.url,
+      contentType: request.headers.get('Content-Type') || 'application/json',
+      body,
+      queuedAt: Date.now()
+    });
+    if (self.registration.sync) {
+      self.registration.sync.register(REPLAY_SYNC_TAG).catch(() => {});
+    }
+    return new Response(JSON.stringify({ queued: true, queue_id: id }), {
+      status: 202,
+      headers: { 'Content-Type': 'application/json' }
+    });
+  }
+}
+
+// IndexedDB outbox of requests made while offline
+
+function openQueue() {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open(QUEUE_DB_NAME, 1);
+    open.onupgradeneeded = () => {
+      open.result.createObjectStore(QUEUE_STORE, { keyPath: 'id', autoIncrement: true });
+    };
+    open.onsuccess = () => resolve(open.result);
+    open.onerror = () => reject(open.error);
+  });
+}
+
+async function queueTransaction(mode, operation) {
+  const db = await openQueue();
+  try {
+    return await new Promise((resolve, reject) => {
+      const transaction = db.transaction(QUEUE_STORE, mode);
+      const request = operation(transaction.objectStore(QUEUE_STORE));
+      transaction.oncomplete = () => resolve(request.result);
+      transaction.onerror = () => reject(transaction.error);
+    });
+  } finally {
+    db.close();
+  }
+}
+
+function enqueueRequest(entry) {
+  return queueTransaction('readwrite', (store) => store.add(entry));
+}
+
+let replaying = null;
+
+// Send queued requests oldest first; stop at the first network failure
+function replayQueue() {
+  if (!replaying) {
+    replaying = replayQueuedRequests().finally(() => {
+      replaying = null;
+    });
+  }
+  return replaying;
+}
+
+async function replayQueuedRequests() {
+  const entries = await queueTransaction('readonly', (store) => store.getAll());
+  let delivered = 0;
+  for (const entry of entries) {
+    let response;
+    try {
+      response = await fetch(entry.url, {
+        method: 'POST',
+        headers: { 'Content-Type': entry.contentType },
+        body: entry.body
+      });
+    } catch (error) {
+      break;
+    }
+    // Client errors will never succeed; drop them like delivered requests
+    if (response.ok || (response.status >= 400 && response.status < 500)) {
+      await queueTransaction('readwrite', (store) => store.delete(entry.id));
+      delivered += 1;
+    } else {
+      break;
+    }
+  }
+
+  if (delivered > 0) {
+    const clients = await self.clients.matchAll({ type: 'window' });
+    clients.forEach((client) => client.postMessage({ type: 'queue-replayed', delivered }));
+  }
+}
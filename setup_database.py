@@ -4,14 +4,30 @@ Setup script to initialize the database with default ingredients and conversion
 This script loads all ingredients from default_conversions.py with their conversion rules.
 
 Run this script after initializing the database schema to populate it with default data.
+
+Usage:
+    python setup_database.py            # Interactive, prints every row
+    python setup_database.py --bulk     # Non-interactive, one transaction
+    python setup_database.py --bulk --synthetic-recipes 1000 --depth 3
+                                        # Also seed a synthetic load-testing dataset
 """
 
+import argparse
+import random
 import sys
 import os
+import time
+from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from backend import database
 from backend.database import init_db, get_db
 from backend.default_conversions import DEFAULT_CONVERSIONS, get_default_conversions
+from backend.search import pause_search_indexing, resume_search_indexing
+
+# Shopping units and recipe units used by synthetic ingredients
+SYNTHETIC_SHOPPING_UNITS = ['whole', 'package', 'cup', 'gram', 'bunch']
+SYNTHETIC_RECIPE_UNITS = ['cup', 'tablespoon', 'teaspoon', 'gram', 'ounce']
 
 def get_unit_id(name, cursor):
     """Get unit type ID by name."""
@@ -119,6 +135,292 @@ def determine_ingredient_type(ingredient_name):
     else:
         return 'Pantry Items'  # Default fallback
 
+def _names_to_ids(cursor, table):
+    """Map every name in a lookup table to its ID."""
+    cursor.execute(f"SELECT id, name FROM {table}")
+    return {row['name']: row['id'] for row in cursor.fetchall()}
+
+def _resolve(ids, name, kind):
+    if name not in ids:
+        raise ValueError(f"{kind} '{name}' not found")
+    return ids[name]
+
+def _bulk_insert_ingredients(cursor, ingredients):
+    """
+    Insert ingredients with their conversion and size rules using executemany.
+    
+    Unit and type IDs are resolved once. Ingredients whose name already
+    exists are skipped together with their rules. The caller owns the transaction.
+    
+    Args:
+        cursor: Database cursor
+        ingredients: List of dicts with 'name', 'type', 'shopping_unit',
+            'conversions' ([{'from', 'factor'}]) and optional 'size_rules'
+            ([{'size', 'reference_unit', 'value'}])
+    
+    Returns:
+        Dictionary mapping the names of created ingredients to their IDs
+    """
+    unit_ids = _names_to_ids(cursor, 'unit_types')
+    type_ids = _names_to_ids(cursor, 'ingredient_types')
+    existing = set(_names_to_ids(cursor, 'ingredients'))
+    ingredients = [ingredient for ingredient in ingredients if ingredient['name'] not in existing]
+    
+    cursor.executemany("""
+        INSERT INTO ingredients (name, type_id, shopping_unit_id)
+        VALUES (?, ?, ?)
+    """, [
+        (ingredient['name'],
+         _resolve(type_ids, ingredient['type'], "Ingredient type"),
+         _resolve(unit_ids, ingredient['shopping_unit'], "Unit"))
+        for ingredient in ingredients
+    ])
+    
+    created = {name: ingredient_id for name, ingredient_id in _names_to_ids(cursor, 'ingredients').items()
+               if name not in existing}
+    
+    conversion_rows = []
+    size_rows = []
+    for ingredient in ingredients:
+        ingredient_id = created[ingredient['name']]
+        shopping_unit_id = unit_ids[ingredient['shopping_unit']]
+        for rule in ingredient['conversions']:
+            conversion_rows.append((ingredient_id, _resolve(unit_ids, rule['from'], "Unit"), shopping_unit_id, rule['factor']))
+        for size_rule in ingredient.get('size_rules') or []:
+            size_rows.append((ingredient_id, size_rule['size'], _resolve(unit_ids, size_rule['reference_unit'], "Unit"), size_rule['value']))
+    
+    cursor.executemany("""
+        INSERT OR IGNORE INTO conversion_rules (ingredient_id, from_unit_id, to_unit_id, conversion_factor)
+        VALUES (?, ?, ?, ?)
+    """, conversion_rows)
+    cursor.executemany("""
+        INSERT OR IGNORE INTO size_estimation_rules (ingredient_id, size_qualifier, reference_unit_id, reference_value)
+        VALUES (?, ?, ?, ?)
+    """, size_rows)
+    
+    return created
+
+def default_ingredients():
+    """Get DEFAULT_CONVERSIONS in the format used by bulk seeding."""
+    return [
+        {
+            'name': ingredient_name,
+            'type': determine_ingredient_type(ingredient_name),
+            'shopping_unit': config['shopping_unit'],
+            'conversions': [{'from': conv['from'], 'factor': conv['factor']} for conv in config.get('conversions', [])],
+            'size_rules': [
+                {'size': size_rule['size'], 'reference_unit': size_rule['reference_unit'], 'value': size_rule['value']}
+                for size_rule in config.get('size_estimation', [])
+            ]
+        }
+        for ingredient_name, config in DEFAULT_CONVERSIONS.items()
+    ]
+
+def seed_default_ingredients(db=None):
+    """
+    Load all default ingredients in one transaction, skipping existing ones.
+    
+    Args:
+        db: Optional database connection
+    
+    Returns:
+        Number of ingredients created
+    """
+    if db is None:
+        db = get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        created = _bulk_insert_ingredients(cursor, default_ingredients())
+        db.commit()
+        return len(created)
+    
+    except Exception:
+        db.rollback()
+        raise
+    
+    finally:
+        if close_after:
+            db.close()
+
+def synthetic_ingredients(count, rnd):
+    """Generate synthetic ingredients with conversion and size rules."""
+    types = ['Vegetables', 'Fruits', 'Grains', 'Plant Proteins', 'Nuts & Seeds', 'Spices', 'Herbs', 'Pantry Items']
+    ingredients = []
+    for i in range(count):
+        shopping_unit = rnd.choice(SYNTHETIC_SHOPPING_UNITS)
+        # Direct rules from one volume and one weight unit; other units convert through standard equivalences
+        conversions = [
+            {'from': unit, 'factor': round(rnd.uniform(0.001, 2.0), 6)}
+            for unit in ('cup', 'gram') if unit != shopping_unit
+        ]
+        size_rules = []
+        if shopping_unit == 'whole':
+            medium = rnd.uniform(50, 400)
+            size_rules = [
+                {'size': 'small', 'reference_unit': 'gram', 'value': round(medium * 0.6, 1)},
+                {'size': 'medium', 'reference_unit': 'gram', 'value': round(medium, 1)},
+                {'size': 'large', 'reference_unit': 'gram', 'value': round(medium * 1.5, 1)},
+            ]
+        ingredients.append({
+            'name': f"Synthetic Ingredient {i + 1:06d}",
+            'type': rnd.choice(types),
+            'shopping_unit': shopping_unit,
+            'conversions': conversions,
+            'size_rules': size_rules
+        })
+    return ingredients
+
+def seed_synthetic_dataset(ingredients=200, recipes=1000, depth=2, items_per_recipe=8, seed=0, db=None):
+    """
+    Seed a synthetic dataset for load testing in one transaction.
+    
+    Recipes are split into depth + 1 levels. Recipes below the top level are
+    sub-recipes, and every recipe above level 0 uses one sub-recipe from the
+    level below, so top-level recipes nest exactly `depth` levels deep.
+    The same seed always produces the same dataset.
+    
+    In-process caches are not updated, so seed before the app loads the
+    database (or into a new database file).
+    
+    Args:
+        ingredients: Number of synthetic ingredients
+        recipes: Number of synthetic recipes
+        depth: Sub-recipe nesting depth of top-level recipes (0 for none)
+        items_per_recipe: Items per recipe, including the sub-recipe item
+        seed: Random seed
+        db: Optional database connection
+    
+    Returns:
+        Dictionary with the number of ingredients, recipes and recipe items created
+    
+    Raises:
+        ValueError: If the sizes are inconsistent or synthetic recipes were already seeded
+    """
+    if recipes and recipes < depth + 1:
+        raise ValueError(f"Need at least {depth + 1} recipes for nesting depth {depth}")
+    if recipes and (items_per_recipe < 1 or ingredients < 1):
+        raise ValueError("Synthetic recipes need at least one item and one ingredient")
+    rnd = random.Random(seed)
+    
+    if db is None:
+        db = get_db()
+        close_after = True
+    else:
+        close_after = False
+    
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT 1 FROM recipes WHERE name LIKE 'Synthetic Recipe %' LIMIT 1")
+        if cursor.fetchone():
+            raise ValueError("Synthetic recipes already exist in this database")
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        pause_search_indexing(cursor)
+        ingredient_specs = synthetic_ingredients(ingredients, rnd)
+        _bulk_insert_ingredients(cursor, ingredient_specs)
+        ingredient_ids = _names_to_ids(cursor, 'ingredients')
+        unit_ids = _names_to_ids(cursor, 'unit_types')
+        shopping_units = {spec['name']: spec['shopping_unit'] for spec in ingredient_specs}
+        ingredient_names = list(shopping_units)
+        
+        # Level of each recipe; lower levels come first so sub-recipes get lower IDs
+        levels = [i * (depth + 1) // recipes for i in range(recipes)]
+        recipe_names = [f"Synthetic Recipe {i + 1:06d}" for i in range(recipes)]
+        cursor.executemany("""
+            INSERT INTO recipes (name, is_sub_recipe, yield_quantity, yield_unit_id, page_number)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (name,
+             int(level < depth),
+             rnd.choice([1, 2, 4]),
+             unit_ids['cup'] if level < depth else unit_ids['serving'],
+             None)
+            for name, level in zip(recipe_names, levels)
+        ])
+        recipe_ids = _names_to_ids(cursor, 'recipes')
+        
+        recipes_by_level = {}
+        for name, level in zip(recipe_names, levels):
+            recipes_by_level.setdefault(level, []).append(recipe_ids[name])
+        
+        item_rows = []
+        for name, level in zip(recipe_names, levels):
+            recipe_id = recipe_ids[name]
+            ingredient_count = items_per_recipe
+            if level > 0:
+                sub_recipe_id = rnd.choice(recipes_by_level[level - 1])
+                item_rows.append((recipe_id, 'sub_recipe', None, sub_recipe_id,
+                                  rnd.choice([0.5, 1, 2]), unit_ids['cup'], None, None))
+                ingredient_count -= 1
+            for ingredient_name in rnd.sample(ingredient_names, min(ingredient_count, len(ingredient_names))):
+                size_qualifier = None
+                if shopping_units[ingredient_name] == 'whole' and rnd.random() < 0.3:
+                    size_qualifier = rnd.choice(['small', 'medium', 'large'])
+                item_rows.append((recipe_id, 'ingredient', ingredient_ids[ingredient_name], None,
+                                  round(rnd.uniform(0.25, 5), 2), unit_ids[rnd.choice(SYNTHETIC_RECIPE_UNITS)],
+                                  size_qualifier, None))
+        
+        cursor.executemany("""
+            INSERT INTO recipe_items (recipe_id, item_type, ingredient_id, sub_recipe_id,
+                                     quantity, unit_id, size_qualifier, preparation_notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, item_rows)
+        resume_search_indexing(cursor, [recipe_ids[name] for name in recipe_names])
+        db.commit()
+        return {'ingredients': len(ingredient_specs), 'recipes': recipes, 'recipe_items': len(item_rows)}
+    
+    except Exception:
+        db.rollback()
+        raise
+    
+    finally:
+        if close_after:
+            db.close()
+
+def bulk_main(args):
+    """Seed the database without prompts or per-row output."""
+    start = time.perf_counter()
+    init_db()
+    created = seed_default_ingredients()
+    print(f"✓ Loaded {created} default ingredients")
+    
+    if args.synthetic_recipes or args.synthetic_ingredients:
+        counts = seed_synthetic_dataset(
+            ingredients=args.synthetic_ingredients,
+            recipes=args.synthetic_recipes,
+            depth=args.depth,
+            items_per_recipe=args.items_per_recipe,
+            seed=args.seed
+        )
+        print(f"✓ Seeded {counts['ingredients']} synthetic ingredients, {counts['recipes']} recipes "
+              f"and {counts['recipe_items']} recipe items (depth {args.depth})")
+    
+    print(f"✓ Done in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Initialize the ShopList database and load default ingredients.")
+    parser.add_argument('--db', help="Database file (default: %(default)s)", default=str(database.DB_PATH))
+    parser.add_argument('--bulk', action='store_true',
+                        help="Non-interactive: load defaults in one transaction, skipping existing ingredients")
+    parser.add_argument('--synthetic-ingredients', type=int, default=0, metavar='N',
+                        help="With --bulk, also seed N synthetic ingredients")
+    parser.add_argument('--synthetic-recipes', type=int, default=0, metavar='N',
+                        help="With --bulk, also seed N synthetic recipes")
+    parser.add_argument('--depth', type=int, default=2, help="Sub-recipe nesting depth of synthetic recipes")
+    parser.add_argument('--items-per-recipe', type=int, default=8, help="Items per synthetic recipe")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for synthetic data")
+    args = parser.parse_args(argv)
+    if (args.synthetic_recipes or args.synthetic_ingredients) and not args.bulk:
+        parser.error("--synthetic-ingredients/--synthetic-recipes require --bulk")
+    if args.synthetic_recipes and not args.synthetic_ingredients:
+        args.synthetic_ingredients = 200
+    return args
+
 def main():
     """Main function to load all default ingredients."""
     print("=" * 60)
@@ -198,5 +500,10 @@ def main():
         db.close()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    database.DB_PATH = Path(args.db)
+    if args.bulk:
+        bulk_main(args)
+    else:
+        main()
 
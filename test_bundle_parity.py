@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Parity test of the shopping list aggregation in Python and JavaScript.
+
+Builds a synthetic database, exports it with GET /api/bundle and checks that
+frontend/js/aggregate.js (run with Node.js) computes exactly the same lists
+as services.generate_shopping_list() for random recipe selections.
+
+Usage:
+    python test_bundle_parity.py
+    python test_bundle_parity.py --selections 500 --seed 3
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from app import app
+from backend import database
+from backend.services import generate_shopping_list
+import benchmark
+
+AGGREGATE_JS = Path(__file__).resolve().parent / 'frontend' / 'js' / 'aggregate.js'
+
+# Reads {"bundle": ..., "selections": [...]} from stdin and prints one list per selection
+NODE_SCRIPT = f"""
+const {{ compileBundle, computeShoppingList }} = require({json.dumps(str(AGGREGATE_JS))});
+let input = '';
+process.stdin.on('data', chunk => {{ input += chunk; }});
+process.stdin.on('end', () => {{
+    const {{ bundle, selections }} = JSON.parse(input);
+    const compiled = compileBundle(bundle);
+    process.stdout.write(JSON.stringify(selections.map(s => computeShoppingList(compiled, s))));
+}});
+"""
+
+
+def add_mixed_recipes(count, rnd):
+    """Add recipes using the default ingredients in any unit, so some items have no conversion path."""
+    db = database.get_db()
+    try:
+        cursor = db.cursor()
+        ingredient_ids = [row['id'] for row in cursor.execute(
+            "SELECT id FROM ingredients WHERE name NOT LIKE 'Synthetic %'"
+        )]
+        unit_ids = [row['id'] for row in cursor.execute("SELECT id FROM unit_types")]
+        sub_recipe_ids = [row['id'] for row in cursor.execute("SELECT id FROM recipes WHERE is_sub_recipe = 1")]
+        for i in range(count):
+            cursor.execute("""
+                INSERT INTO recipes (name, is_sub_recipe, yield_quantity, yield_unit_id)
+                VALUES (?, 0, 4, ?)
+            """, (f"Mixed Recipe {i + 1:04d}", rnd.choice(unit_ids)))
+            recipe_id = cursor.lastrowid
+            for ingredient_id in rnd.sample(ingredient_ids, rnd.randint(3, 10)):
+                cursor.execute("""
+                    INSERT INTO recipe_items (recipe_id, item_type, ingredient_id, quantity, unit_id, size_qualifier)
+                    VALUES (?, 'ingredient', ?, ?, ?, ?)
+                """, (recipe_id, ingredient_id, round(rnd.uniform(0.1, 6), 3), rnd.choice(unit_ids),
+                      rnd.choice([None, None, 'small', 'medium', 'large'])))
+            if sub_recipe_ids and rnd.random() < 0.5:
+                cursor.execute("""
+                    INSERT INTO recipe_items (recipe_id, item_type, sub_recipe_id, quantity, unit_id)
+                    VALUES (?, 'sub_recipe', ?, ?, ?)
+                """, (recipe_id, rnd.choice(sub_recipe_ids), rnd.choice([0.25, 1, 1.5]), rnd.choice(unit_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def random_selections(recipe_ids, count, rnd):
+    """Random selections, including repeated recipes, fractional batches and unknown recipe IDs."""
+    selections = []
+    for _ in range(count):
+        selection = [
+            {'recipe_id': recipe_id, 'batches': rnd.choice([1, 1, 2, 3, 10, 0.5])}
+            for recipe_id in rnd.sample(recipe_ids, rnd.randint(1, 8))
+        ]
+        if rnd.random() < 0.1:
+            selection.append(dict(selection[0]))
+        if rnd.random() < 0.05:
+            selection.append({'recipe_id': max(recipe_ids) + 1, 'batches': 1})
+        selections.append(selection)
+    return selections
+
+
+def first_difference(expected, actual):
+    if len(expected) != len(actual):
+        return f"{len(expected)} items != {len(actual)} items"
+    for expected_item, actual_item in zip(expected, actual):
+        if expected_item != actual_item:
+            return f"{expected_item} != {actual_item}"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the JavaScript shopping list aggregation against the server's.")
+    parser.add_argument('--selections', type=int, default=200, help="Random selections to compare")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+
+    if shutil.which('node') is None:
+        print("- Skipped: Node.js is not installed")
+        return 0
+
+    rnd = random.Random(args.seed)
+    original_db_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            benchmark.build_database(os.path.join(tmp, 'parity.db'), items=2000, depth=3, seed=args.seed)
+            add_mixed_recipes(40, rnd)
+
+            with app.test_client() as client:
+                response = client.get('/api/bundle')
+                bundle = response.get_json()
+                print(f"✓ GET /api/bundle returned {len(bundle['recipes'])} recipes, "
+                      f"{len(bundle['ingredients'])} ingredients ({len(response.get_data())} bytes)")
+
+                db = database.get_db()
+                recipe_ids = [row['id'] for row in db.execute("SELECT id FROM recipes")]
+                db.close()
+                selections = random_selections(recipe_ids, args.selections, rnd)
+                expected = [json.loads(json.dumps(generate_shopping_list(selection))) for selection in selections]
+
+                # The list the server saves is the one compared
+                saved = client.post('/api/shopping-lists', json={'recipe_selections': selections[0]}).get_json()
+                if saved['shopping_list'] != expected[0]:
+                    print("✗ POST /api/shopping-lists differs from generate_shopping_list()")
+                    return 1
+
+            result = subprocess.run(
+                ['node', '-e', NODE_SCRIPT],
+                input=json.dumps({'bundle': bundle, 'selections': selections}),
+                capture_output=True, text=True, check=True
+            )
+            actual = json.loads(result.stdout)
+        finally:
+            database.DB_PATH = original_db_path
+
+    mismatches = 0
+    for selection, expected_list, actual_list in zip(selections, expected, actual):
+        difference = first_difference(expected_list, actual_list)
+        if difference:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"✗ Selection {selection}: {difference}")
+
+    items = sum(len(shopping_list) for shopping_list in expected)
+    if mismatches:
+        print(f"✗ {mismatches} of {len(selections)} lists differ")
+        return 1
+    print(f"✓ {len(selections)} lists ({items} items) computed from the bundle match the server's exactly")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Regression test of the precompiled unit conversion graphs.
+
+Pins which path a conversion takes when several exist: a direct edge (rule,
+reciprocal or standard equivalence) always wins, and multi-hop conversions
+go through the ingredient's own rules before standard equivalences. Also
+pins the shopping list totals of an ingredient whose rules disagree with
+the standard equivalences.
+
+Usage:
+    python test_conversions.py
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from backend import database
+from backend.conversions import compile_conversion_graph, invalidate_conversion_graphs
+from backend.services import generate_shopping_list
+from backend.units import get_unit_registry
+
+
+def check(condition, message, failures):
+    print(f"{'✓' if condition else '✗'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def close(a, b):
+    return a is not None and b is not None and abs(a - b) <= 1e-9 * max(1.0, abs(b))
+
+
+def check_graph(units, failures):
+    unit = units.id_for
+    
+    # Rules that disagree with the standard 16 tablespoons per cup
+    graph = compile_conversion_graph([
+        (unit('tablespoon'), unit('package'), 0.25),
+        (unit('cup'), unit('package'), 1.0),
+    ], units)
+    check(close(graph.factor(unit('tablespoon'), unit('package')), 0.25), "Direct rule is used as is", failures)
+    check(close(graph.factor(unit('package'), unit('cup')), 1.0), "Reciprocal of a rule is a direct edge", failures)
+    check(close(graph.factor(unit('tablespoon'), unit('cup')), 1 / 16),
+          "Direct standard equivalence wins over a two-hop rule path", failures)
+    
+    # Three hops through rules against two hops through a standard equivalence
+    graph = compile_conversion_graph([
+        (unit('ounce'), unit('package'), 0.125),
+        (unit('package'), unit('piece'), 2.0),
+        (unit('cup'), unit('piece'), 0.5),
+        (unit('gram'), unit('cup'), 1 / 240),
+    ], units)
+    check(close(graph.factor(unit('ounce'), unit('cup')), 0.125 * 2.0 / 0.5),
+          "Multi-hop conversion goes through the ingredient's rules, not a shorter standard path", failures)
+    check(close(graph.factor(unit('kilogram'), unit('cup')), 1000 / 240),
+          "Multi-hop conversion uses standard equivalences when the rules cannot connect the pair", failures)
+    
+    # A rule listed twice keeps its first factor
+    graph = compile_conversion_graph([
+        (unit('cup'), unit('package'), 0.5),
+        (unit('cup'), unit('package'), 0.25),
+    ], units)
+    check(close(graph.factor(unit('cup'), unit('package')), 0.5), "First of duplicate rules wins", failures)
+
+
+def check_shopping_list_totals(units, failures):
+    unit = units.id_for
+    db = database.get_db()
+    try:
+        cursor = db.cursor()
+        type_id = cursor.execute("SELECT id FROM ingredient_types ORDER BY id LIMIT 1").fetchone()[0]
+        cursor.execute("""
+            INSERT INTO ingredients (name, type_id, shopping_unit_id) VALUES ('Test Herb Mix', ?, ?)
+        """, (type_id, unit('package')))
+        ingredient_id = cursor.lastrowid
+        for from_unit, factor in (('tablespoon', 0.25), ('cup', 1.0)):
+            cursor.execute("""
+                INSERT INTO conversion_rules (ingredient_id, from_unit_id, to_unit_id, conversion_factor)
+                VALUES (?, ?, ?, ?)
+            """, (ingredient_id, unit(from_unit), unit('package'), factor))
+        cursor.execute("""
+            INSERT INTO recipes (name, is_sub_recipe, yield_quantity, yield_unit_id) VALUES ('Test Salad', 0, 4, ?)
+        """, (unit('serving'),))
+        recipe_id = cursor.lastrowid
+        for quantity, item_unit in ((8, 'tablespoon'), (1, 'cup')):
+            cursor.execute("""
+                INSERT INTO recipe_items (recipe_id, item_type, ingredient_id, quantity, unit_id)
+                VALUES (?, 'ingredient', ?, ?, ?)
+            """, (recipe_id, ingredient_id, quantity, unit(item_unit)))
+        db.commit()
+    finally:
+        db.close()
+    
+    invalidate_conversion_graphs()
+    shopping_list = generate_shopping_list([{'recipe_id': recipe_id, 'batches': 1}])
+    item = shopping_list[0] if len(shopping_list) == 1 else {}
+    # 8 tbsp * 0.25 + 1 cup * 1.0 = 3 packages; 8 tbsp = 0.5 cup (standard) + 1 cup = 1.5 cups = 12 fl oz
+    check(item.get('quantity') == 3, f"Shopping quantity is 3 packages (got {item.get('quantity')})", failures)
+    check(close(item.get('recipe_volume'), 12.0),
+          f"Recipe volume uses the direct tablespoon → cup equivalence: 12 fl oz (got {item.get('recipe_volume')})",
+          failures)
+
+
+def main():
+    original_db_path = database.DB_PATH
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.DB_PATH = os.path.join(tmp, 'conversions.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                database.init_db()
+            units = get_unit_registry()
+            
+            check_graph(units, failures)
+            check_shopping_list_totals(units, failures)
+        finally:
+            database.DB_PATH = original_db_path
+            invalidate_conversion_graphs()
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
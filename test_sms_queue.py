@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Test of the background SMS queue with the fake transport.
+
+Runs the workers against a temporary database with short retry, lease and
+poll intervals and checks retries with backoff, giving up after
+SMS_MAX_ATTEMPTS, reclaiming a job whose lease expired, resume_sms_jobs()
+and that workers survive database errors.
+
+Usage:
+    python test_sms_queue.py
+"""
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from backend import database
+from backend import sms_queue
+from backend.sms_queue import FakeTransport, SmsQueue, get_sms_job, resume_sms_jobs
+
+PHONE_NUMBER = '+15551234567'
+
+
+class RecordingHandler(logging.Handler):
+    """Keeps log records instead of printing them."""
+    
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+def wait_for_status(job_id, statuses, timeout=5.0):
+    """Poll a job until its status is one of statuses, returning the job (or its last state)."""
+    deadline = time.time() + timeout
+    while True:
+        job = get_sms_job(job_id)
+        if job['status'] in statuses or time.time() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def insert_job(status, attempts, next_attempt_at):
+    """Insert a job directly, as left behind by an earlier run."""
+    db = database.get_db()
+    try:
+        cursor = db.execute("""
+            INSERT INTO sms_jobs (phone_number, text, status, attempts, next_attempt_at)
+            VALUES (?, 'Leftover list', ?, ?, ?)
+        """, (PHONE_NUMBER, status, attempts, next_attempt_at))
+        db.commit()
+        return cursor.lastrowid
+    finally:
+        db.close()
+
+
+def check(condition, message, failures):
+    print(f"{'✓' if condition else '✗'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def check_retries(failures):
+    transport = FakeTransport(failures=2)
+    queue = SmsQueue([('fake', transport)], workers=1)
+    started = time.time()
+    job_id = queue.enqueue(PHONE_NUMBER, 'Milk')
+    job = wait_for_status(job_id, ('sent', 'failed'))
+    elapsed = time.time() - started
+    queue.stop(timeout=2)
+    
+    backoff = sms_queue.retry_delay(1) + sms_queue.retry_delay(2)
+    check(job['status'] == 'sent' and job['attempts'] == 3 and job['method'] == 'fake',
+          f"Job sent on attempt {job['attempts']} after two failures (status {job['status']})", failures)
+    check(elapsed >= backoff, f"Retries waited for the backoff ({elapsed:.2f} s >= {backoff:.2f} s)", failures)
+    check(transport.sent == [(PHONE_NUMBER, 'Milk')], "Message delivered exactly once", failures)
+
+
+def check_gives_up(failures):
+    transport = FakeTransport(failures=100)
+    queue = SmsQueue([('fake', transport)], workers=1)
+    job_id = queue.enqueue(PHONE_NUMBER, 'Eggs')
+    job = wait_for_status(job_id, ('sent', 'failed'))
+    queue.stop(timeout=2)
+    
+    check(job['status'] == 'failed' and job['attempts'] == sms_queue.SMS_MAX_ATTEMPTS,
+          f"Job failed after {job['attempts']} attempts (status {job['status']})", failures)
+    check(job['last_error'] == 'fake: Simulated failure', f"Last error recorded: {job['last_error']!r}", failures)
+
+
+def check_lease_expiry(failures):
+    # A job claimed by a worker that died mid-send
+    lease_expires = time.time() + sms_queue.SMS_LEASE_SECONDS
+    job_id = insert_job('sending', 1, lease_expires)
+    
+    transport = FakeTransport()
+    queue = SmsQueue([('fake', transport)], workers=1)
+    queue.start()
+    time.sleep(sms_queue.SMS_LEASE_SECONDS / 3)
+    check(not transport.sent, "Leased job is not reclaimed before its lease expires", failures)
+    
+    job = wait_for_status(job_id, ('sent', 'failed'))
+    queue.stop(timeout=2)
+    check(job['status'] == 'sent' and job['attempts'] == 2,
+          f"Job reclaimed after its lease expired and sent on attempt {job['attempts']}", failures)
+    check(len(transport.sent) == 1, "Reclaimed job delivered once", failures)
+
+
+def check_resume(failures):
+    transport = FakeTransport()
+    sms_queue._queue = SmsQueue([('fake', transport)], workers=1)
+    
+    resume_sms_jobs()
+    check(not sms_queue._queue._threads, "resume_sms_jobs() starts no workers without pending jobs", failures)
+    
+    job_id = insert_job('queued', 0, time.time())
+    resume_sms_jobs()
+    job = wait_for_status(job_id, ('sent', 'failed'))
+    sms_queue._queue.stop(timeout=2)
+    check(job['status'] == 'sent', f"resume_sms_jobs() delivered a job left queued (status {job['status']})",
+          failures)
+
+
+def check_survives_errors(failures, handler):
+    queue = SmsQueue([('fake', FakeTransport())], workers=1)
+    claim = queue._claim
+    errors = [sqlite3.OperationalError('database is locked')]
+    
+    def flaky_claim(db):
+        if errors:
+            raise errors.pop()
+        return claim(db)
+    
+    queue._claim = flaky_claim
+    job_id = queue.enqueue(PHONE_NUMBER, 'Bread')
+    job = wait_for_status(job_id, ('sent', 'failed'))
+    alive = [thread for thread in queue._threads if thread.is_alive()]
+    queue.stop(timeout=2)
+    
+    check(job['status'] == 'sent', f"Job sent after the worker hit a database error (status {job['status']})",
+          failures)
+    check(len(alive) == 1, "Worker still running after the error", failures)
+    check(any('database is locked' in str(record.exc_info[1]) for record in handler.records if record.exc_info),
+          "Error logged", failures)
+    
+    # A worker that exited is replaced by start()
+    dead = threading.Thread(target=lambda: None, name='sms-worker-1')
+    dead.start()
+    dead.join()
+    queue = SmsQueue([('fake', FakeTransport())], workers=2)
+    queue._threads = [dead]
+    queue.start()
+    alive = [thread for thread in queue._threads if thread.is_alive()]
+    queue.stop(timeout=2)
+    check(len(alive) == 2, f"start() replaced the exited worker ({len(alive)} of 2 running)", failures)
+
+
+def main():
+    handler = RecordingHandler()
+    logger = logging.getLogger('shoplist.sms')
+    logger.addHandler(handler)
+    logger.propagate = False
+    
+    original_settings = {
+        name: getattr(sms_queue, name)
+        for name in ('SMS_RETRY_BASE_SECONDS', 'SMS_RETRY_MAX_SECONDS', 'SMS_LEASE_SECONDS',
+                     'SMS_POLL_SECONDS', 'SMS_MAX_ATTEMPTS')
+    }
+    sms_queue.SMS_RETRY_BASE_SECONDS = 0.1
+    sms_queue.SMS_RETRY_MAX_SECONDS = 0.2
+    sms_queue.SMS_LEASE_SECONDS = 0.6
+    sms_queue.SMS_POLL_SECONDS = 0.05
+    sms_queue.SMS_MAX_ATTEMPTS = 3
+    
+    original_db_path = database.DB_PATH
+    original_queue = sms_queue._queue
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.DB_PATH = os.path.join(tmp, 'sms.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                database.init_db()
+            
+            check_retries(failures)
+            check_gives_up(failures)
+            check_lease_expiry(failures)
+            check_resume(failures)
+            check_survives_errors(failures, handler)
+        finally:
+            database.DB_PATH = original_db_path
+            sms_queue._queue = original_queue
+            for name, value in original_settings.items():
+                setattr(sms_queue, name, value)
+            logger.removeHandler(handler)
+            logger.propagate = True
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())